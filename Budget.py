@@ -1,13 +1,27 @@
+from datetime import datetime
+
+from budget_engine import ROLLING_DAYS
+
+
 class BudgetManager:
     def __init__(self, tracker):
         self.tracker = tracker
+        # The tracker reports crossed thresholds; showing them is up to the UI
+        tracker.on_budget_alert(self.show_alert)
+
+    def show_alert(self, alert):
+        marker = "[!!!] ALERT" if alert.level == 'over' else "[!] WARNING"
+        print(f"\n{marker}: {alert}")
+        input("Press Enter to acknowledge alert...")
 
     def show_budget_menu(self):
         print("\n--- BUDGETING MENU ---")
         print("1. Set Monthly Budget Limit")
         print("2. Set Specific Category Budget")
         print("3. Check Budget Status (Alerts)")
-        print("4. Back to main menu")
+        print("4. Add Period Budget (weekly / rolling / custom range)")
+        print("5. Remove Period Budget")
+        print("6. Back to main menu")
 
     def manage_budgets(self):
         while True:
@@ -22,7 +36,7 @@ class BudgetManager:
                     print(f"Current Monthly Limit: ${current:.2f}")
                     amount = float(input("Enter new overall monthly limit: "))
                     budgets['monthly'] = amount
-                    self.tracker.save()
+                    self.tracker.budgets_changed()
                     print(f"[Success] Monthly budget set to ${amount:.2f}")
                 except ValueError:
                     print("[!] Invalid amount. Please enter a number.")
@@ -36,7 +50,7 @@ class BudgetManager:
                     print(f"Current limit for '{category}': ${current_cat:.2f}")
                     amount = float(input(f"Enter new limit for '{category}': "))
                     budgets['categories'][category] = amount
-                    self.tracker.save()
+                    self.tracker.budgets_changed()
                     print(f"[Success] Budget for '{category}' set to ${amount:.2f}")
                 except ValueError:
                     print("[!] Invalid amount.")
@@ -45,56 +59,89 @@ class BudgetManager:
                 self.check_budget_status()
 
             elif choice == '4':
+                self.add_period_budget()
+
+            elif choice == '5':
+                self.remove_period_budget()
+
+            elif choice == '6':
                 break
             else:
                 print("Invalid selection.")
 
+    def add_period_budget(self):
+        period = input("Period (monthly/weekly/rolling/custom): ").strip().lower()
+        if period not in ('monthly', 'weekly', 'rolling', 'custom'):
+            print("[!] Unknown period.")
+            return
+        category = input("Category (blank for all spending): ").strip() or None
+        rule = {'category': category, 'period': period}
+        try:
+            if period == 'rolling':
+                rule['days'] = int(input(f"Window length in days [{ROLLING_DAYS}]: ").strip() or ROLLING_DAYS)
+                if rule['days'] < 1:
+                    raise ValueError
+            elif period == 'custom':
+                start = datetime.strptime(input("Start date (YYYY-MM-DD): ").strip(), "%Y-%m-%d")
+                end = datetime.strptime(input("End date (YYYY-MM-DD): ").strip(), "%Y-%m-%d")
+                if end < start:
+                    raise ValueError
+                rule['start'], rule['end'] = start.date().isoformat(), end.date().isoformat()
+            rule['limit'] = float(input("Limit: "))
+        except ValueError:
+            print("[!] Invalid value.")
+            return
+        self.tracker.user_data['budgets'].setdefault('rules', []).append(rule)
+        self.tracker.budgets_changed()
+        print("[Success] Budget added.")
+
+    def remove_period_budget(self):
+        rules = self.tracker.user_data['budgets'].get('rules', [])
+        if not rules:
+            print("(No period budgets set yet)")
+            return
+        for n, rule in enumerate(rules, start=1):
+            print(f"{n}. {self.describe_rule(rule)}")
+        try:
+            rules.pop(int(input("Remove which budget: ")) - 1)
+        except (ValueError, IndexError):
+            print("[!] Invalid selection.")
+            return
+        self.tracker.budgets_changed()
+        print("[Success] Budget removed.")
+
+    @staticmethod
+    def describe_rule(rule):
+        what = rule['category'] or "All spending"
+        if rule['period'] == 'rolling':
+            period = f"rolling {rule.get('days', ROLLING_DAYS)} days"
+        elif rule['period'] == 'custom':
+            period = f"{rule['start']} to {rule['end']}"
+        else:
+            period = rule['period']
+        return f"{what} - {period}: ${rule['limit']:.2f}"
+
     def check_budget_status(self):
         print("\n--- BUDGET STATUS REPORT ---")
-        
-        total_spent = 0
-        category_spent = {}
-        
-        for expense in self.tracker.expenses:
-            try:
-                amount = float(expense.amount) if isinstance(expense.amount, (int, float, str)) else 0
-            except (ValueError, TypeError):
-                amount = 0
-            cat = expense.category if expense.category else "Other"
-            
-            total_spent += amount
-            category_spent[cat] = category_spent.get(cat, 0) + amount
-
-        monthly_limit = self.tracker.user_data['budgets'].get('monthly', 0)
-        print(f"Total Spent: ${total_spent:.2f} / Monthly Limit: ${monthly_limit:.2f}")
-        
-        if monthly_limit > 0 and total_spent > monthly_limit:
-            diff = total_spent - monthly_limit
-            print(f"  [!!!] WARNING: You are OVER your monthly budget by ${diff:.2f}!")
-        else:
-            left = monthly_limit - total_spent
-            print(f" You are within your monthly budget. Remaining: ${left:.2f}")
 
-        print("\n--- Category Breakdown ---")
+        # Spend per budget period is maintained by the tracker's budget engine
+        status = self.tracker.budget_status()
+        if not status:
+            print("(No budgets set yet)")
+
         has_alerts = False
-        
-        cat_budgets = self.tracker.user_data['budgets'].get('categories', {})
-        
-        if not cat_budgets:
-            print("(No specific category budgets set yet)")
-
-        for cat, limit in cat_budgets.items():
-            spent = category_spent.get(cat, 0)
-            status = "OK"
-            if spent > limit:
-                status = f"OVER by ${spent - limit:.2f}"
+        for rule, spent, period, level in status:
+            limit = rule['limit']
+            if level == 'over':
+                state = f"OVER by ${spent - limit:.2f}"
                 has_alerts = True
-            elif spent > limit * 0.9:
-                status = "Near Limit"
-                
-            print(f"{cat}: Spent ${spent:.2f} / Limit ${limit:.2f} -> {status}")
-        
-        if not has_alerts and cat_budgets:
-            print("\n[OK] All category budgets are healthy.")
-            
-        input("Press Enter to continue...")
\ No newline at end of file
+            elif level == 'near':
+                state = "Near Limit"
+            else:
+                state = f"OK (${limit - spent:.2f} left)"
+            print(f"{self.describe_rule(rule)} [{period}] -> Spent ${spent:.2f} -> {state}")
+
+        if status and not has_alerts:
+            print("\n[OK] All budgets are healthy.")
+
+        input("Press Enter to continue...")
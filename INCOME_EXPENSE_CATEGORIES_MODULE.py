@@ -2,6 +2,8 @@
 
 from datetime import datetime
 
+from pager import tracker_pager, list_pager
+
 
 def parse_date(s: str):
     """Parse a date string in ISO 8601 or YYYY-MM-DD format.
@@ -21,26 +23,11 @@ def parse_date(s: str):
 
 
 def expenses_menu(et, user):
-    # View expenses table with ID and actions underneath
-    def print_table(items):
-        if not items:
-            print("No expenses to show.")
-            return
-        print(f"{'ID':36}  {'Date':10}  {'Category':12}  {'Amount':8}  Description")
-        print('-'*90)
-        for e in items:
-            date_str = e.date[:10] if (e.date and isinstance(e.date, str)) else "N/A"
-            category_str = e.category if e.category else "N/A"
-            try:
-                amount = float(e.amount) if e.amount is not None else 0.0
-            except (ValueError, TypeError):
-                amount = 0.0
-            desc = e.description if e.description else ""
-            print(f"{e.id:36}  {date_str:10}  {category_str:12}  {amount:8.2f}  {desc}")
+    # View expenses table (one page at a time) with ID and actions underneath
+    pager = tracker_pager(et, 'expense', empty="No expenses to show.")
 
     while True:
-        items = et.list_expenses()
-        print_table(items)
+        pager.render()
         # show current month budget summary under table
         ms = et.monthly_summary()
         if ms.get('budget') is not None:
@@ -49,7 +36,10 @@ def expenses_menu(et, user):
             print(f"\nNo budget set for {ms['year']}-{ms['month']}")
 
         print("\nActions: [A]dd expense  [E]dit expense by id  [D]elete expense by id  [S]earch  [B]ack")
+        print(f"         {pager.ACTIONS}")
         act = input("Choose action: ").strip().lower()
+        if pager.handle(act):
+            continue
         if act == 'a':
             amt = input("Amount: ")
             try:
@@ -77,11 +67,10 @@ def expenses_menu(et, user):
                 print("Error adding expense:", exc)
         elif act == 'd':
             eid = input("Expense id to delete: ").strip()
-            found = [x for x in et.expenses if x.id == eid]
-            if not found:
+            e = et.get_expense(eid)
+            if e is None:
                 print("Expense id not found.")
                 continue
-            e = found[0]
             print(f"\nDelete: {e.date[:10]} | {e.category} | ${e.amount:.2f} | {e.description}")
             confirm = input("Confirm delete? (yes/no): ").strip().lower()
             if confirm == 'yes':
@@ -91,11 +80,10 @@ def expenses_menu(et, user):
                 print("Cancelled.")
         elif act == 'e':
             eid = input("Expense id to edit: ").strip()
-            found = [x for x in et.expenses if x.id == eid]
-            if not found:
+            e = et.get_expense(eid)
+            if e is None:
                 print("Not found")
                 continue
-            e = found[0]
             print("Leave blank to keep current value.")
             amt = input(f"Amount [{e.amount}]: ")
             amt_float = None
@@ -133,10 +121,7 @@ def expenses_menu(et, user):
             if not results:
                 print("No matching expenses.")
             else:
-                print("Search results:")
-                for r in results:
-                    print(f"{r.id:36}  {r.date[:10]:10}  {r.category:12}  {r.amount:8.2f}  {r.description}")
-                print("Use the expense id shown above with Edit/Delete actions.")
+                list_pager(results, title="Search results (use the ids with Edit/Delete)").browse()
         elif act == 'b' or act == '':
             break
         else:
@@ -145,29 +130,17 @@ def expenses_menu(et, user):
 
 
 def income_menu(et, user):
-    # View income table with ID and actions underneath
-    def print_income_table(items):
-        if not items:
-            print("No income to show.")
-            return
-        print(f"{'ID':36}  {'Date':10}  {'Category':12}  {'Amount':8}  Description")
-        print('-'*90)
-        for i in items:
-            date_str = i.date[:10] if (i.date and isinstance(i.date, str)) else "N/A"
-            category_str = i.category if i.category else "N/A"
-            try:
-                amount = float(i.amount) if i.amount is not None else 0.0
-            except (ValueError, TypeError):
-                amount = 0.0
-            desc = i.description if i.description else ""
-            print(f"{i.id:36}  {date_str:10}  {category_str:12}  {amount:8.2f}  {desc}")
+    # View income table (one page at a time) with ID and actions underneath
+    pager = tracker_pager(et, 'income', empty="No income to show.")
 
     while True:
-        items = et.list_income()
-        print_income_table(items)
+        pager.render()
 
         print("\nActions: [A]dd income  [E]dit income by id  [D]elete income by id  [S]earch  [B]ack")
+        print(f"         {pager.ACTIONS}")
         act = input("Choose action: ").strip().lower()
+        if pager.handle(act):
+            continue
         if act == 'a':
             amt = input("Amount: ")
             try:
@@ -195,11 +168,10 @@ def income_menu(et, user):
                 print("Error adding income:", exc)
         elif act == 'd':
             iid = input("Income id to delete: ").strip()
-            found = [x for x in et.income if x.id == iid]
-            if not found:
+            i = et.get_income(iid)
+            if i is None:
                 print("Income id not found.")
                 continue
-            i = found[0]
             print(f"\nDelete: {i.date[:10]} | {i.category} | ${i.amount:.2f} | {i.description}")
             confirm = input("Confirm delete? (yes/no): ").strip().lower()
             if confirm == 'yes':
@@ -209,11 +181,10 @@ def income_menu(et, user):
                 print("Cancelled.")
         elif act == 'e':
             iid = input("Income id to edit: ").strip()
-            found = [x for x in et.income if x.id == iid]
-            if not found:
+            i = et.get_income(iid)
+            if i is None:
                 print("Not found")
                 continue
-            i = found[0]
             print("Leave blank to keep current value.")
             amt = input(f"Amount [{i.amount}]: ")
             amt_float = None
@@ -251,10 +222,7 @@ def income_menu(et, user):
             if not results:
                 print("No matching income.")
             else:
-                print("Search results:")
-                for r in results:
-                    print(f"{r.id:36}  {r.date[:10]:10}  {r.category:12}  {r.amount:8.2f}  {r.description}")
-                print("Use the income id shown above with Edit/Delete actions.")
+                list_pager(results, title="Search results (use the ids with Edit/Delete)").browse()
         elif act == 'b' or act == '':
             break
         else:
@@ -289,14 +257,14 @@ def categories_menu(et, user):
                         print("Category exists (case-insensitive).")
                         continue
                     et.categories.append(name)
-                    et.save()
+                    et.mark_dirty()
                     print("Expense category added.")
                 elif a == 'r':
                     name = input("Category name to remove: ").strip()
                     matching = [c for c in et.categories if c.lower() == name.lower()]
                     if matching:
                         et.categories.remove(matching[0])
-                        et.save()
+                        et.mark_dirty()
                         print("Expense category removed.")
                     else:
                         print("Category not found.")
@@ -328,14 +296,14 @@ def categories_menu(et, user):
                         print("Category exists (case-insensitive).")
                         continue
                     et.income_categories.append(name)
-                    et.save()
+                    et.mark_dirty()
                     print("Income category added.")
                 elif a == 'r':
                     name = input("Category name to remove: ").strip()
                     matching = [c for c in et.income_categories if c.lower() == name.lower()]
                     if matching:
                         et.income_categories.remove(matching[0])
-                        et.save()
+                        et.mark_dirty()
                         print("Income category removed.")
                     else:
                         print("Category not found.")
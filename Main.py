@@ -1,9 +1,15 @@
+import os
 import sys
 from tracker import ExpenseTracker
+from sqlite_storage import SqliteStorage
 from Budget import BudgetManager
 from Reports import ReportManager
 from Menu import show_main_menu
 from INCOME_EXPENSE_CATEGORIES_MODULE import expenses_menu, income_menu, categories_menu
+import importer
+import export
+import server
+from datetime import datetime
 
 auth_ready = False
 try:
@@ -12,7 +18,97 @@ try:
 except ImportError:
     pass
 
+def open_tracker(username, lazy=False):
+    # Set EXPENSE_TRACKER_DB=path/to/tracker.db to use the SQLite backend
+    db_path = os.environ.get('EXPENSE_TRACKER_DB')
+    storage = SqliteStorage(db_path) if db_path else None
+    return ExpenseTracker(username = username, storage = storage, journal = True,
+                          write_behind = True, lazy = lazy, snapshot = True)
+
+def import_command(args):
+    # python Main.py import <username> <statement.csv|.ofx> [...] [--kind expense|income] [--category NAME]
+    options = {}
+    paths = []
+    it = iter(args)
+    for arg in it:
+        if arg in ('--kind', '--category'):
+            options[arg[2:]] = next(it, None)
+        else:
+            paths.append(arg)
+    if len(paths) < 2:
+        print("usage: python Main.py import <username> <statement.csv|.ofx> [...] "
+              "[--kind expense|income] [--category NAME]")
+        return 1
+    et = open_tracker(paths[0])
+    try:
+        result = importer.import_files(et, paths[1:], **options)
+    except (OSError, ValueError) as e:
+        print(f"[Import Error] {e}")
+        return 1
+    finally:
+        et.close()
+    importer.print_result(result)
+    return 0
+
+def export_command(args):
+    # python Main.py export <username> <out.csv|.jsonl|.col> [--type expense|income] [--category NAME]
+    #                [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    options = {}
+    paths = []
+    it = iter(args)
+    try:
+        for arg in it:
+            if arg in ('--type', '--category'):
+                options['kind' if arg == '--type' else 'category'] = next(it, None)
+            elif arg in ('--from', '--to'):
+                options['start' if arg == '--from' else 'end'] = datetime.strptime(next(it, ''), "%Y-%m-%d")
+            else:
+                paths.append(arg)
+    except ValueError:
+        print("Dates must be YYYY-MM-DD")
+        return 1
+    if len(paths) != 2:
+        print("usage: python Main.py export <username> <out.csv|.jsonl|.col> [--type expense|income] "
+              "[--category NAME] [--from YYYY-MM-DD] [--to YYYY-MM-DD]")
+        return 1
+    et = open_tracker(paths[0])
+    try:
+        count = export.export(et, paths[1], **options)
+    except (OSError, ValueError) as e:
+        print(f"[Export Error] {e}")
+        return 1
+    finally:
+        et.close()
+    print(f"Exported {count} transaction(s) to {paths[1]}")
+    return 0
+
+def serve_command(args):
+    # python Main.py serve [--host 127.0.0.1] [--port 8080] [--workers N]
+    # Serves the same profiles as the menus (EXPENSE_TRACKER_DB selects SQLite)
+    options = {}
+    it = iter(args)
+    try:
+        for arg in it:
+            if arg == '--host':
+                options['host'] = next(it)
+            elif arg in ('--port', '--workers'):
+                options[arg[2:]] = int(next(it))
+            else:
+                raise ValueError(arg)
+    except (StopIteration, ValueError):
+        print("usage: python Main.py serve [--host HOST] [--port PORT] [--workers N]")
+        return 1
+    server.serve(db_path=os.environ.get('EXPENSE_TRACKER_DB'), **options)
+    return 0
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        sys.exit(serve_command(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'import':
+        sys.exit(import_command(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        sys.exit(export_command(sys.argv[2:]))
+
     current_username = None
 
     if auth_ready:
@@ -33,15 +129,22 @@ def main():
     print(f"\n[System] Profile Loaded: {current_username}")
     
     try:
-        et = ExpenseTracker(username = current_username)
+        # Only metadata is read before the menu; the transactions load behind it
+        et = open_tracker(current_username, lazy=True)
+        # Pending changes are flushed on exit, even on SIGTERM/SIGHUP, and
+        # journaled in the background while the session sits at a prompt
+        et.install_exit_handlers()
+        et.autosave_in_background()
         budget_mgr = BudgetManager(et)
         report_mgr = ReportManager(et)
+        et.hydrate_in_background()
     except Exception as e:
         print(f"[Error] Failed to initialize ExpenseTracker: {e}")
         sys.exit()
 
     while True:
         try:
+            et.flush_if_due()
             show_main_menu(current_username)
             choice = input("Selection: ").strip()
             if choice == '1':
@@ -56,7 +159,7 @@ def main():
                 budget_mgr.manage_budgets()
             elif choice == '6':
                 print("Saving session...")
-                et.save()
+                et.close()
                 print("Goodbye!")
                 break 
             else:
@@ -1,3 +1,29 @@
+from datetime import datetime
+
+import export
+from timeline import Timeline
+from pager import TRANSACTION_COLUMNS, tracker_pager, list_pager
+
+# The transaction table without the id column
+REPORT_COLUMNS = TRANSACTION_COLUMNS[1:]
+
+# Months shown by the month-over-month trend
+TREND_MONTHS = 12
+
+
+def months_back(count, last=None):
+    """The `count` months ending with `last` (default: this month) as 'YYYY-MM', oldest first."""
+    last = last or datetime.now()
+    index = last.year * 12 + last.month - 1
+    return [f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(index - count + 1, index + 1)]
+
+
+def _change(now, before):
+    if not before:
+        return "     -"
+    return f"{(now - before) / before * 100:+6.1f}%"
+
+
 class ReportManager:
     def __init__(self, tracker):
         self.tracker = tracker
@@ -9,19 +35,20 @@ class ReportManager:
         print("3. View All Transactions (Merged)")
         print("4. Filter Expenses by Date")
         print("5. Visual Expense Chart (Pie)")
-        print("6. Back to main menu")
+        print("6. Export Transactions (CSV / JSON Lines / columnar)")
+        print("7. Month-over-Month Trends")
+        print("8. Monthly Budget Status")
+        print("9. Year-to-Date Summary")
+        print("10. Back to main menu")
 
     def generate_reports(self):
         while True:
             self.show_report_menu()
             choice = input("Selection: ")
-          
-            expenses = self.tracker.expenses
-            incomes = self.tracker.income
             
             if choice == '1':
-                total_inc = sum(float(i.amount) if isinstance(i.amount, (int, float, str)) else 0 for i in incomes)
-                total_exp = sum(float(e.amount) if isinstance(e.amount, (int, float, str)) else 0 for e in expenses)
+                total_inc = self.tracker.total_income()
+                total_exp = self.tracker.total_expenses()
                 balance = total_inc - total_exp
                 
                 print("\n=== GLOBAL FINANCIAL REPORT ===")
@@ -38,65 +65,204 @@ class ReportManager:
                 input("Press Enter to continue...")
 
             elif choice == '2':
-                if not expenses:
+                if not self.tracker.count('expense'):
                     print("No expenses recorded.")
+                    input("Press Enter...")
                 else:
-                    sorted_exp = sorted(expenses, key=lambda x: x.category)
-                    self.print_transaction_table(sorted_exp, "Expenses by Category")
-                input("Press Enter...")
+                    pager = tracker_pager(self.tracker, 'expense', columns=REPORT_COLUMNS, title="Expenses by Category")
+                    pager.sort('category')
+                    pager.browse()
 
             elif choice == '3':
-                all_transactions = []
-                for e in expenses:
-                    all_transactions.append({
-                        "date": e.date,
-                        "type": "EXPENSE",
-                        "category": e.category,
-                        "amount": -e.amount,
-                        "desc": e.description
-                    })
-                for i in incomes:
-                    all_transactions.append({
-                        "date": i.date,
-                        "type": "INCOME",
-                        "category": i.category,
-                        "amount": i.amount,
-                        "desc": i.description
-                    })
-                
-                all_transactions.sort(key=lambda x: x['date'], reverse=True)
-                
-                print("\n--- CHRONOLOGICAL TIMELINE ---")
-                print(f"{'Date':<12} | {'Type':<8} | {'Category':<12} | {'Amount':<9} | {'Description'}")
-                print("-" * 65)
-                for t in all_transactions:
-                    print(f"{t['date'][:10]:<12} | {t['type']:<8} | {t['category']:<12} | ${t['amount']:<9.2f} | {t['desc']}")
-                input("Press Enter...")
+                self.show_timeline()
 
             elif choice == '4':
                 target = input("Enter date filter (YYYY or YYYY-MM): ").strip()
-                filtered = [e for e in expenses if e.date.startswith(target)]
+                filtered = self.tracker.expenses_in_period(target)
                 
                 if filtered:
                     self.print_transaction_table(filtered, f"Expenses for '{target}'")
+                    print("-" * 35)
+                    for cat, amount in sorted(self.tracker.category_totals(target).items()):
+                        print(f"{cat:<12} | ${amount:.2f}")
+                    print(f"Total spent in {target}: ${self.tracker.total_expenses(target):.2f}")
                 else:
                     print("No records found.")
                 input("Press Enter...")
 
             elif choice == '5':
-                self.visualize_expenses(expenses)
+                self.visualize_expenses(self.tracker.category_totals())
 
             elif choice == '6':
+                self.export_transactions()
+
+            elif choice == '7':
+                self.show_trends()
+
+            elif choice == '8':
+                month = input("Month (YYYY-MM, blank for this month): ").strip() or f"{datetime.now():%Y-%m}"
+                self.show_month_budget(month)
+
+            elif choice == '9':
+                self.show_year_to_date()
+
+            elif choice == '10':
                 break 
             else:
                 print("Invalid selection.")
 
+    def show_timeline(self):
+        # Newest first, one page at a time; see timeline.py
+        timeline = Timeline(self.tracker)
+        page = timeline.top()
+        while True:
+            print("\n--- CHRONOLOGICAL TIMELINE ---")
+            print(f"{'Date':<12} | {'Type':<8} | {'Category':<12} | {'Amount':<9} | {'Description'}")
+            print("-" * 65)
+            if not page:
+                print("No transactions recorded.")
+            for kind, t in page:
+                amount = -t.amount if kind == 'expense' else t.amount
+                print(f"{t.date[:10]:<12} | {kind.upper():<8} | {t.category:<12} | ${amount:<9.2f} | {t.description}")
+            action = input("\n[N]ext (older)  [P]revious (newer)  [T]op  [J]ump to date  [B]ack: ").strip().lower()
+            if action == 'n':
+                if timeline.at_end:
+                    print("No older transactions.")
+                page = timeline.next()
+            elif action == 'p':
+                page = timeline.prev()
+            elif action == 't':
+                page = timeline.top()
+            elif action == 'j':
+                try:
+                    page = timeline.jump(datetime.strptime(input("Date (YYYY-MM-DD): ").strip(), "%Y-%m-%d"))
+                except ValueError:
+                    print("Invalid date format.")
+            elif action == 'b':
+                break
+            else:
+                print("Invalid selection.")
+
+    # The period views below read only the tracker's rollup tables (see rollups.py)
+    def show_trends(self, months=TREND_MONTHS):
+        periods = months_back(months)
+        spent = self.tracker.rollup('expense', 'month', periods[0], periods[-1])
+        earned = self.tracker.rollup('income', 'month', periods[0], periods[-1])
+        print(f"\n--- MONTH-OVER-MONTH TRENDS (last {months} months) ---")
+        print(f"{'Month':<8} | {'Income':>10} | {'Expenses':>10} | {'Net':>10} | {'Spending':>8} | Top category")
+        print("-" * 80)
+        previous = None
+        for month in periods:
+            categories = spent.get(month, {})
+            expense = sum(categories.values())
+            income = sum(earned.get(month, {}).values())
+            top = max(categories.items(), key=lambda item: item[1], default=None)
+            top = f"{top[0]} (${top[1]:.2f})" if top else "-"
+            change = _change(expense, previous) if previous is not None else "     -"
+            print(f"{month:<8} | {income:>10.2f} | {expense:>10.2f} | {income - expense:>10.2f} | {change:>8} | {top}")
+            previous = expense
+        input("Press Enter...")
+
+    def show_month_budget(self, month):
+        try:
+            first = datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            print("Invalid month format.")
+            input("Press Enter...")
+            return
+        spent = self.tracker.rollup('expense', 'month', month, month).get(month, {})
+        budgets = self.tracker.user_data['budgets']
+        total = sum(spent.values())
+        limit = budgets.get('monthly', 0)
+
+        print(f"\n--- BUDGET STATUS FOR {month} ---")
+        if limit > 0:
+            status = "OVER" if total > limit else "OK"
+            print(f"Spent ${total:.2f} of ${limit:.2f} ({total / limit * 100:.0f}%)  [{status}]")
+        else:
+            print(f"Spent ${total:.2f} (no monthly limit set)")
+        now = datetime.now()
+        if (first.year, first.month) == (now.year, now.month) and total:
+            # Straight-line projection over the days elapsed so far
+            next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+            days = (next_month - first).days
+            print(f"Projected for the month at this pace: ${total / now.day * days:.2f}")
+
+        print(f"\n{'Category':<12} | {'Spent':>10} | {'Budget':>10} | {'Left':>10} | Status")
+        print("-" * 60)
+        cat_budgets = budgets.get('categories', {})
+        for cat in sorted(set(spent) | set(cat_budgets)):
+            amount = spent.get(cat, 0)
+            cap = cat_budgets.get(cat)
+            if cap is None:
+                print(f"{cat:<12} | {amount:>10.2f} | {'-':>10} | {'-':>10} |")
+            else:
+                print(f"{cat:<12} | {amount:>10.2f} | {cap:>10.2f} | {cap - amount:>10.2f} | "
+                      f"{'OVER' if amount > cap else 'OK'}")
+        input("Press Enter...")
+
+    def show_year_to_date(self):
+        now = datetime.now()
+        months = months_back(now.month)
+        last_year = months_back(now.month, datetime(now.year - 1, now.month, 1))
+        spent = self.tracker.rollup('expense', 'month', months[0], months[-1])
+        earned = self.tracker.rollup('income', 'month', months[0], months[-1])
+        before = self.tracker.rollup('expense', 'month', last_year[0], last_year[-1])
+
+        total_spent = sum(map(sum, (c.values() for c in spent.values())))
+        total_earned = sum(map(sum, (c.values() for c in earned.values())))
+        spent_before = sum(map(sum, (c.values() for c in before.values())))
+        by_category = {}
+        for categories in spent.values():
+            for cat, amount in categories.items():
+                by_category[cat] = by_category.get(cat, 0) + amount
+
+        print(f"\n=== YEAR TO DATE {now.year} (Jan - {now:%b}) ===")
+        print(f"Income:   +${total_earned:.2f}")
+        print(f"Expenses: -${total_spent:.2f}   ({_change(total_spent, spent_before).strip()} vs same period {now.year - 1})")
+        print(f"Net:       ${total_earned - total_spent:.2f}")
+        print(f"Average monthly spending: ${total_spent / len(months):.2f}")
+
+        print(f"\n{'Month':<8} | {'Income':>10} | {'Expenses':>10}")
+        print("-" * 34)
+        for month in months:
+            print(f"{month:<8} | {sum(earned.get(month, {}).values()):>10.2f} | "
+                  f"{sum(spent.get(month, {}).values()):>10.2f}")
+
+        print(f"\n{'Category':<12} | {'Spent':>10} | Share")
+        print("-" * 34)
+        for cat, amount in sorted(by_category.items(), key=lambda item: -item[1]):
+            share = amount / total_spent * 100 if total_spent else 0
+            print(f"{cat:<12} | {amount:>10.2f} | {share:5.1f}%")
+        input("Press Enter...")
+
+    def export_transactions(self):
+        path = input("Export to file (.csv, .jsonl or .col): ").strip()
+        kind = input("Type (expense/income, blank for both): ").strip().lower() or None
+        category = input("Category (blank for all): ").strip() or None
+        try:
+            start = input("From date (YYYY-MM-DD, blank for start): ").strip()
+            end = input("To date (YYYY-MM-DD, blank for latest): ").strip()
+            start = datetime.strptime(start, "%Y-%m-%d") if start else None
+            end = datetime.strptime(end, "%Y-%m-%d") if end else None
+        except ValueError:
+            print("Invalid date format.")
+            input("Press Enter...")
+            return
+        if kind not in (None, 'expense', 'income'):
+            print("Type must be expense or income.")
+        else:
+            try:
+                count = export.export(self.tracker, path, start, end, category, kind)
+                print(f"Exported {count} transaction(s) to {path}")
+            except (OSError, ValueError) as e:
+                print(f"[Export Error] {e}")
+        input("Press Enter...")
+
     def print_transaction_table(self, expense_list, title):
-        print(f"\n--- {title} ---")
-        for e in expense_list:
-            print(f"{e.date[:10]:<12} | {e.category:<12} | ${e.amount:<9.2f} | {e.description}")
+        list_pager(expense_list, columns=REPORT_COLUMNS, title=title).browse()
 
-    def visualize_expenses(self, expenses):
+    def visualize_expenses(self, cat_totals):
         print("\n>> Generating Visualization...")
         try:
             import matplotlib.pyplot as plt
@@ -105,11 +271,6 @@ class ReportManager:
             input("Press Enter...")
             return
 
-        cat_totals = {}
-        for e in expenses:
-            cat = e.category
-            cat_totals[cat] = cat_totals.get(cat, 0) + e.amount
-        
         if not cat_totals:
             print("No data to visualize yet.")
             return
@@ -0,0 +1,107 @@
+import math
+
+
+def amount_of(x):
+    try:
+        return float(x.amount) if isinstance(x.amount, (int, float, str)) else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def _category(x):
+    return x.category if x.category else "Other"
+
+
+class _Sums:
+    """Running totals per key, with counts so empty keys disappear.
+
+    Dropping a key as soon as its last record is removed keeps float drift
+    from add/remove cycles from accumulating forever.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, key, amount):
+        self.totals[key] = self.totals.get(key, 0) + amount
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def remove(self, key, amount):
+        count = self.counts.get(key, 0) - 1
+        if count <= 0:
+            self.totals.pop(key, None)
+            self.counts.pop(key, None)
+        else:
+            self.totals[key] -= amount
+            self.counts[key] = count
+
+    def get(self, key):
+        return self.totals.get(key, 0)
+
+
+class Aggregates:
+    """Totals maintained incrementally as transactions are added, edited or removed.
+
+    Every update is O(1), so the overall and per-category totals are read
+    instead of rescanning every expense. Per-period totals live in the
+    rollups (see rollups.py).
+    """
+
+    def __init__(self):
+        self.rebuild([], [])
+
+    def rebuild(self, expenses, income):
+        self.expense_total = 0.0
+        self.income_total = 0.0
+        self.expense_count = 0
+        self.income_count = 0
+        self.by_category = _Sums()
+        self.income_by_category = _Sums()
+        for e in expenses:
+            self.add('expense', e)
+        for i in income:
+            self.add('income', i)
+
+    def add(self, kind, record):
+        amount = amount_of(record)
+        if kind == 'expense':
+            self.expense_total += amount
+            self.expense_count += 1
+            self.by_category.add(_category(record), amount)
+        else:
+            self.income_total += amount
+            self.income_count += 1
+            self.income_by_category.add(_category(record), amount)
+
+    def remove(self, kind, record):
+        amount = amount_of(record)
+        if kind == 'expense':
+            self.expense_count -= 1
+            self.expense_total = self.expense_total - amount if self.expense_count else 0.0
+            self.by_category.remove(_category(record), amount)
+        else:
+            self.income_count -= 1
+            self.income_total = self.income_total - amount if self.income_count else 0.0
+            self.income_by_category.remove(_category(record), amount)
+
+    def category_total(self, category):
+        return self.by_category.get(category)
+
+    def category_totals(self):
+        return dict(self.by_category.totals)
+
+    def matches(self, other, rel_tol=1e-9, abs_tol=1e-6):
+        """True if `other` holds the same totals, allowing for float rounding."""
+        def close(a, b):
+            return math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+
+        def same(x, y):
+            return x.counts == y.counts and all(close(x.totals[k], y.totals[k]) for k in x.totals)
+
+        return (self.expense_count == other.expense_count
+                and self.income_count == other.income_count
+                and close(self.expense_total, other.expense_total)
+                and close(self.income_total, other.income_total)
+                and same(self.by_category, other.by_category)
+                and same(self.income_by_category, other.income_by_category))
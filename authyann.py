@@ -1,30 +1,44 @@
-import json
 import os
 
+from credentials import CredentialStore
+from sqlite_storage import SqliteStorage
+from storage import ShardedStorage
+from tracker import forget_password
+
+# Usernames and password hashes only; see credentials.py
+_credentials = None
+
+def credential_store():
+    global _credentials
+    if _credentials is None:
+        _credentials = CredentialStore(on_migrate=forget_plaintext)
+    return _credentials
+
+def forget_plaintext(user_name):
+    # Once hashed, the users.json password is gone; so must be the copies migrated with the profile
+    storage = ShardedStorage()
+    if storage.exists():
+        forget_password(storage, user_name)
+    db_path = os.environ.get('EXPENSE_TRACKER_DB')
+    if db_path and os.path.exists(db_path):
+        storage = SqliteStorage(db_path)
+        try:
+            forget_password(storage, user_name)
+        finally:
+            storage.close()
+
 def requestUserCredentials():
     username = input("Enter username: ")
     password = input("Enter password: ")
     return username, password
 
-def verifyUserCredentials(userName: str, password: str, oldData: list[dict]):
-    # check if user exists
-    for user in oldData:
-        if user["userName"] == userName and user["password"] == password:
-            return True
-    return False
-
-def load_users():
-    filename = "users.json"
-    if not os.path.exists(filename):
-        with open(filename, "w") as f:
-            json.dump([], f)
-    with open(filename, "r") as f:
-        return json.load(f)
-
-def save_users(users):
-    filename = "users.json"
-    with open(filename, "w") as f:
-        json.dump(users, f, indent=2)
+def verifyUserCredentials(userName: str, password: str):
+    # One dict lookup and one hash check; plaintext users.json accounts are migrated on first login
+    return credential_store().verify(userName, password)
+
+def register_user(user_name, password):
+    # The check and the insert happen under the credential file's lock
+    return credential_store().register(user_name, password)
 
 def login_menu():
     print("welcome to personal expense tracker")
@@ -37,11 +51,10 @@ def login_menu():
         choose = input("Enter your choice: ")
 
         if choose == "1":
-            users = load_users()
             user_name, password = requestUserCredentials()
-            
+
             # verify data entered
-            if verifyUserCredentials(user_name, password, users):
+            if verifyUserCredentials(user_name, password):
                 print("Access granted")
                 print("welcome to main menu")
  
@@ -51,15 +64,14 @@ def login_menu():
                 print("Invalid username or password.")
 
         elif choose == "2":
-            users = load_users()
             user_name, password = requestUserCredentials()
             
             # check if user exists already
-            if any(user["userName"] == user_name for user in users):
+            if not user_name.strip() or not password:
+                print("Username and password cannot be empty.")
+            elif not register_user(user_name, password):
                 print("Username already exists. Choose a different one.")
             else:
-                users.append({"userName": user_name, "password": password})
-                save_users(users)
                 print("Registration successful")
 
         elif choose == "3":
@@ -0,0 +1,532 @@
+"""Micro-benchmarks for the tracker's hot paths, and a suite for tracking them over time.
+
+Run with:  python benchmark.py [sizes...]     e.g.  python benchmark.py 100000 1000000
+
+The suite generates N users x M transactions per scale (deterministically,
+so runs are comparable), then measures load and save time, per-operation
+latency percentiles for the calls behind the menus, and peak memory, and
+writes everything as JSON:
+
+    python benchmark.py suite [--users N] [--transactions M ...] [--ops K] [--seed S] [--out results.json]
+"""
+import argparse
+import builtins
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from Budget import BudgetManager
+from Reports import ReportManager
+from expense import Expense
+from snapshot import HAVE_NUMPY, Snapshot, write_snapshot
+from storage import JsonFileStorage, MemoryStorage, ShardedStorage
+from tracker import ExpenseTracker, period_bounds
+
+CATEGORIES = ["Food", "Transport", "Entertainment", "Utilities", "Other"]
+WORDS = ["coffee", "grocery", "taxi", "rent", "cinema", "electricity", "lunch", "train", "gift", "book"]
+
+
+def synthetic_expenses(n, seed=42, start=datetime(2020, 1, 1), days=5 * 365):
+    rng = random.Random(seed)
+    return [{
+        'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'amount': round(rng.uniform(1, 500), 2),
+        'category': rng.choice(CATEGORIES),
+        'date': (start + timedelta(seconds=rng.randrange(days * 86400))).isoformat(),
+        'description': f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+    } for _ in range(n)]
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def linear_search(records, start, end, min_amount, max_amount):
+    # What search() cost before the sorted indexes: a full pass over every record
+    lo, hi = start.isoformat(), (end + timedelta(days=1)).isoformat()
+    return [x for x in records
+            if lo <= x.date < hi and min_amount <= x.amount <= max_amount]
+
+
+@dataclass
+class DataclassExpense:
+    # The record type before record.Record: a dataclass with a per-instance __dict__
+    id: str
+    amount: float
+    category: str
+    date: str
+    description: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], float(data['amount']), str(data['category']), str(data['date']),
+                   str(data['description']))
+
+
+def retained_bytes(cls, text):
+    # Heap still held by the records once the parsed JSON is dropped
+    gc.collect()
+    tracemalloc.start()
+    raw = json.loads(text)
+    records = [cls.from_dict(d) for d in raw]
+    del raw
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def bench_memory(n):
+    text = json.dumps(synthetic_expenses(n))
+    before = retained_bytes(DataclassExpense, text)
+    after = retained_bytes(Expense, text)
+    per = 100_000 / n / 2 ** 20
+    print(f"n={n:>9,}  memory per 100k records: dataclass {before * per:7.1f} MiB "
+          f"slotted {after * per:7.1f} MiB ({after / before:.0%})")
+
+
+def peak_bytes(fn):
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+
+def bench_users_file(users, per_user):
+    # One shared users.json: load and save a single profile among many
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.json')
+        with open(path, 'w') as f:
+            json.dump([{'userName': f'user{i}', 'expenses': synthetic_expenses(per_user, seed=i)}
+                       for i in range(users)], f, indent=4)
+        size = os.path.getsize(path)
+        target = f'user{users // 2}'
+        storage = JsonFileStorage(path)
+
+        def full_load():
+            with open(path) as f:
+                return next(u for u in json.load(f) if u['userName'] == target)
+
+        old_peak, expected = peak_bytes(full_load)
+        load_peak, profile = peak_bytes(lambda: storage.load(target))
+        assert profile == expected
+        load_time, _ = timed(lambda: storage.load(target), repeat=3)
+        save_peak, _ = peak_bytes(lambda: storage.save(target, profile))
+        save_time, _ = timed(lambda: storage.save(target, profile), repeat=3)
+    mib = 2 ** 20
+    print(f"users.json {size / mib:6.1f} MiB ({users} users): peak memory json.load {old_peak / mib:7.1f} MiB | "
+          f"streaming load {load_peak / mib:5.1f} MiB ({load_time * 1e3:.0f}ms) "
+          f"save {save_peak / mib:5.1f} MiB ({save_time * 1e3:.0f}ms)")
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self, users=None):
+        super().__init__(users)
+        self.writes = 0
+
+    def save(self, username, user_data):
+        self.writes += 1
+        super().save(username, user_data)
+
+
+def bench_write_behind(history, adds):
+    # Data entry on top of an existing history: snapshot per change vs write-behind
+    for write_behind in (False, True):
+        storage = CountingStorage([{'userName': 'bench', 'expenses': synthetic_expenses(history)}])
+        et = ExpenseTracker('bench', storage=storage, write_behind=write_behind)
+        t0 = time.perf_counter()
+        for i in range(adds):
+            et.add_expense(12.5, 'Food', '2024-01-01T12:00:00', 'lunch')
+        et.close()
+        elapsed = time.perf_counter() - t0
+        mode = 'write-behind' if write_behind else 'immediate   '
+        print(f"{adds} adds on {history:,} records, {mode}: {storage.writes:5} snapshot writes, {elapsed:6.2f}s")
+
+
+def bench_startup(n):
+    # Time to first menu (what Main does before it), eager vs lazy, on a saved sharded profile
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ShardedStorage(tmp)
+        storage.save('bench', {'expenses': synthetic_expenses(n)})
+        ExpenseTracker('bench', storage=storage).save()  # writes the sidecars
+        eager, _ = timed(lambda: ExpenseTracker('bench', storage=storage, journal=True), repeat=3)
+        lazy, et = timed(lambda: ExpenseTracker('bench', storage=storage, journal=True, lazy=True),
+                         repeat=3)
+        assert not et.hydrated and et.count('expense') == n
+        hydrate, _ = timed(et.hydrate, repeat=1)
+    print(f"n={n:>9,}  time to first menu: eager {eager * 1e3:8.1f}ms | lazy {lazy * 1e3:6.1f}ms "
+          f"(records then load in {hydrate * 1e3:.0f}ms, in the background)")
+
+
+def bench_snapshot(n):
+    # Loading records from a JSON profile vs the mapped binary snapshot, and scanning it in place
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, snap_path = os.path.join(tmp, 'profile.json'), os.path.join(tmp, 'profile.snap')
+        raw = synthetic_expenses(n)
+        with open(json_path, 'w') as f:
+            json.dump({'expenses': raw}, f)
+        with open(snap_path, 'wb') as f:
+            write_snapshot(f, {}, [Expense.from_dict(d) for d in raw], [])
+        del raw
+
+        def from_json():
+            with open(json_path) as f:
+                return [Expense.from_dict(d) for d in json.load(f)['expenses']]
+
+        def from_snapshot():
+            with Snapshot(snap_path) as snap:
+                return list(snap.records('expense'))
+
+        def scan():
+            with Snapshot(snap_path) as snap:
+                lo, hi = period_bounds('2022')
+                return snap.total('expense', lo, hi), snap.category_totals('expense')
+
+        load_json, expected = timed(from_json, repeat=3)
+        load_snap, got = timed(from_snapshot, repeat=3)
+        assert [r.to_dict() for r in got] == [r.to_dict() for r in expected]
+        scanned, _ = timed(scan)
+        ratio = os.path.getsize(snap_path) / os.path.getsize(json_path)
+    print(f"n={n:>9,}  records from JSON {load_json * 1e3:7.0f}ms | snapshot {load_snap * 1e3:6.0f}ms "
+          f"({ratio:.0%} of the size) | in-place year + per-category scan {scanned * 1e3:6.2f}ms "
+          f"(numpy={HAVE_NUMPY})")
+
+
+def load_tracker(n):
+    storage = MemoryStorage([{'userName': 'bench', 'expenses': synthetic_expenses(n)}])
+    t0 = time.perf_counter()
+    et = ExpenseTracker('bench', storage=storage)
+    return et, time.perf_counter() - t0
+
+
+def generator_reports(records, month):
+    # The per-row generators Reports/Budget used before the running totals and rollups
+    total = sum(float(e.amount) if isinstance(e.amount, (int, float, str)) else 0 for e in records)
+    by_category = {}
+    for e in records:
+        amount = float(e.amount) if isinstance(e.amount, (int, float, str)) else 0
+        by_category[e.category] = by_category.get(e.category, 0) + amount
+    in_month = sum(float(e.amount) for e in records if e.date.startswith(month))
+    return total, by_category, in_month
+
+
+def tracker_reports(et, month):
+    return et.total_expenses(), et.category_totals(), et.total_expenses(month)
+
+
+def bench_search(et, load, legacy):
+    n = len(et.expenses)
+    start, end = datetime(2022, 3, 1), datetime(2022, 3, 7)
+    scan, expected = timed(lambda: linear_search(legacy, start, end, 50, 100))
+    indexed, got = timed(lambda: et.search(start=start, end=end, min_amount=50, max_amount=100))
+    assert sorted(x.id for x in got) == sorted(x.id for x in expected)
+    amounts, _ = timed(lambda: et.search(min_amount=499, max_amount=500))
+    month, _ = timed(lambda: et.expenses_in_period('2022-03'))
+
+    print(f"n={n:>9,}  load {load:7.2f}s | week+amount range: scan {scan * 1e3:8.2f}ms "
+          f"indexed {indexed * 1e3:7.3f}ms ({scan / indexed:,.0f}x, {len(got)} hits) | "
+          f"amount range {amounts * 1e3:6.3f}ms | month {month * 1e3:6.3f}ms")
+
+
+def bench_reports(et, legacy):
+    n = len(et.expenses)
+    gen, expected = timed(lambda: generator_reports(legacy, '2022-03'), repeat=3)
+    kept, got = timed(lambda: tracker_reports(et, '2022-03'))
+    assert abs(got[0] - expected[0]) < 1e-6 * n and abs(got[2] - expected[2]) < 1e-6 * n
+    assert got[1].keys() == expected[1].keys()
+    period, _ = timed(lambda: et.category_totals('2022'))
+
+    print(f"n={n:>9,}  reports (balance, per-category, month): generators {gen * 1e3:8.2f}ms "
+          f"running totals + rollups {kept * 1e3:7.3f}ms ({gen / kept:,.0f}x) | "
+          f"year by category {period * 1e3:6.3f}ms")
+
+
+# --- suite ---
+
+# category -> (share of expenses, median amount, spread of log(amount), usual hours)
+SPENDING = {
+    "Food": (0.40, 14.0, 0.6, (7, 22)),
+    "Transport": (0.22, 9.0, 0.5, (6, 20)),
+    "Entertainment": (0.13, 32.0, 0.7, (17, 24)),
+    "Utilities": (0.08, 85.0, 0.35, (8, 18)),
+    "Other": (0.17, 40.0, 1.0, (9, 21)),
+}
+DESCRIPTIONS = {
+    "Food": ["coffee", "lunch", "grocery store", "bakery", "dinner out", "market"],
+    "Transport": ["bus pass", "train ticket", "taxi", "fuel", "parking"],
+    "Entertainment": ["cinema", "concert", "streaming", "book", "games"],
+    "Utilities": ["electricity bill", "water bill", "internet", "phone plan", "gas bill"],
+    "Other": ["gift", "pharmacy", "haircut", "hardware store", "clothes"],
+}
+SUITE_SCALES = [1_000, 10_000, 50_000]
+SUITE_USERS = 4
+SUITE_OPS = 200
+SUITE_END = date(2025, 12, 31)
+
+
+def synthetic_profile(user, transactions, seed=42, end=SUITE_END, years=3):
+    """A users.json-style profile: `transactions` expenses plus monthly income and a few budgets.
+
+    Expense categories, amounts (log-normal around a per-category median),
+    hours and weekend spending follow SPENDING; income is a salary on the
+    first of each month plus occasional freelance work. The same arguments
+    always give the same profile.
+    """
+    rng = random.Random(f"{seed}:{user}")
+    first = end - timedelta(days=365 * years - 1)
+    names = list(SPENDING)
+    weights = [SPENDING[c][0] for c in names]
+    expenses = []
+    for category in rng.choices(names, weights, k=transactions):
+        _, median, spread, (start_hour, end_hour) = SPENDING[category]
+        day = first + timedelta(days=rng.randrange((end - first).days + 1))
+        if category == "Entertainment" and day.weekday() < 4 and rng.random() < 0.5:
+            # Nights out cluster at the weekend
+            day += timedelta(days=4 - day.weekday())
+            day = min(day, end)
+        when = datetime(day.year, day.month, day.day, rng.randrange(start_hour, end_hour), rng.randrange(60),
+                        rng.randrange(60))
+        expenses.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'amount': round(rng.lognormvariate(math.log(median), spread), 2),
+            'category': category,
+            'date': when.isoformat(),
+            'description': rng.choice(DESCRIPTIONS[category]),
+        })
+    expenses.sort(key=lambda e: e['date'])
+    income = []
+    salary = round(rng.uniform(2500, 6000), -1)
+    month = date(first.year, first.month, 1)
+    while month <= end:
+        income.append({'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)), 'amount': salary,
+                       'category': "Salary", 'date': datetime(month.year, month.month, 1, 9).isoformat(),
+                       'description': "monthly salary"})
+        if rng.random() < 0.15:
+            income.append({'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                           'amount': round(rng.uniform(200, 1500), 2), 'category': "Freelance",
+                           'date': datetime(month.year, month.month, rng.randrange(2, 28), 15).isoformat(),
+                           'description': "freelance project"})
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    monthly = round(transactions / (12 * years) * 30, -1)
+    return {
+        'userName': f"user{user:04d}",
+        'expenses': expenses,
+        'income': income,
+        'budgets': {'monthly': monthly, 'categories': {'Food': round(monthly * 0.4, -1)},
+                    'rules': [{'category': 'Entertainment', 'period': 'rolling', 'limit': round(monthly * 0.2, -1),
+                               'days': 30},
+                              {'category': None, 'period': 'weekly', 'limit': round(monthly / 4, -1)}]},
+    }
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)] * 1e3
+    return {'count': len(ordered), 'mean_ms': statistics.fmean(ordered) * 1e3, 'p50_ms': at(0.50),
+            'p90_ms': at(0.90), 'p99_ms': at(0.99), 'max_ms': ordered[-1] * 1e3}
+
+
+@contextmanager
+def quiet():
+    # The menu methods print and wait for Enter; swallow both while timing them
+    answer = builtins.input
+    builtins.input = lambda prompt='': ''
+    try:
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = answer
+
+
+def sample(fn, count):
+    times = []
+    for i in range(count):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - t0)
+    return percentiles(times)
+
+
+def open_suite_tracker(username, storage, lazy=False):
+    # Configured like Main.open_tracker
+    return ExpenseTracker(username, storage=storage, journal=True, write_behind=True, lazy=lazy,
+                          snapshot=True)
+
+
+def suite_operations(et, rng, ops):
+    """Latency percentiles for the calls the menus make, on one loaded tracker."""
+    months = sorted({e.date[:7] for e in et.expenses}) or ['2025-01']
+    years = sorted({m[:4] for m in months})
+    terms = [w for words in DESCRIPTIONS.values() for w in words]
+    budget_mgr = BudgetManager(et)
+    report_mgr = ReportManager(et)
+    results = {}
+    with quiet():
+        results['add_expense'] = sample(lambda i: et.add_expense(
+            round(rng.uniform(1, 80), 2), rng.choice(CATEGORIES), f"{rng.choice(months)}-15T12:00:00",
+            rng.choice(terms)), ops)
+        et.flush()
+
+        def search(i):
+            month = rng.choice(months)
+            lo = datetime.strptime(month, "%Y-%m")
+            return et.search(term=rng.choice(terms).split()[0], category=rng.choice((None, rng.choice(CATEGORIES))),
+                             start=lo, end=lo + timedelta(days=27))
+        results['search'] = sample(search, ops)
+        results['search_amount_range'] = sample(lambda i: et.search(min_amount=rng.uniform(0, 100),
+                                                                    max_amount=rng.uniform(100, 200)), ops)
+        results['monthly_summary'] = sample(lambda i: et.monthly_summary(), ops)
+        results['budget_status'] = sample(lambda i: budget_mgr.check_budget_status(), ops)
+        results['report_balance'] = sample(lambda i: (et.total_income(), et.total_expenses()), ops)
+        results['report_period'] = sample(lambda i: (et.expenses_in_period(rng.choice(months)),
+                                                     et.category_totals(rng.choice(years))), ops)
+        results['report_trends'] = sample(lambda i: report_mgr.show_trends(), max(1, ops // 10))
+        results['report_month_budget'] = sample(lambda i: report_mgr.show_month_budget(rng.choice(months)), ops)
+        results['report_year_to_date'] = sample(lambda i: report_mgr.show_year_to_date(), max(1, ops // 10))
+        results['page'] = sample(lambda i: et.page('expense', rng.randrange(max(1, et.count('expense'))), 20,
+                                                    rng.choice((None, 'date', 'amount'))), ops)
+    return results
+
+
+def peak_memory(fn):
+    # Peak traced heap while fn runs, in bytes (tracing slows it down, so not timed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scale(users, transactions, ops, seed):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ShardedStorage(tmp)
+        names = []
+        t0 = time.perf_counter()
+        for user in range(users):
+            profile = synthetic_profile(user, transactions, seed)
+            storage.save(profile['userName'], profile)
+            names.append(profile['userName'])
+        generate = time.perf_counter() - t0
+
+        def each(fn):
+            times = []
+            for name in names:
+                t0 = time.perf_counter()
+                fn(name)
+                times.append(time.perf_counter() - t0)
+            return percentiles(times)
+
+        # The first load parses the JSON; its save writes the sidecars later loads reuse
+        trackers = {}
+        cold = each(lambda name: trackers.__setitem__(name, open_suite_tracker(name, storage)))
+        save = each(lambda name: trackers[name].save())
+        trackers.clear()
+        result = {
+            'users': users,
+            'transactions': transactions,
+            'generate_s': generate,
+            'load_cold': cold,
+            'save': save,
+            'load': each(lambda name: open_suite_tracker(name, storage).close()),
+            'load_lazy': each(lambda name: open_suite_tracker(name, storage, lazy=True)),
+        }
+        et = open_suite_tracker(names[0], storage)
+        result['operations'] = suite_operations(et, rng, ops)
+        result['save_after_operations'] = percentiles([timed(et.save, repeat=1)[0]])
+        et.close()
+        del et
+        result['peak_memory_bytes'] = {
+            'load': peak_memory(lambda: open_suite_tracker(names[0], storage)),
+            'load_lazy': peak_memory(lambda: open_suite_tracker(names[0], storage, lazy=True)),
+        }
+    return result
+
+
+def run_suite(users=SUITE_USERS, scales=SUITE_SCALES, ops=SUITE_OPS, seed=42):
+    """Every scale's measurements, plus enough about the machine to compare runs."""
+    scales_out = []
+    for transactions in scales:
+        result = run_scale(users, transactions, ops, seed)
+        scales_out.append(result)
+        ops_line = "  ".join(f"{name} p50 {r['p50_ms']:.2f}ms p99 {r['p99_ms']:.2f}ms"
+                             for name, r in result['operations'].items() if name in ('add_expense', 'search',
+                                                                                      'monthly_summary'))
+        print(f"users={users} x {transactions:,}: load {result['load']['p50_ms']:.0f}ms "
+              f"(lazy {result['load_lazy']['p50_ms']:.1f}ms) save {result['save']['p50_ms']:.0f}ms "
+              f"peak {result['peak_memory_bytes']['load'] / 2 ** 20:.1f} MiB | {ops_line}", file=sys.stderr)
+    return {
+        'suite': 1,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': HAVE_NUMPY,
+        'seed': seed,
+        'ops': ops,
+        'scales': scales_out,
+    }
+
+
+def suite_main(argv):
+    parser = argparse.ArgumentParser(prog="benchmark.py suite",
+                                     description="Benchmark load, save, operation latency and memory; write JSON.")
+    parser.add_argument('--users', type=int, default=SUITE_USERS)
+    parser.add_argument('--transactions', type=int, nargs='+', default=SUITE_SCALES,
+                        help="transactions per user, one scale each")
+    parser.add_argument('--ops', type=int, default=SUITE_OPS, help="samples per operation")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='-', help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+    results = run_suite(args.users, args.transactions, args.ops, args.seed)
+    text = json.dumps(results, indent=2)
+    if args.out == '-':
+        print(text)
+    else:
+        with open(args.out, 'w') as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['suite']:
+        suite_main(sys.argv[2:])
+        sys.exit()
+    sizes = [int(a) for a in sys.argv[1:]] or [100_000, 1_000_000]
+    for n in sizes:
+        et, load = load_tracker(n)
+        # Baselines run over the pre-slots record type, as the old code did
+        legacy = [DataclassExpense.from_dict(e.to_dict()) for e in et.expenses]
+        bench_search(et, load, legacy)
+        bench_reports(et, legacy)
+        del legacy
+        bench_memory(n)
+        bench_startup(n)
+        bench_snapshot(n)
+    bench_users_file(200, 2000)
+    bench_write_behind(10_000, 200)
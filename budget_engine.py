@@ -0,0 +1,246 @@
+"""Budgets over real periods, with threshold alerts.
+
+A budget rule is a dict kept in the profile's budgets['rules']:
+
+    {'category': 'Food' (None for all spending), 'limit': 200.0,
+     'period': 'monthly' | 'weekly' | 'rolling' | 'custom',
+     'days': 30 (rolling only), 'start': 'YYYY-MM-DD', 'end': 'YYYY-MM-DD' (custom only, inclusive)}
+
+The older budgets['monthly'] and budgets['categories'] limits count as
+monthly rules. Each rule owns a window holding its current spend: one
+running sum for calendar and custom periods, a deque of daily sums for
+rolling ones. An expense change only touches the rules for its category
+and the overall rules, so thresholds are checked in constant time per
+insert. Windows are seeded from the daily rollups when the engine loads
+and when the calendar moves them on.
+"""
+from collections import deque
+from datetime import date
+
+# (fraction of the limit, alert level); a level fires when spending goes past it
+THRESHOLDS = ((0.9, 'near'), (1.0, 'over'))
+PERIODS = ('monthly', 'weekly', 'rolling', 'custom')
+ROLLING_DAYS = 30
+
+
+def day_number(value):
+    """Date ordinal of an ISO date string or date, None if unparseable."""
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def budget_rules(budgets):
+    """Every rule in a profile's budgets dict, the legacy limits included."""
+    if budgets.get('monthly', 0) > 0:
+        yield {'category': None, 'period': 'monthly', 'limit': budgets['monthly']}
+    for category, limit in budgets.get('categories', {}).items():
+        if limit > 0:
+            yield {'category': category, 'period': 'monthly', 'limit': limit}
+    yield from budgets.get('rules', [])
+
+
+def rule_bounds(rule, today):
+    """(first, last) day ordinals, inclusive, of the rule's period containing `today` (an ordinal)."""
+    period = rule['period']
+    if period == 'custom':
+        first, last = day_number(rule['start']), day_number(rule['end'])
+        if first is None or last is None:
+            raise ValueError("custom budgets need start and end dates")
+        return first, last
+    if period == 'rolling':
+        return today - rule.get('days', ROLLING_DAYS) + 1, today
+    day = date.fromordinal(today)
+    if period == 'weekly':
+        first = today - day.weekday()
+        return first, first + 6
+    if period == 'monthly':
+        first = day.replace(day=1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return first.toordinal(), following.toordinal() - 1
+    raise ValueError(f"unknown budget period {period!r}")
+
+
+def describe(rule, first, last):
+    """Human-readable name of a rule's current period."""
+    period = rule['period']
+    if period == 'monthly':
+        return f"{date.fromordinal(first):%Y-%m}"
+    if period == 'weekly':
+        return f"week of {date.fromordinal(first)}"
+    if period == 'rolling':
+        return f"last {last - first + 1} days"
+    return f"{date.fromordinal(first)} to {date.fromordinal(last)}"
+
+
+class Window:
+    """Running spend over a fixed range of days."""
+
+    def __init__(self, first, last, spent=0.0):
+        self.first = first
+        self.last = last
+        self.spent = spent
+
+    def add(self, day, amount):
+        if self.first <= day <= self.last:
+            self.spent += amount
+
+
+class RollingWindow(Window):
+    """Spend over the last n days: a deque of daily sums slid forward a day at a time."""
+
+    def __init__(self, first, last, daily):
+        super().__init__(first, last, sum(daily))
+        self.daily = deque(daily)
+
+    def add(self, day, amount):
+        if self.first <= day <= self.last:
+            self.daily[day - self.first] += amount
+            self.spent += amount
+
+    def slide(self, last, seed):
+        # Drop the days that left the window, seed the ones that entered it
+        for _ in range(min(last - self.last, len(self.daily))):
+            self.spent -= self.daily.popleft()
+            self.first += 1
+            self.last += 1
+            entered = seed(self.last, self.last).get(self.last, 0.0)
+            self.daily.append(entered)
+            self.spent += entered
+        if self.last != last:
+            # Moved further than the window is long: nothing survives
+            span = len(self.daily)
+            totals = seed(last - span + 1, last)
+            self.daily = deque(totals.get(day, 0.0) for day in range(last - span + 1, last + 1))
+            self.first, self.last, self.spent = last - span + 1, last, sum(self.daily)
+
+
+class BudgetAlert:
+    """A budget rule's spend went past one of its thresholds."""
+
+    def __init__(self, rule, level, threshold, spent, period):
+        self.rule = rule
+        self.level = level
+        self.threshold = threshold
+        self.spent = spent
+        self.period = period
+
+    @property
+    def category(self):
+        return self.rule['category']
+
+    @property
+    def limit(self):
+        return self.rule['limit']
+
+    def __str__(self):
+        what = f"'{self.category}'" if self.category else "overall spending"
+        state = "EXCEEDED" if self.level == 'over' else f"reached {self.threshold:.0%} of"
+        return (f"You have {state} your {self.rule['period']} budget for {what} ({self.period}): "
+                f"Spent ${self.spent:.2f} | Limit ${self.limit:.2f}")
+
+
+class BudgetEngine:
+    """Current spend for every budget rule, and alerts as expenses come in.
+
+    `seed(category, first, last)` returns {day ordinal: total} of the
+    expenses in that day range (category None for all of them); the tracker
+    answers it from its daily rollups. Listeners registered with subscribe()
+    are called with a BudgetAlert whenever a change pushes a rule's spend
+    past a threshold.
+    """
+
+    def __init__(self, seed, today=date.today):
+        self.seed = seed
+        self.today = today
+        self.listeners = []
+        self.entries = []
+        self._by_category = {}
+        self._day = None
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def load(self, budgets):
+        """(Re)build every window from the profile's budget rules."""
+        self._day = self.today().toordinal()
+        self.entries = []
+        self._by_category = {}
+        for rule in budget_rules(budgets):
+            try:
+                entry = [rule, self._window(rule)]
+            except (KeyError, TypeError, ValueError):
+                # Malformed rule (bad period or dates): it can't be tracked
+                continue
+            self.entries.append(entry)
+            self._by_category.setdefault(rule['category'], []).append(entry)
+
+    def _window(self, rule):
+        first, last = rule_bounds(rule, self._day)
+        totals = self.seed(rule['category'], first, last)
+        if rule['period'] == 'rolling':
+            return RollingWindow(first, last, [totals.get(day, 0.0) for day in range(first, last + 1)])
+        return Window(first, last, sum(totals.values()))
+
+    def advance(self):
+        """Move calendar and rolling windows on if the day changed.
+
+        Windows entering new days are seeded from the rollups, so call this
+        before the change being reported reaches them (add() and remove()
+        call it too, for callers that report changes ahead of storing them).
+        """
+        today = self.today().toordinal()
+        if today == self._day:
+            return
+        self._day = today
+        for entry in self.entries:
+            rule, window = entry
+            if rule['period'] == 'rolling':
+                window.slide(today, lambda first, last: self.seed(rule['category'], first, last))
+            elif rule['period'] != 'custom' and not window.first <= today <= window.last:
+                entry[1] = self._window(rule)
+
+    def add(self, category, date_value, amount):
+        """An expense was added (or edited to these values); fires alerts for thresholds it crosses."""
+        self._change(category, date_value, amount)
+
+    def remove(self, category, date_value, amount):
+        """An expense was deleted (or edited away from these values)."""
+        self._change(category, date_value, -amount)
+
+    def _change(self, category, date_value, amount):
+        day = day_number(date_value)
+        if day is None or not self.entries:
+            return
+        self.advance()
+        for entry in self._by_category.get(category, []) + self._by_category.get(None, []):
+            rule, window = entry
+            before = window.spent
+            window.add(day, amount)
+            if amount <= 0 or window.spent == before or rule['limit'] <= 0:
+                continue
+            # One alert per change, for the highest threshold it crossed
+            crossed = None
+            for fraction, level in THRESHOLDS:
+                if before <= rule['limit'] * fraction < window.spent:
+                    crossed = fraction, level
+            if crossed is not None:
+                alert = BudgetAlert(rule, crossed[1], crossed[0], window.spent,
+                                    describe(rule, window.first, window.last))
+                for listener in self.listeners:
+                    listener(alert)
+
+    def status(self):
+        """[(rule, spent, period name, level or None)] for every rule, in order."""
+        self.advance()
+        out = []
+        for rule, window in self.entries:
+            level = None
+            for fraction, name in THRESHOLDS:
+                if rule['limit'] > 0 and window.spent > rule['limit'] * fraction:
+                    level = name
+            out.append((rule, window.spent, describe(rule, window.first, window.last), level))
+        return out
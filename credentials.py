@@ -0,0 +1,207 @@
+"""Salted password hashes, kept apart from the transaction data.
+
+credentials.json maps each username to one encoded hash and nothing else,
+so login and registration read a small file and look the name up in a dict
+instead of loading (or scanning) every profile:
+
+    {"version": 1,
+     "users": {"alice": "scrypt$16384$8$1$<salt>$<hash>", ...},
+     "legacy": ["bob", ...]}
+
+Hashes are hashlib.scrypt by default, or PBKDF2-HMAC-SHA256 where scrypt is
+unavailable; the cost is tunable and older, cheaper hashes are upgraded
+the next time their user logs in. "legacy" lists the users.json accounts
+that still have a plaintext password: each is checked against users.json
+once, at its first login, then hashed here and its plaintext removed from
+users.json. The `on_migrate(username)` hook then removes the copies made
+when profiles were moved to other storage (see tracker.forget_password()).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+
+import jsonstream
+from persistence import atomic_open, file_lock
+
+CREDENTIALS_FILE = "credentials.json"
+LEGACY_FILE = "users.json"
+
+# scrypt work factor (CPU/memory cost) and PBKDF2 iteration count; raise over time
+SCRYPT_N = 1 << 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+
+HAVE_SCRYPT = hasattr(hashlib, 'scrypt')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p):
+    # maxmem a little above the 128 * r * n bytes scrypt needs
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n + (1 << 20), dklen=32)
+
+
+def hash_password(password, scheme=None, cost=None):
+    """Encode a new salted hash: 'scrypt$n$r$p$salt$hash' or 'pbkdf2_sha256$iterations$salt$hash'.
+
+    `cost` is scrypt's n (a power of two) or the PBKDF2 iteration count.
+    """
+    scheme = scheme or ('scrypt' if HAVE_SCRYPT else 'pbkdf2_sha256')
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == 'scrypt':
+        n = cost or SCRYPT_N
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(_scrypt(password, salt, n, SCRYPT_R, SCRYPT_P))}"
+    if scheme == 'pbkdf2_sha256':
+        iterations = cost or PBKDF2_ITERATIONS
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"unknown password hash scheme {scheme!r}")
+
+
+def check_password(password, encoded):
+    """True if `password` matches the encoded hash (compared in constant time)."""
+    try:
+        scheme, *fields = encoded.split('$')
+        if scheme == 'scrypt':
+            n, r, p, salt, expected = fields
+            digest = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        elif scheme == 'pbkdf2_sha256':
+            iterations, salt, expected = fields
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), base64.b64decode(salt),
+                                         int(iterations))
+        else:
+            return False
+    except (ValueError, TypeError, AttributeError):
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+def needs_rehash(encoded, scheme, cost):
+    """True if `encoded` uses another scheme or a lower cost than the current settings."""
+    parts = encoded.split('$')
+    if parts[0] != scheme:
+        return True
+    try:
+        return int(parts[1]) < cost
+    except (IndexError, ValueError):
+        return True
+
+
+class CredentialStore:
+    def __init__(self, path=CREDENTIALS_FILE, legacy_file=LEGACY_FILE, scheme=None, cost=None, on_migrate=None):
+        self.path = path
+        self.legacy_file = legacy_file
+        self.on_migrate = on_migrate
+        self.scheme = scheme or ('scrypt' if HAVE_SCRYPT else 'pbkdf2_sha256')
+        self.cost = cost or (SCRYPT_N if self.scheme == 'scrypt' else PBKDF2_ITERATIONS)
+        self._data = None
+        self._stat = None
+        # Hash compared against when the user doesn't exist, so a miss takes as long as a hit
+        self._dummy = hash_password(secrets.token_hex(8), self.scheme, self.cost)
+
+    # --- file ---
+    def _load(self):
+        # Re-read only when another process replaced the file
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size) if st else None
+        if self._data is not None and key == self._stat:
+            return self._data
+        if st is None:
+            self._data = self._create()
+        else:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._data = {'version': 1, 'users': data.get('users', {}), 'legacy': set(data.get('legacy', []))}
+            self._stat = key
+        return self._data
+
+    def _create(self):
+        # First run: every users.json account is waiting to be migrated
+        with file_lock(self.path):
+            if os.path.exists(self.path):
+                self._data, self._stat = None, None
+                return self._load()
+            data = {'version': 1, 'users': {}, 'legacy': set(jsonstream.usernames(self.legacy_file))}
+            self._write(data)
+            return data
+
+    def _write(self, data):
+        with atomic_open(self.path) as f:
+            json.dump({'version': 1, 'users': data['users'], 'legacy': sorted(data['legacy'])}, f, indent=4)
+        st = os.stat(self.path)
+        self._data, self._stat = data, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _update(self, change):
+        # Read-modify-write under the file lock; `change(data)` returns False to skip the write
+        with file_lock(self.path):
+            self._data = None
+            data = self._load()
+            if change(data) is False:
+                return False
+            self._write(data)
+            return True
+
+    # --- accounts ---
+    def exists(self, username):
+        data = self._load()
+        return username in data['users'] or username in data['legacy']
+
+    def verify(self, username, password):
+        """True if the password is right. Migrates a legacy plaintext account on its first success."""
+        data = self._load()
+        encoded = data['users'].get(username)
+        if encoded is None:
+            if username in data['legacy']:
+                return self._migrate(username, password)
+            check_password(password, self._dummy)
+            return False
+        if not check_password(password, encoded):
+            return False
+        if needs_rehash(encoded, self.scheme, self.cost):
+            self.set_password(username, password)
+        return True
+
+    def register(self, username, password):
+        """Add an account; False if the name is taken."""
+        encoded = hash_password(password, self.scheme, self.cost)
+
+        def add(data):
+            if username in data['users'] or username in data['legacy']:
+                return False
+            data['users'][username] = encoded
+        return self._update(add)
+
+    def set_password(self, username, password):
+        encoded = hash_password(password, self.scheme, self.cost)
+
+        def change(data):
+            data['users'][username] = encoded
+            data['legacy'].discard(username)
+        self._update(change)
+
+    def _migrate(self, username, password):
+        record = jsonstream.find_record(self.legacy_file, username)
+        stored = record.get('password') if isinstance(record, dict) else None
+        if not isinstance(stored, str) or not hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')):
+            return False
+        self.set_password(username, password)
+        # Don't leave the plaintext behind in the profile file
+        with file_lock(self.legacy_file):
+            record = jsonstream.find_record(self.legacy_file, username)
+            if record is not None and 'password' in record:
+                del record['password']
+                jsonstream.write_record(self.legacy_file, username, record)
+        if self.on_migrate is not None:
+            self.on_migrate(username)
+        return True
@@ -0,0 +1,195 @@
+"""Streaming export of transactions to CSV, JSON Lines or a compact columnar file.
+
+Every writer consumes (kind, record) pairs, normally from
+ExpenseTracker.iter_timeline(), one at a time, so exporting a history of
+any length needs memory for a single row (or one row group for the
+columnar format) rather than for the whole history.
+
+Columnar layout (all integers little-endian):
+
+    MAGIC
+    row group *:  b'RG' uint32 n, then the columns
+                  kind         uint8[n]    0 = expense, 1 = income
+                  date         int64[n]    microseconds since 1970-01-01, MISSING_DATE if unparseable
+                  amount       float64[n]
+                  category     uint32[n]   position in the footer's category list
+                  id           uint32[n+1] offsets, then the utf-8 bytes
+                  description  uint32[n+1] offsets, then the utf-8 bytes
+    footer:       utf-8 JSON {"version", "rows", "categories", "row_groups": [file offsets]}
+    uint32 footer length, MAGIC
+"""
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+from indexes import date_key
+from persistence import atomic_open
+
+MAGIC = b'ETCOL1\0\0'
+ROW_GROUP = 65536
+MISSING_DATE = -(1 << 63)
+KINDS = ('expense', 'income')
+CSV_HEADER = ('Date', 'Type', 'Category', 'Amount', 'Description', 'ID')
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def write_csv(pairs, f):
+    """CSV with a header that importer.read_csv() maps back without options. Returns the row count."""
+    writer = csv.writer(f)
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for kind, r in pairs:
+        writer.writerow((r.date, kind, r.category, r.amount, r.description, r.id))
+        count += 1
+    return count
+
+
+def write_jsonl(pairs, f):
+    """One JSON object per line: the record's fields plus "type". Returns the row count."""
+    count = 0
+    for kind, r in pairs:
+        row = r.to_dict()
+        row['type'] = kind
+        f.write(json.dumps(row) + "\n")
+        count += 1
+    return count
+
+
+def _micros(record):
+    ts = getattr(record, 'timestamp', None)
+    if ts is None:
+        ts = date_key(record.date)
+        if ts == float('-inf'):
+            return MISSING_DATE
+    return round(ts * 1e6)
+
+
+def _le(column):
+    # Columns are stored little-endian whatever the machine
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _strings(values):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for value in values:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    return _le(offsets) + bytes(blob)
+
+
+def write_columnar(pairs, f):
+    """Binary columnar file (see module docstring), written a row group at a time. Returns the row count."""
+    f.write(MAGIC)
+    categories = {}
+    offsets = []
+    count = 0
+    group = []
+
+    def flush():
+        offsets.append(f.tell())
+        f.write(b'RG' + struct.pack('<I', len(group)))
+        f.write(_le(array('B', (KINDS.index(kind) for kind, _ in group))))
+        f.write(_le(array('q', (_micros(r) for _, r in group))))
+        f.write(_le(array('d', (float(r.amount) for _, r in group))))
+        f.write(_le(array('I', (categories.setdefault(r.category, len(categories)) for _, r in group))))
+        f.write(_strings(str(r.id) for _, r in group))
+        f.write(_strings(str(r.description) for _, r in group))
+        group.clear()
+
+    for pair in pairs:
+        group.append(pair)
+        count += 1
+        if len(group) >= ROW_GROUP:
+            flush()
+    if group:
+        flush()
+    footer = json.dumps({'version': 1, 'rows': count, 'categories': list(categories),
+                         'row_groups': offsets}).encode('utf-8')
+    f.write(footer + struct.pack('<I', len(footer)) + MAGIC)
+    return count
+
+
+def _read(f, typecode, n):
+    column = array(typecode)
+    column.frombytes(f.read(n * column.itemsize))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _read_strings(f, n):
+    offsets = _read(f, 'I', n + 1)
+    blob = f.read(offsets[-1])
+    return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(n)]
+
+
+def read_columnar(path):
+    """Yield the rows of a columnar export as dicts, one row group in memory at a time."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a columnar export")
+        f.seek(-(4 + len(MAGIC)), os.SEEK_END)
+        size = struct.unpack('<I', f.read(4))[0]
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: truncated columnar export")
+        f.seek(-(4 + len(MAGIC) + size), os.SEEK_END)
+        footer = json.loads(f.read(size))
+        categories = footer['categories']
+        for offset in footer['row_groups']:
+            f.seek(offset)
+            if f.read(2) != b'RG':
+                raise ValueError(f"{path}: bad row group at offset {offset}")
+            n = struct.unpack('<I', f.read(4))[0]
+            kinds = _read(f, 'B', n)
+            dates = _read(f, 'q', n)
+            amounts = _read(f, 'd', n)
+            cats = _read(f, 'I', n)
+            ids = _read_strings(f, n)
+            descriptions = _read_strings(f, n)
+            for i in range(n):
+                micros = dates[i]
+                yield {
+                    'type': KINDS[kinds[i]],
+                    'id': ids[i],
+                    'amount': amounts[i],
+                    'category': categories[cats[i]],
+                    'date': (_EPOCH + timedelta(microseconds=micros)).isoformat() if micros != MISSING_DATE else '',
+                    'description': descriptions[i],
+                }
+
+
+# Extension -> (writer, binary file?)
+FORMATS = {
+    '.csv': (write_csv, False),
+    '.jsonl': (write_jsonl, False),
+    '.col': (write_columnar, True),
+}
+
+
+def export(tracker, path, start=None, end=None, category=None, kind=None):
+    """Stream the tracker's transactions, oldest first, to `path` (format picked by extension).
+
+    `kind` limits the export to 'expense' or 'income'; start/end/category
+    filter as in ExpenseTracker.search(). The file is replaced atomically,
+    so an interrupted export never leaves half a file. Returns the row count.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"unknown export format {ext!r}; use one of {', '.join(FORMATS)}")
+    writer, binary = FORMATS[ext]
+    kinds = (kind,) if kind else KINDS
+    pairs = tracker.iter_timeline(start, end, category, kinds)
+    if binary:
+        with atomic_open(path, 'wb') as f:
+            return writer(pairs, f)
+    with atomic_open(path, 'w', newline='') as f:
+        return writer(pairs, f)
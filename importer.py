@@ -0,0 +1,290 @@
+"""Bulk import of bank statements (CSV and OFX).
+
+The readers stream the file and yield one raw row (a dict of strings) per
+transaction without holding the statement in memory. prepare_chunk()
+validates a list of raw rows and turns them into normalized tuples, which
+ExpenseTracker.import_transactions() dedupes and adds with a single save.
+"""
+import csv
+import hashlib
+import html
+import os
+import re
+import uuid
+from datetime import datetime
+
+CHUNK_SIZE = 10_000
+# Errors kept with their line numbers; past this only the count grows
+MAX_ERRORS = 100
+
+# Fixed namespace so the same statement row always gets the same id
+IMPORT_NAMESPACE = uuid.UUID('6f1d3c52-8f0e-4c36-9d4a-2b7e5f0a9c11')
+
+# Lowercased CSV header names accepted for each field
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'booking date', 'value date'),
+    'amount': ('amount', 'transaction amount', 'value'),
+    'debit': ('debit', 'withdrawal', 'withdrawals', 'money out', 'paid out'),
+    'credit': ('credit', 'deposit', 'deposits', 'money in', 'paid in'),
+    'description': ('description', 'memo', 'details', 'narrative', 'payee', 'name', 'transaction description'),
+    'category': ('category',),
+    'type': ('type', 'kind'),
+    'id': ('id', 'transaction id', 'fitid', 'reference'),
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d.%m.%Y', '%Y%m%d', '%d %b %Y', '%b %d, %Y')
+
+EXPENSE_TYPES = {'expense', 'debit', 'dr', 'withdrawal', 'payment', 'pos', 'atm', 'fee', 'srvchg', 'check'}
+INCOME_TYPES = {'income', 'credit', 'cr', 'deposit', 'int', 'div', 'dep', 'directdep'}
+
+
+def read_statement(path, **kwargs):
+    """Rows from a .csv or .ofx/.qfx file, picked by extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.ofx', '.qfx'):
+        return read_ofx(path, **kwargs)
+    return read_csv(path, **kwargs)
+
+
+def _column_map(header, columns=None):
+    # field -> column position, from explicit names or the known aliases
+    lowered = [h.strip().lower() for h in header]
+    found = {}
+    for field, aliases in CSV_COLUMNS.items():
+        wanted = (columns or {}).get(field)
+        names = (wanted.lower(),) if wanted else aliases
+        for name in names:
+            if name in lowered:
+                found[field] = lowered.index(name)
+                break
+    return found
+
+
+def read_csv(path, columns=None, kind=None, category=None):
+    """Yield raw rows from a CSV statement with a header line.
+
+    `columns` maps field names (date, amount, debit, credit, description,
+    category, type, id) to header names when the defaults don't match.
+    `kind` forces every row to 'expense' or 'income' (amounts taken as
+    absolute values); otherwise a type column, debit/credit columns or the
+    sign of the amount decides (negative = expense).
+    """
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        found = _column_map(header, columns)
+        if 'date' not in found or not ({'amount', 'debit', 'credit'} & set(found)):
+            raise ValueError(f"{path}: need a date column and an amount (or debit/credit) column")
+        fields = list(found.items())
+        width = max(found.values()) + 1
+        for line, values in enumerate(reader, start=2):
+            if not values:
+                continue
+            if len(values) < width:
+                values = values + [''] * (width - len(values))
+            row = {field: values[i] for field, i in fields}
+            row['path'] = path
+            row['line'] = line
+            if kind:
+                row['type'] = kind
+            if category and not row.get('category'):
+                row['category'] = category
+            yield row
+
+
+_OFX_BLOCK = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+_OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+_OFX_ACCOUNT = re.compile(r'<ACCTID>([^<\r\n]*)', re.I)
+
+
+def read_ofx(path, kind=None, category=None, chunk_size=1 << 16):
+    """Yield raw rows from an OFX/QFX statement (SGML 1.x or XML 2.x).
+
+    The file is read in chunks and each <STMTTRN> block is parsed as soon as
+    it is complete. 'line' is the transaction's position in the file.
+    """
+    account = ''
+    count = 0
+    buf = ''
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            if not account:
+                m = _OFX_ACCOUNT.search(buf)
+                if m:
+                    account = m.group(1).strip()
+            end = 0
+            for m in _OFX_BLOCK.finditer(buf):
+                end = m.end()
+                tags = {k.upper(): html.unescape(v.strip()) for k, v in _OFX_FIELD.findall(m.group(1))}
+                count += 1
+                row = {
+                    'path': path,
+                    'line': count,
+                    'date': tags.get('DTPOSTED', '')[:8],
+                    'amount': tags.get('TRNAMT', ''),
+                    'description': tags.get('NAME') or tags.get('MEMO', ''),
+                    'type': kind or '',
+                }
+                if tags.get('FITID'):
+                    # FITIDs are only unique within one account
+                    row['id'] = f"ofx:{account}:{tags['FITID']}"
+                if category:
+                    row['category'] = category
+                yield row
+            if not chunk:
+                return
+            # Keep only what may be the start of the next block
+            buf = buf[end:]
+            start = buf.upper().find('<STMTTRN>')
+            buf = buf[start:] if start >= 0 else buf[-64:]
+
+
+_dates = {}
+
+
+def _parse_date(value):
+    # Statements repeat the same few thousand dates, so parse each once
+    iso = _dates.get(value)
+    if iso is None:
+        text = value.strip()
+        try:
+            iso = datetime.fromisoformat(text).isoformat()
+        except ValueError:
+            for fmt in DATE_FORMATS:
+                try:
+                    iso = datetime.strptime(text, fmt).isoformat()
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"unrecognised date {value!r}")
+        if len(_dates) < 100_000:
+            _dates[value] = iso
+    return iso
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = value.strip()
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    negative = text.startswith('(') and text.endswith(')') or text.startswith('-') or text.endswith('-')
+    cleaned = re.sub(r'[^0-9.]', '', text.replace(',', ''))
+    if not cleaned:
+        raise ValueError(f"unrecognised amount {value!r}")
+    amount = float(cleaned)
+    return -amount if negative else amount
+
+
+def fingerprint(kind, date, amount, description):
+    """What makes two statement rows the same transaction when neither has a bank id."""
+    return f"{kind}|{date[:10]}|{amount:.2f}|{' '.join(description.lower().split())}"
+
+
+def _uuid5(name):
+    # uuid.uuid5() as 16 raw bytes, without building UUID objects per row
+    raw = bytearray(hashlib.sha1(IMPORT_NAMESPACE.bytes + name.encode('utf-8')).digest()[:16])
+    raw[6] = (raw[6] & 0x0F) | 0x50
+    raw[8] = (raw[8] & 0x3F) | 0x80
+    return bytes(raw)
+
+
+def make_key(row_id, fp, occurrence):
+    """Compact record id (see record.compact_id) for an imported row.
+
+    Bank ids and UUIDs are reused; otherwise the nth row with a given
+    fingerprint always gets the same id, so re-imports line up.
+    """
+    if row_id:
+        try:
+            return uuid.UUID(row_id).bytes
+        except ValueError:
+            return _uuid5(row_id)
+    return _uuid5(f"{fp}#{occurrence}")
+
+
+def normalize(row):
+    """(kind, amount, category, date, description, id, fingerprint) for one raw row; raises ValueError."""
+    date = _parse_date(str(row.get('date', '')))
+    amount = _parse_amount(row.get('amount', ''))
+    kind = str(row.get('type') or '').strip().lower()
+    if amount is None:
+        debit = _parse_amount(row.get('debit', ''))
+        credit = _parse_amount(row.get('credit', ''))
+        if debit:
+            amount, kind = abs(debit), kind or 'expense'
+        elif credit:
+            amount, kind = abs(credit), kind or 'income'
+        else:
+            raise ValueError("no amount")
+    if kind in EXPENSE_TYPES:
+        kind = 'expense'
+    elif kind in INCOME_TYPES:
+        kind = 'income'
+    elif kind:
+        raise ValueError(f"unknown transaction type {row.get('type')!r}")
+    else:
+        kind = 'expense' if amount < 0 else 'income'
+    amount = abs(amount)
+    if amount == 0:
+        raise ValueError("zero amount")
+    category = str(row.get('category') or '').strip() or 'Other'
+    description = str(row.get('description') or '').strip()
+    return (kind, amount, category, date, description, str(row.get('id') or '').strip(),
+            fingerprint(kind, date, amount, description))
+
+
+def prepare_chunk(rows):
+    """Validate a list of raw rows. Returns (normalized tuples, [(path, line, message), ...])."""
+    good = []
+    errors = []
+    for row in rows:
+        try:
+            good.append(normalize(row))
+        except (ValueError, TypeError) as e:
+            errors.append((row.get('path'), row.get('line'), str(e)))
+    return good, errors
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def prepared_chunks(rows, chunk_size=CHUNK_SIZE):
+    """prepare_chunk() results for successive chunks of `rows`, in input order."""
+    return map(prepare_chunk, chunked(rows, chunk_size))
+
+
+def import_files(tracker, paths, **kwargs):
+    """Import several statements into `tracker`; returns the combined result."""
+    def rows():
+        for path in paths:
+            yield from read_statement(path, **kwargs)
+    return tracker.import_transactions(rows())
+
+
+def print_result(result):
+    print(f"Imported {result['added']} transaction(s); skipped {result['duplicates']} duplicate(s)"
+          f" and {result['invalid']} invalid row(s).")
+    print(f"{result['rows']} row(s) in {result['seconds']:.1f}s ({result['rows_per_sec']:,.0f} rows/sec)")
+    for path, line, message in result['errors']:
+        print(f"  {path or '<input>'} line {line}: {message}")
+    if result['invalid'] > len(result['errors']):
+        print(f"  ... and {result['invalid'] - len(result['errors'])} more")
+
@@ -0,0 +1,310 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from aggregates import amount_of
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def date_key(value):
+    """Seconds since the epoch for an ISO date string (naive, local wall time).
+
+    Unparseable dates sort before everything else instead of raising.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return float('-inf')
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH).total_seconds()
+
+
+def record_date_key(record):
+    # Records with a compact timestamp skip re-parsing the ISO string
+    ts = getattr(record, 'timestamp', None)
+    return ts if ts is not None else date_key(record.date)
+
+
+class SortedIndex:
+    """Records kept ordered by a numeric key, for O(log n + k) range queries.
+
+    Keys and records live in parallel chunks of at most 2 * CHUNK entries
+    (with the largest key of each chunk in `maxes`), so an insert or removal
+    only shifts one small chunk instead of the whole list.
+    """
+
+    CHUNK = 512
+
+    def __init__(self, key):
+        self.key = key
+        self.rebuild([])
+
+    def __len__(self):
+        return self._len
+
+    def rebuild(self, records):
+        pairs = sorted(((self.key(r), r) for r in records), key=lambda p: p[0])
+        size = self.CHUNK
+        self._keys = [[k for k, _ in pairs[i:i + size]] for i in range(0, len(pairs), size)]
+        self._items = [[r for _, r in pairs[i:i + size]] for i in range(0, len(pairs), size)]
+        self._maxes = [keys[-1] for keys in self._keys]
+        self._len = len(pairs)
+
+    def add(self, record):
+        k = self.key(record)
+        self._len += 1
+        if not self._maxes:
+            self._keys.append([k])
+            self._items.append([record])
+            self._maxes.append(k)
+            return
+        c = min(bisect_right(self._maxes, k), len(self._maxes) - 1)
+        keys, items = self._keys[c], self._items[c]
+        i = bisect_right(keys, k)
+        keys.insert(i, k)
+        items.insert(i, record)
+        self._maxes[c] = keys[-1]
+        if len(keys) > 2 * self.CHUNK:
+            half = len(keys) // 2
+            self._keys[c:c + 1] = [keys[:half], keys[half:]]
+            self._items[c:c + 1] = [items[:half], items[half:]]
+            self._maxes[c:c + 1] = [keys[half - 1], keys[-1]]
+
+    def remove(self, record):
+        k = self.key(record)
+        c = bisect_left(self._maxes, k)
+        # Equal keys may spill over several chunks
+        while c < len(self._maxes):
+            keys, items = self._keys[c], self._items[c]
+            i = bisect_left(keys, k)
+            while i < len(keys) and keys[i] == k:
+                if items[i] is record:
+                    del keys[i]
+                    del items[i]
+                    self._len -= 1
+                    if keys:
+                        self._maxes[c] = keys[-1]
+                    else:
+                        del self._keys[c], self._items[c], self._maxes[c]
+                    return True
+                i += 1
+            if i < len(keys):
+                return False
+            c += 1
+        return False
+
+    def _bisect(self, k, right=False):
+        # Global position of k as (chunk, offset)
+        c = bisect_right(self._maxes, k) if right else bisect_left(self._maxes, k)
+        if c == len(self._maxes):
+            return c, 0
+        keys = self._keys[c]
+        return c, (bisect_right(keys, k) if right else bisect_left(keys, k))
+
+    def _span(self, lo=None, hi=None, hi_inclusive=False):
+        start = (0, 0) if lo is None else self._bisect(lo)
+        stop = (len(self._maxes), 0) if hi is None else self._bisect(hi, right=hi_inclusive)
+        return start, max(start, stop)
+
+    def _chunks(self, start, stop):
+        # Slices of the item chunks between two (chunk, offset) positions
+        (sc, so), (ec, eo) = start, stop
+        if sc == ec:
+            if sc < len(self._items):
+                yield self._items[sc][so:eo]
+            return
+        yield self._items[sc][so:]
+        for c in range(sc + 1, ec):
+            yield self._items[c]
+        if ec < len(self._items) and eo:
+            yield self._items[ec][:eo]
+
+    def count(self, lo=None, hi=None, hi_inclusive=False):
+        return sum(len(chunk) for chunk in self._chunks(*self._span(lo, hi, hi_inclusive)))
+
+    def range(self, lo=None, hi=None, hi_inclusive=False):
+        """Records with lo <= key < hi (or <= hi), in key order."""
+        result = []
+        for chunk in self._chunks(*self._span(lo, hi, hi_inclusive)):
+            result.extend(chunk)
+        return result
+
+    def iter_range(self, lo=None, hi=None, hi_inclusive=False, reverse=False):
+        """Like range(), but yields the records lazily (newest first with reverse).
+
+        Positioning costs O(log n) and nothing is copied, so taking the first
+        k records costs O(log n + k). The index must not change while the
+        generator is being consumed.
+        """
+        start, stop = self._span(lo, hi, hi_inclusive)
+        if not reverse:
+            for chunk in self._chunks(start, stop):
+                yield from chunk
+            return
+        (sc, so), (ec, eo) = start, stop
+        for c in range(min(ec, len(self._items) - 1), sc - 1, -1):
+            items = self._items[c]
+            end = eo if c == ec else len(items)
+            first = so if c == sc else 0
+            for i in range(end - 1, first - 1, -1):
+                yield items[i]
+
+    def slice(self, start, stop, reverse=False):
+        """Records at positions start..stop in key order (or in reverse order), for paging."""
+        if reverse:
+            start, stop = self._len - stop, self._len - start
+        start, stop = max(start, 0), min(stop, self._len)
+        result = []
+        pos = 0
+        for items in self._items:
+            if pos >= stop:
+                break
+            end = pos + len(items)
+            if end > start:
+                result.extend(items[max(start - pos, 0):stop - pos])
+            pos = end
+        return result[::-1] if reverse else result
+
+    @property
+    def items(self):
+        return self.range()
+
+
+def date_index():
+    return SortedIndex(record_date_key)
+
+
+def amount_index():
+    return SortedIndex(amount_of)
+
+
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return set(_WORD.findall(text.lower())) if text else set()
+
+
+def parse_query(query):
+    """Split a search query into (word prefixes, infix patterns), all lowercase.
+
+    Every returned term must match: a prefix starts some word of the
+    description, an infix pattern ('*offee') appears anywhere in it.
+    """
+    prefixes, infix = [], []
+    for t in query.lower().split():
+        if t.startswith('*'):
+            infix.append(t.strip('*'))
+            continue
+        tokens = _WORD.findall(t)
+        if tokens:
+            prefixes.extend(tokens)
+        else:
+            # Pure punctuation can't be tokenized; treat it as an infix pattern
+            infix.append(t)
+    return prefixes, [p for p in infix if p]
+
+
+class TextIndex:
+    """Inverted index from description tokens to transactions.
+
+    Query terms match tokens by prefix ("cof" finds "coffee shop") and
+    several terms are ANDed together. A term starting with '*' is an infix
+    pattern ("*offee") and is answered with a substring scan over whatever
+    candidates the other terms left.
+
+    Postings hold small integer document numbers rather than ids; deleted
+    documents leave a tombstone that is compacted away once they pile up.
+    """
+
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.docs = list(records)
+        self.doc_of = {r.key: n for n, r in enumerate(self.docs)}
+        self.postings = {}
+        for n, r in enumerate(self.docs):
+            for token in tokenize(r.description):
+                self.postings.setdefault(token, set()).add(n)
+        self.vocab = sorted(self.postings)
+        self.tombstones = 0
+
+    def add(self, record):
+        n = len(self.docs)
+        self.docs.append(record)
+        self.doc_of[record.key] = n
+        for token in tokenize(record.description):
+            docs = self.postings.get(token)
+            if docs is None:
+                docs = self.postings[token] = set()
+                self.vocab.insert(bisect_left(self.vocab, token), token)
+            docs.add(n)
+
+    def remove(self, record):
+        n = self.doc_of.pop(record.key, None)
+        if n is None:
+            return
+        self.docs[n] = None
+        self.tombstones += 1
+        for token in tokenize(record.description):
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.discard(n)
+            if not docs:
+                del self.postings[token]
+                i = bisect_left(self.vocab, token)
+                if i < len(self.vocab) and self.vocab[i] == token:
+                    del self.vocab[i]
+        if self.tombstones > 1024 and self.tombstones * 2 > len(self.docs):
+            self.rebuild([r for r in self.docs if r is not None])
+
+    def _prefix_docs(self, prefix):
+        i = bisect_left(self.vocab, prefix)
+        docs = set()
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            docs |= self.postings[self.vocab[i]]
+            i += 1
+        return docs
+
+    def search(self, query, category=None):
+        """Records whose description matches every term of `query`."""
+        prefixes, infix = parse_query(query)
+        if prefixes:
+            sets = sorted((self._prefix_docs(p) for p in prefixes), key=len)
+            results = [self.docs[n] for n in sorted(sets[0].intersection(*sets[1:]))]
+        else:
+            results = [r for r in self.docs if r is not None]
+        for pattern in infix:
+            results = [r for r in results if pattern in r.description.lower()]
+        if category:
+            wanted = category.lower()
+            results = [r for r in results if r.category.lower() == wanted]
+        return results
+
+    def dump(self, records):
+        """Postings as token -> positions in `records` (the order they are saved in)."""
+        if self.tombstones or len(self.docs) != len(records) or any(a is not b for a, b in zip(self.docs, records)):
+            self.rebuild(records)
+        return {token: sorted(docs) for token, docs in self.postings.items()}
+
+    def load(self, postings, records):
+        """Restore postings written by dump() for the same `records` list."""
+        self.docs = list(records)
+        self.doc_of = {r.key: n for n, r in enumerate(self.docs)}
+        count = len(self.docs)
+        self.postings = {}
+        for token, positions in postings.items():
+            docs = set(positions)
+            if docs and (min(docs) < 0 or max(docs) >= count):
+                raise IndexError(f"posting for {token!r} points past the saved records")
+            self.postings[token] = docs
+        self.vocab = sorted(self.postings)
+        self.tombstones = 0
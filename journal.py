@@ -0,0 +1,87 @@
+import json
+import os
+
+
+class Journal:
+    """Append-only log of tracker mutations, one JSON object per line.
+
+    Entries look like {"op": "add"|"edit"|"delete", "kind": "expense"|"income", ...}.
+    The tracker replays them over the last snapshot on startup and truncates
+    the file whenever it writes a fresh snapshot (compaction).
+
+    Several processes may append to the same journal (under the tracker's
+    lock). The journal remembers how long the file should be given its own
+    reads and writes, so changed_elsewhere() tells when another one did.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+        self._expected = 0
+        self._foreign = False
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        """Append several entries with a single write."""
+        if self._fh is not None and not self._same_file():
+            # Cleared (and maybe restarted) by another process: don't write into the removed file
+            self.close()
+        if self._fh is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._fh = open(self.path, 'ab')
+        data = "".join(json.dumps(e, separators=(',', ':')) + "\n" for e in entries).encode('utf-8')
+        start = self.size()
+        if start != self._expected:
+            self._foreign = True
+        self._fh.write(data)
+        self._fh.flush()
+        self._expected = start + len(data)
+
+    def _same_file(self):
+        try:
+            return os.path.samestat(os.fstat(self._fh.fileno()), os.stat(self.path))
+        except OSError:
+            return False
+
+    def replay(self):
+        self._expected = 0
+        self._foreign = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                self._expected += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; nothing after it is valid
+                    break
+
+    def changed_elsewhere(self):
+        """True if another process appended to or cleared the journal since our last read or write."""
+        return self._foreign or self.size() != self._expected
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._expected = 0
+        self._foreign = False
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
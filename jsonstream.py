@@ -0,0 +1,182 @@
+"""Streaming access to a users.json-style file: one top-level array of user objects.
+
+The scanner walks the file in fixed-size chunks and reports the byte range
+and userName of every element without decoding it, so finding one profile
+or rewriting it costs memory proportional to that profile alone, not to the
+whole file.
+"""
+import json
+import os
+import re
+
+from persistence import atomic_open, file_lock
+
+CHUNK_SIZE = 1 << 16
+
+_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# A complete string, a string cut off by the end of the buffer, or a bracket
+_TOKEN = re.compile(rb'(?P<s>' + _STRING + rb')|(?P<open>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)|(?P<b>[\[\]{}])', re.S)
+# Everything up to the next bracket that changes the depth: plain text, whole
+# strings and whole innermost containers (a transaction object is one of those)
+_PLAIN = rb'[^"\[\]{}]*'
+_FLAT = rb'[\[{]' + _PLAIN + rb'(?:' + _STRING + _PLAIN + rb')*[\]}]'
+_SKIP = re.compile(_PLAIN + rb'(?:(?:' + _STRING + rb'|' + _FLAT + rb')' + _PLAIN + rb')*', re.S)
+_USERNAME_KEY = b'"userName"'
+
+
+def scan_array(f, chunk_size=CHUNK_SIZE):
+    """Yield (start, end, userName) for each object in the top-level array of binary file `f`.
+
+    userName is None when the object has no string "userName" member.
+    Raises ValueError if the file is not a JSON array.
+    """
+    buf = b''
+    base = 0            # file offset of buf[0]
+    pos = 0             # next unscanned position in buf
+    depth = 0
+    start = None
+    name = None
+    pending = False     # last depth-2 token was the "userName" key
+    gap = b''           # bytes since that key, to check for the ':'
+    started = False
+    while True:
+        chunk = f.read(chunk_size)
+        buf = buf[pos:] + chunk
+        base += pos
+        pos = 0
+        size = len(buf)
+        while pos < size:
+            if depth > 2 or (depth == 2 and name is not None):
+                # Nothing but brackets matters here: jump over everything else
+                pos = _SKIP.match(buf, pos).end()
+                if pos == size or buf[pos] == 0x22:
+                    break       # end of buffer, or a string cut off by it
+                at, token = pos, buf[pos:pos + 1]
+                pos += 1
+            else:
+                m = _TOKEN.search(buf, pos)
+                if m is None:
+                    if pending:
+                        gap += buf[pos:]
+                    pos = size
+                    break
+                if m.lastgroup == 'open':
+                    break
+                if not started:
+                    if buf[:m.start()].strip() or m.group() != b'[':
+                        raise ValueError("expected a JSON array")
+                    started = True
+                if pending:
+                    gap += buf[pos:m.start()]
+                at, token, pos = m.start(), m.group(), m.end()
+                if m.lastgroup == 's':
+                    if depth == 2:
+                        if pending and gap.strip() == b':':
+                            name = json.loads(token)
+                            pending = False
+                        else:
+                            pending, gap = token == _USERNAME_KEY, b''
+                    continue
+                pending = False
+            if token in (b'[', b'{'):
+                depth += 1
+                if depth == 2:
+                    start, name = base + at, None
+            else:
+                depth -= 1
+                if depth == 1 and start is not None:
+                    yield start, base + pos, name
+                    start = None
+                elif depth == 0:
+                    return
+                elif depth < 0:
+                    raise ValueError(f"unbalanced bracket at offset {base + at}")
+        if not chunk:
+            if not started:
+                raise ValueError("expected a JSON array")
+            if pos < size:
+                raise ValueError(f"unterminated string at offset {base + pos}")
+            raise ValueError("unexpected end of file")
+
+
+def _read_range(f, start, end):
+    f.seek(start)
+    return f.read(end - start)
+
+
+def find_record(path, username):
+    """Decode and return the object whose userName matches, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        for start, end, name in scan_array(f):
+            if name == username:
+                return json.loads(_read_range(f, start, end))
+    return None
+
+
+def iter_records(path):
+    """Decode the array's objects one at a time."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for start, end, _ in scan_array(f):
+            here = f.tell()
+            record = json.loads(_read_range(f, start, end))
+            f.seek(here)
+            yield record
+
+
+def usernames(path):
+    """userName of every object, without decoding any of them."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return [name for _, _, name in scan_array(f) if name is not None]
+
+
+def _copy_range(src, dst, start, end, chunk_size=CHUNK_SIZE):
+    src.seek(start)
+    remaining = end - start
+    while remaining:
+        data = src.read(min(chunk_size, remaining))
+        if not data:
+            break
+        dst.write(data)
+        remaining -= len(data)
+
+
+def write_record(path, username, record, indent=4):
+    """Replace (or append) the object for `username`, copying every other user through as raw bytes.
+
+    The whole read-modify-write runs under the file's advisory lock, and the
+    new file is fsynced next to the old one and swapped in with os.replace(),
+    so concurrent writers cannot drop each other's users and a crash
+    mid-write leaves the previous file intact.
+    """
+    encoded = json.dumps(record, indent=indent).encode('utf-8')
+    if indent:
+        encoded = encoded.replace(b'\n', b'\n' + b' ' * indent)
+    sep = b',\n' + b' ' * indent if indent else b', '
+    with file_lock(path), atomic_open(path, 'wb') as out:
+        out.write(b'[\n' + b' ' * indent if indent else b'[')
+        first = True
+        replaced = False
+        if os.path.exists(path):
+            with open(path, 'rb') as src:
+                for start, end, name in scan_array(src):
+                    here = src.tell()
+                    if not first:
+                        out.write(sep)
+                    first = False
+                    if name == username and not replaced:
+                        out.write(encoded)
+                        replaced = True
+                    else:
+                        _copy_range(src, out, start, end)
+                    src.seek(here)
+        if not replaced:
+            if not first:
+                out.write(sep)
+            out.write(encoded)
+        out.write(b'\n]' if indent else b']')
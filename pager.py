@@ -0,0 +1,140 @@
+"""Paged tables for the CLI menus.
+
+A Pager asks its source for just the rows on the current page and
+formats them into one string written with a single call, so a redraw
+costs the same with fifty rows or five million.
+"""
+import sys
+
+PAGE_SIZE = 20
+
+# (header, width, cell function) for the id/date/category/amount/description tables
+TRANSACTION_COLUMNS = (
+    ('ID', 36, lambda r: r.id),
+    ('Date', 10, lambda r: r.date[:10] if (r.date and isinstance(r.date, str)) else "N/A"),
+    ('Category', 12, lambda r: r.category if r.category else "N/A"),
+    ('Amount', 8, lambda r: f"{_amount(r):8.2f}"),
+    ('Description', 0, lambda r: r.description if r.description else ""),
+)
+
+
+def _amount(r):
+    try:
+        return float(r.amount) if r.amount is not None else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+class Pager:
+    """Pages over `fetch(offset, limit, sort_key, reverse)`, with `count()` rows in total.
+
+    `sort_keys` lists the orders the source understands; the first is the
+    default. Use tracker_pager() or list_pager() to build one.
+    """
+
+    def __init__(self, fetch, count, columns=TRANSACTION_COLUMNS, page_size=PAGE_SIZE,
+                 sort_keys=(None,), title=None, empty="Nothing to show.", out=None):
+        self.fetch = fetch
+        self.count = count
+        self.columns = columns
+        self.page_size = page_size
+        self.sort_keys = sort_keys
+        self.sort_key = sort_keys[0]
+        self.reverse = False
+        self.title = title
+        self.empty = empty
+        self.out = out
+        self.page_no = 0
+
+    @property
+    def pages(self):
+        return max(1, -(-self.count() // self.page_size))
+
+    def rows(self):
+        self.page_no = min(self.page_no, self.pages - 1)
+        return self.fetch(self.page_no * self.page_size, self.page_size, self.sort_key, self.reverse)
+
+    def render(self):
+        """Format the visible page and write it out in one go."""
+        total = self.count()
+        lines = []
+        if self.title:
+            lines.append(f"\n--- {self.title} ---")
+        rows = self.rows() if total else []
+        if not rows:
+            lines.append(self.empty)
+        else:
+            lines.append("  ".join(f"{h:{w}}" if w else h for h, w, _ in self.columns))
+            lines.append('-' * 90)
+            for r in rows:
+                lines.append("  ".join(f"{fn(r):{w}}" if w else str(fn(r)) for _, w, fn in self.columns))
+            order = self.sort_key or 'added'
+            first = self.page_no * self.page_size + 1
+            lines.append(f"Rows {first}-{first + len(rows) - 1} of {total}  |  page {self.page_no + 1}/{self.pages}"
+                         f"  |  sorted by {order}{' (descending)' if self.reverse else ''}")
+        (self.out or sys.stdout).write("\n".join(lines) + "\n")
+
+    def next(self):
+        self.page_no = min(self.page_no + 1, self.pages - 1)
+
+    def prev(self):
+        self.page_no = max(self.page_no - 1, 0)
+
+    def jump(self, page_no):
+        self.page_no = min(max(page_no - 1, 0), self.pages - 1)
+
+    def sort(self, key, reverse=False):
+        if key in self.sort_keys:
+            self.sort_key, self.reverse, self.page_no = key, reverse, 0
+            return True
+        return False
+
+    ACTIONS = "[N]ext page  [P]rev page  [G]o to page  [O]rder by"
+
+    def handle(self, action):
+        """Apply a paging action typed at a menu prompt. Returns False if it wasn't one."""
+        if action == 'n':
+            self.next()
+        elif action == 'p':
+            self.prev()
+        elif action == 'g':
+            try:
+                self.jump(int(input(f"Page (1-{self.pages}): ")))
+            except ValueError:
+                print("Invalid page number.")
+        elif action == 'o':
+            names = [k or 'added' for k in self.sort_keys]
+            key = input(f"Sort by ({'/'.join(names)}), add ' desc' to reverse: ").strip().lower()
+            name, _, direction = key.partition(' ')
+            if not self.sort(None if name == 'added' else name, direction.strip() == 'desc'):
+                print("Unknown sort key.")
+        else:
+            return False
+        return True
+
+    def browse(self):
+        """Read-only paging loop, for report listings."""
+        while True:
+            self.render()
+            action = input(f"\n{self.ACTIONS}  [B]ack: ").strip().lower()
+            if action in ('b', ''):
+                return
+            if not self.handle(action):
+                print("Invalid selection.")
+
+
+def tracker_pager(tracker, kind, **kwargs):
+    """Pager over one kind of the tracker's records, fetched a page at a time."""
+    return Pager(lambda offset, limit, key, reverse: tracker.page(kind, offset, limit, key, reverse),
+                 lambda: tracker.count(kind),
+                 sort_keys=(None, 'date', 'amount', 'category', 'description'), **kwargs)
+
+
+def list_pager(rows, **kwargs):
+    """Pager over an already built list (search results, report listings), in its own order."""
+    def fetch(offset, limit, key, reverse):
+        if reverse:
+            n = len(rows)
+            return rows[max(n - offset - limit, 0):max(n - offset, 0)][::-1]
+        return rows[offset:offset + limit]
+    return Pager(fetch, lambda: len(rows), **kwargs)
@@ -0,0 +1,105 @@
+"""Crash-safe file writes and advisory locks shared by the storage backends."""
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: locks then only serialize threads of this process
+    fcntl = None
+
+
+# mkstemp creates files 0600; new files should get the usual umask-based mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _fsync_directory(directory):
+    # Make the rename itself durable; not every platform can open a directory
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8', newline=None):
+    """Open a temp file next to `path`; on success fsync it and rename it over `path`.
+
+    Readers see either the old file or the complete new one, never a
+    truncated mix, and a crash mid-write leaves the old file untouched.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o666 & ~_UMASK)
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding, newline=newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write(path, text):
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+class _HeldLock:
+    def __init__(self):
+        self.guard = threading.RLock()
+        self.fh = None
+        self.depth = 0
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on `path + '.lock'` (fcntl.flock where available).
+
+    Re-entrant within a thread, so code already holding the lock can call
+    helpers that take it again.
+    """
+    lock_path = os.path.abspath(path + '.lock')
+    with _locks_guard:
+        held = _locks.setdefault(lock_path, _HeldLock())
+    with held.guard:
+        if held.depth == 0:
+            directory = os.path.dirname(lock_path)
+            os.makedirs(directory, exist_ok=True)
+            held.fh = open(lock_path, 'a')
+            if fcntl is not None:
+                fcntl.flock(held.fh.fileno(), fcntl.LOCK_EX)
+        held.depth += 1
+        try:
+            yield
+        finally:
+            held.depth -= 1
+            if held.depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(held.fh.fileno(), fcntl.LOCK_UN)
+                held.fh.close()
+                held.fh = None
@@ -0,0 +1,171 @@
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def compact_id(value):
+    """16 raw bytes for a canonical (lowercase, hyphenated) UUID string.
+
+    Anything else is returned unchanged, so ids that would not survive the
+    round trip (legacy or hand-edited ones) are kept as plain strings.
+    """
+    if (isinstance(value, str) and len(value) == 36 and value == value.lower()
+            and value[8] == value[13] == value[18] == value[23] == '-'):
+        try:
+            raw = bytes.fromhex(value.replace('-', ''))
+        except ValueError:
+            return value
+        if len(raw) == 16:
+            return raw
+    return value
+
+
+def expand_id(key):
+    """Inverse of compact_id()."""
+    if isinstance(key, bytes):
+        h = key.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    return key
+
+
+def compact_date(value):
+    """Microseconds since the epoch for a naive ISO datetime string.
+
+    Strings that isoformat() would not reproduce exactly (date-only,
+    timezone-aware, malformed) are returned unchanged.
+    """
+    if isinstance(value, str):
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if dt.tzinfo is None and dt.isoformat() == value:
+            return (dt - _EPOCH) // _MICROSECOND
+    return value
+
+
+class Record:
+    """Memory-compact transaction shared by Expense and Income.
+
+    Instances use __slots__ instead of a per-object __dict__. The id is
+    kept as 16 UUID bytes and the date as an integer timestamp whenever
+    they round-trip exactly, categories are interned, and `id`/`date`
+    are rebuilt as strings on access, so callers and to_dict() see the
+    same values the record was created with.
+    """
+
+    __slots__ = ('_id', 'amount', '_category', '_date', 'description')
+
+    def __init__(self, id, amount, category, date, description=""):
+        self._id = compact_id(id)
+        self.amount = amount
+        self.category = category
+        self.date = date
+        self.description = description
+
+    @property
+    def id(self):
+        return expand_id(self._id)
+
+    @property
+    def key(self):
+        """Compact form of the id, for use as a dict key."""
+        return self._id
+
+    @property
+    def category(self):
+        return self._category
+
+    @category.setter
+    def category(self, value):
+        self._category = sys.intern(value) if type(value) is str else value
+
+    @property
+    def date(self):
+        d = self._date
+        if type(d) is int:
+            return (_EPOCH + d * _MICROSECOND).isoformat()
+        return d
+
+    @date.setter
+    def date(self, value):
+        self._date = compact_date(value)
+
+    @property
+    def timestamp(self):
+        """Seconds since the epoch, or None when the date is kept as a string."""
+        d = self._date
+        return d / 1e6 if type(d) is int else None
+
+    @property
+    def stored_date(self):
+        """The date as held: microseconds since the epoch, or the original string."""
+        return self._date
+
+    @classmethod
+    def from_compact(cls, key, amount, category, stored_date, description):
+        """Rebuild a record from its `key` and `stored_date` forms without converting them again."""
+        record = cls.__new__(cls)
+        record._id = key
+        record.amount = amount
+        record.category = category
+        record._date = stored_date
+        record.description = description
+        return record
+
+    @classmethod
+    def create(cls, amount: float, category: str, date: Optional[str] = None, description: str = ""):
+        """Create a new record, filling missing date and generating a unique id."""
+        if date is None:
+            date = datetime.now().isoformat()
+        return cls(id=str(uuid.uuid4()), amount=float(amount), category=category, date=date, description=description)
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'amount': self.amount, 'category': self.category,
+                'date': self.date, 'description': self.description}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        try:
+            # Ensure amount is a float
+            amount = float(data.get('amount', 0))
+            # Ensure date is a string
+            date = str(data['date']) if 'date' in data else datetime.now().isoformat()
+            # Ensure category is a string
+            category = str(data.get('category', 'Other'))
+            return cls(
+                id=data['id'] if 'id' in data else str(uuid.uuid4()),
+                amount=amount,
+                category=category,
+                date=date,
+                description=str(data.get('description', ''))
+            )
+        except (ValueError, KeyError, TypeError):
+            # Return a safe default if data is corrupted
+            return cls(
+                id=str(uuid.uuid4()),
+                amount=0.0,
+                category='Other',
+                date=datetime.now().isoformat(),
+                description='[Corrupted]'
+            )
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self._id, self.amount, self._category, self._date, self.description) == \
+               (other._id, other.amount, other._category, other._date, other.description)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(id={self.id!r}, amount={self.amount!r}, category={self.category!r}, "
+                f"date={self.date!r}, description={self.description!r})")
+
+    def __str__(self) -> str:
+        d = self.date[:10]
+        return f"{self.id} | {d} | {self.category} | {self.amount:.2f} | {self.description}"
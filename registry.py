@@ -0,0 +1,231 @@
+"""Loaded trackers kept between uses, least recently used evicted first.
+
+Building an ExpenseTracker parses the user's profile and rebuilds every
+record, index and rollup, so processes that serve several users (the HTTP
+server, batch jobs) keep them in a TrackerRegistry instead of reloading
+them on every call. The cache is bounded by the number of trackers and by
+their approximate size in memory; an evicted tracker is flushed and closed
+first, so no pending change is lost.
+
+A cached tracker is dropped and reloaded when another session has written
+its profile since it was loaded. The storage files' mtimes are checked on
+every lookup and the stored revision only when one of them changed (on
+SQLite, the per-user revision counter in the database). A stale tracker
+holding unsaved changes is saved first, which merges on the JSON backends.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MAX_TRACKERS = 64
+MAX_BYTES = 512 * 1024 * 1024
+
+# Rough heap cost of a loaded tracker: a fixed part plus, per in-memory
+# record, the record itself and its share of the indexes and rollups
+TRACKER_BYTES = 64 * 1024
+RECORD_BYTES = 600
+
+
+def approximate_size(tracker):
+    """Estimated bytes held by a loaded tracker."""
+    # A lazy tracker that hasn't loaded its records has no _by_id yet
+    tables = vars(tracker).get('_by_id') or {}
+    records = sum(len(table) for table in tables.values() if table is not None)
+    return TRACKER_BYTES + records * RECORD_BYTES
+
+
+def _watched_paths(storage, username):
+    # Files another session rewrites when it saves or journals this profile
+    paths = []
+    sidecar = getattr(storage, 'sidecar_path', None)
+    if sidecar is not None and not getattr(storage, 'queryable', False):
+        paths += [sidecar(username, '.rev'), sidecar(username, '.journal')]
+    for attr in ('filename', 'path'):
+        path = getattr(storage, attr, None)
+        if isinstance(path, str):
+            paths.append(path)
+            if getattr(storage, 'queryable', False):
+                # SQLite in WAL mode appends commits to a separate file
+                paths.append(path + '-wal')
+    return paths
+
+
+def _stamp(paths):
+    # (mtime, size) of each path, None for missing files; None if nothing is watched
+    if not paths:
+        return None
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            out.append(None)
+        else:
+            out.append((st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+class _Entry:
+    __slots__ = ('tracker', 'paths', 'stamp', 'size')
+
+    def __init__(self, tracker, paths):
+        self.tracker = tracker
+        self.paths = paths
+        self.stamp = _stamp(paths)
+        self.size = approximate_size(tracker)
+
+
+class TrackerRegistry:
+    """Trackers by username, with LRU eviction by count and approximate memory.
+
+    `factory(username)` loads a tracker. using() holds the user's tracker
+    exclusively for a block, so calls for one user run one at a time while
+    different users proceed in parallel; a tracker is never evicted while
+    someone is using it, and the most recently used one is always kept.
+    """
+
+    def __init__(self, factory, max_trackers=MAX_TRACKERS, max_bytes=MAX_BYTES):
+        self.factory = factory
+        self.max_trackers = max_trackers
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, username):
+        return username in self._entries
+
+    def _user_lock(self, username):
+        with self._guard:
+            lock = self._locks.get(username)
+            if lock is None:
+                lock = self._locks[username] = threading.Lock()
+            return lock
+
+    @property
+    def size(self):
+        """Approximate bytes held by every cached tracker."""
+        with self._guard:
+            return sum(entry.size for entry in self._entries.values())
+
+    def stats(self):
+        with self._guard:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'invalidations': self.invalidations, 'trackers': len(self._entries),
+                    'bytes': sum(entry.size for entry in self._entries.values())}
+
+    # --- lookup ---
+    def _current(self, entry):
+        # False if another session saved or journaled the profile since it was loaded
+        tracker = entry.tracker
+        stamp = _stamp(entry.paths)
+        if stamp is not None and stamp == entry.stamp:
+            return True
+        if tracker.stale():
+            if not tracker.dirty:
+                return False
+            # Saving merges the other session's changes in, keeping ours
+            tracker.save()
+            if tracker.stale():
+                # SQLite doesn't merge on save: reload the now saved profile instead
+                return False
+            stamp = _stamp(entry.paths)
+        # Otherwise our own save (or an unrelated write) touched the files
+        entry.stamp = stamp
+        return True
+
+    def _lookup(self, username):
+        # Call with the user's lock held
+        with self._guard:
+            entry = self._entries.get(username)
+        if entry is not None and not self._current(entry):
+            with self._guard:
+                self._entries.pop(username, None)
+                self.invalidations += 1
+            entry = None
+        if entry is not None:
+            with self._guard:
+                self._entries.move_to_end(username)
+                self.hits += 1
+            return entry
+        tracker = self.factory(username)
+        entry = _Entry(tracker, _watched_paths(tracker.storage, username))
+        with self._guard:
+            self._entries[username] = entry
+            self.misses += 1
+        return entry
+
+    @contextmanager
+    def using(self, username):
+        """The user's tracker, loaded if need be and held exclusively for the duration of the block."""
+        with self._user_lock(username):
+            entry = self._lookup(username)
+            try:
+                yield entry.tracker
+            finally:
+                # The block may have added records (or saved them)
+                entry.size = approximate_size(entry.tracker)
+        self._evict()
+
+    def get(self, username):
+        """The user's tracker, for single-threaded callers that don't need using()."""
+        with self.using(username) as tracker:
+            return tracker
+
+    # --- eviction ---
+    def _over(self):
+        # Call with the guard held
+        return (len(self._entries) > self.max_trackers
+                or sum(entry.size for entry in self._entries.values()) > self.max_bytes)
+
+    def _evict(self):
+        while True:
+            with self._guard:
+                if len(self._entries) <= 1 or not self._over():
+                    return
+                victim = None
+                # Oldest first, skipping the newest and any tracker in use
+                for username in list(self._entries)[:-1]:
+                    lock = self._locks[username]
+                    if lock.acquire(blocking=False):
+                        victim = username
+                        break
+                if victim is None:
+                    return
+                entry = self._entries.pop(victim)
+                self.evictions += 1
+            try:
+                # Flushed under the user's lock, so a reload waits for the write
+                entry.tracker.close()
+            finally:
+                lock.release()
+
+    def discard(self, username):
+        """Flush and drop one user's tracker, if cached."""
+        with self._user_lock(username):
+            with self._guard:
+                entry = self._entries.pop(username, None)
+            if entry is not None:
+                entry.tracker.close()
+
+    def flush(self):
+        """Write out every cached tracker's pending changes."""
+        for username in list(self._entries):
+            with self._user_lock(username):
+                with self._guard:
+                    entry = self._entries.get(username)
+                if entry is not None:
+                    entry.tracker.flush()
+
+    def close(self):
+        """Flush and drop every tracker."""
+        for username in list(self._entries):
+            self.discard(username)
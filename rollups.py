@@ -0,0 +1,127 @@
+"""Daily, monthly and yearly totals per category, kept up to date on every change.
+
+A rollup table maps (period, category) to a total and a count, where the
+period is the date's 'YYYY-MM-DD', 'YYYY-MM' or 'YYYY' prefix. The tracker
+updates the tables as transactions are added, edited or removed and saves
+them next to the profile, so the time-series reports read a few hundred
+rollup rows instead of the transactions. SqliteStorage keeps the same
+tables in SQL, maintained by triggers.
+"""
+import math
+from bisect import bisect_left, bisect_right, insort
+
+from aggregates import _Sums, amount_of, _category
+
+# Grain -> length of the ISO date prefix that names its periods
+GRAINS = {'day': 10, 'month': 7, 'year': 4}
+KINDS = ('expense', 'income')
+
+
+def period_of(date, grain):
+    """The record date's period at this grain, or '' when the date is unusable."""
+    size = GRAINS[grain]
+    return date[:size] if isinstance(date, str) and len(date) >= size else ''
+
+
+class _Table(_Sums):
+    """One rollup table: totals per (period, category), indexed by period.
+
+    `periods` is kept sorted so a query bisects to its date range and reads
+    only the rows inside it, instead of sorting the whole table.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.periods = []
+        self.categories = {}
+
+    def add(self, key, amount):
+        super().add(key, amount)
+        period, category = key
+        categories = self.categories.get(period)
+        if categories is None:
+            categories = self.categories[period] = set()
+            insort(self.periods, period)
+        categories.add(category)
+
+    def remove(self, key, amount):
+        super().remove(key, amount)
+        if key in self.counts:
+            return
+        period, category = key
+        categories = self.categories.get(period)
+        if categories is None:
+            return
+        categories.discard(category)
+        if not categories:
+            del self.categories[period]
+            del self.periods[bisect_left(self.periods, period)]
+
+    def reindex(self):
+        # After totals and counts were filled in directly (see Rollups.load)
+        self.categories = {}
+        for period, category in self.counts:
+            self.categories.setdefault(period, set()).add(category)
+        self.periods = sorted(self.categories)
+
+    def select(self, start=None, end=None, category=None):
+        """{period: {category: total}} for periods within [start, end]."""
+        lo = 0 if start is None else bisect_left(self.periods, start)
+        hi = len(self.periods) if end is None else bisect_right(self.periods, end)
+        out = {}
+        for period in self.periods[lo:hi]:
+            if category is not None:
+                if (period, category) in self.totals:
+                    out[period] = {category: self.totals[(period, category)]}
+            else:
+                out[period] = {c: self.totals[(period, c)] for c in sorted(self.categories[period])}
+        return out
+
+
+class Rollups:
+    def __init__(self):
+        self.rebuild([], [])
+
+    def rebuild(self, expenses, income):
+        self.tables = {(kind, grain): _Table() for kind in KINDS for grain in GRAINS}
+        for e in expenses:
+            self.add('expense', e)
+        for i in income:
+            self.add('income', i)
+
+    def add(self, kind, record):
+        amount, category = amount_of(record), _category(record)
+        for grain in GRAINS:
+            self.tables[(kind, grain)].add((period_of(record.date, grain), category), amount)
+
+    def remove(self, kind, record):
+        amount, category = amount_of(record), _category(record)
+        for grain in GRAINS:
+            self.tables[(kind, grain)].remove((period_of(record.date, grain), category), amount)
+
+    def rollup(self, kind, grain, start=None, end=None, category=None):
+        """{period: {category: total}} for periods from start to end (inclusive, same format as the grain)."""
+        return self.tables[(kind, grain)].select(start, end, category)
+
+    def dump(self):
+        # {"expense/month": [[period, category, total, count], ...], ...}
+        return {f"{kind}/{grain}": [[p, c, sums.totals[(p, c)], n] for (p, c), n in sums.counts.items()]
+                for (kind, grain), sums in self.tables.items()}
+
+    def load(self, data):
+        for (kind, grain), sums in self.tables.items():
+            for period, category, total, count in data[f"{kind}/{grain}"]:
+                sums.totals[(period, category)] = total
+                sums.counts[(period, category)] = count
+            sums.reindex()
+
+    def matches(self, other, rel_tol=1e-9, abs_tol=1e-6):
+        """True if `other` holds the same rollups, allowing for float rounding."""
+        for key, sums in self.tables.items():
+            theirs = other.tables[key]
+            if sums.counts != theirs.counts:
+                return False
+            if not all(math.isclose(t, theirs.totals[k], rel_tol=rel_tol, abs_tol=abs_tol)
+                       for k, t in sums.totals.items()):
+                return False
+        return True
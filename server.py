@@ -0,0 +1,238 @@
+"""Local HTTP/JSON server for the tracker service (standard library only).
+
+    python server.py [--host 127.0.0.1] [--port 8080] [--db tracker.db] [--workers 8]
+
+Endpoints (bodies and responses are JSON; {kind} is expenses or income):
+
+    GET    /users/{user}/{kind}?offset=&limit=&sort=&reverse=   one page of transactions
+    POST   /users/{user}/{kind}                                 add {amount, category, date, description}
+    GET    /users/{user}/{kind}/search?term=&category=&from=&to=&min=&max=&offset=&limit=
+    GET    /users/{user}/{kind}/{id}
+    PATCH  /users/{user}/{kind}/{id}                            change any of amount/category/date/description
+    DELETE /users/{user}/{kind}/{id}
+    GET    /users/{user}/reports/summary?period=YYYY[-MM]
+    GET    /users/{user}/reports/monthly
+    GET    /users/{user}/reports/rollup?kind=&grain=day|month|year&from=&to=&category=
+    GET    /users/{user}/budgets
+    PUT    /users/{user}/budgets                                {limit, category (optional)}
+    POST   /users/{user}/budgets/rules                          {period, limit, category, days | start, end}
+    DELETE /users/{user}/budgets/rules/{index}
+    GET    /users/{user}/categories
+    GET    /stats                                               tracker cache hits/misses/evictions
+
+The event loop only parses requests and writes responses; every call into
+the service runs on a thread pool, so requests for different users proceed
+together while each user's requests are applied one at a time. There is no
+authentication: bind it to localhost only.
+"""
+import argparse
+import asyncio
+import json
+import re
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from service import ServiceError, TrackerService
+from tracker import AUTOSAVE_INTERVAL
+
+MAX_HEADER = 64 * 1024
+MAX_BODY = 1024 * 1024
+WORKERS = 8
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# URL segment -> transaction kind
+KIND_SEGMENTS = {'expenses': 'expense', 'income': 'income'}
+
+
+def _route(method, pattern, handler):
+    # {name} matches one path segment; {kind} only expenses/income
+    regex = re.sub(r'\{(\w+)\}', lambda m: f"(?P<{m.group(1)}>{'expenses|income' if m.group(1) == 'kind' else '[^/]+'})",
+                   pattern)
+    return method, re.compile(f"^{regex}/?$"), handler
+
+
+def _body(body, *names):
+    if not isinstance(body, dict):
+        raise ServiceError(400, "expected a JSON object")
+    return [body.get(name) for name in names]
+
+
+# (method, path regex, handler(service, path params, query, body)); the first match wins
+ROUTES = [
+    _route('GET', '/users/{user}/{kind}/search', lambda s, p, q, b: s.search(
+        p['user'], p['kind'], q.get('term'), q.get('category'), q.get('from'), q.get('to'),
+        q.get('min'), q.get('max'), q.get('offset'), q.get('limit'))),
+    _route('GET', '/users/{user}/{kind}', lambda s, p, q, b: s.list(
+        p['user'], p['kind'], q.get('offset'), q.get('limit'), q.get('sort') or None,
+        q.get('reverse', '') in ('1', 'true', 'yes'))),
+    _route('POST', '/users/{user}/{kind}', lambda s, p, q, b: (201, s.add(
+        p['user'], p['kind'], *_body(b, 'amount', 'category', 'date', 'description')))),
+    _route('GET', '/users/{user}/{kind}/{id}', lambda s, p, q, b: s.get(p['user'], p['kind'], p['id'])),
+    _route('PATCH', '/users/{user}/{kind}/{id}', lambda s, p, q, b: s.edit(p['user'], p['kind'], p['id'], b)),
+    _route('DELETE', '/users/{user}/{kind}/{id}', lambda s, p, q, b: s.delete(p['user'], p['kind'], p['id'])),
+    _route('GET', '/users/{user}/reports/summary', lambda s, p, q, b: s.summary(p['user'], q.get('period'))),
+    _route('GET', '/users/{user}/reports/monthly', lambda s, p, q, b: s.monthly_summary(p['user'])),
+    _route('GET', '/users/{user}/reports/rollup', lambda s, p, q, b: s.rollup(
+        p['user'], q.get('kind', 'expense'), q.get('grain', 'month'), q.get('from'), q.get('to'),
+        q.get('category'))),
+    _route('GET', '/users/{user}/budgets', lambda s, p, q, b: s.budgets(p['user'])),
+    _route('PUT', '/users/{user}/budgets', lambda s, p, q, b: s.set_budget(p['user'], *_body(b, 'limit', 'category'))),
+    _route('POST', '/users/{user}/budgets/rules', lambda s, p, q, b: (201, s.add_budget_rule(p['user'], b))),
+    _route('DELETE', '/users/{user}/budgets/rules/{index}', lambda s, p, q, b: s.delete_budget_rule(
+        p['user'], p['index'])),
+    _route('GET', '/users/{user}/categories', lambda s, p, q, b: s.categories(p['user'])),
+    _route('GET', '/stats', lambda s, p, q, b: s.stats()),
+]
+
+
+def dispatch(service, method, target, body):
+    """(status, JSON-ready result) for one request."""
+    url = urlsplit(target)
+    path = unquote(url.path)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    allowed = False
+    for route_method, regex, handler in ROUTES:
+        m = regex.match(path)
+        if m is None:
+            continue
+        if route_method != method:
+            allowed = True
+            continue
+        params = m.groupdict()
+        if 'kind' in params:
+            params['kind'] = KIND_SEGMENTS[params['kind']]
+        try:
+            result = handler(service, params, query, body)
+        except ServiceError as e:
+            return e.status, {'error': e.message}
+        if isinstance(result, tuple):
+            return result
+        return 200, result
+    if allowed:
+        return 405, {'error': f"{method} not allowed on {path}"}
+    return 404, {'error': f"no such endpoint {path}"}
+
+
+class Server:
+    def __init__(self, service, workers=WORKERS):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tracker')
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, raw = request
+                if isinstance(raw, int):
+                    status, result = raw, {'error': REASONS[raw]}
+                else:
+                    try:
+                        body = json.loads(raw) if raw else None
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        status, result = 400, {'error': "body is not valid JSON"}
+                    else:
+                        try:
+                            status, result = await loop.run_in_executor(
+                                self.executor, dispatch, self.service, method, target, body)
+                        except Exception as e:
+                            status, result = 500, {'error': f"internal error: {e.__class__.__name__}"}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                keep_alive = keep_alive and not isinstance(raw, int)
+                self._respond(writer, status, result, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down with the connection idle; nothing to finish
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # (method, target, version, headers, body bytes or an error status), or None at EOF
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            return 'GET', '/', 'HTTP/1.0', {}, 413
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3:
+            return 'GET', '/', 'HTTP/1.0', {}, 400
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            return method, target, version, headers, 411
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            return method, target, version, headers, 400
+        if length > MAX_BODY:
+            return method, target, version, headers, 413
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    def _respond(self, writer, status, result, keep_alive):
+        payload = json.dumps(result).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+
+    async def autosave(self, interval=AUTOSAVE_INTERVAL):
+        # Write-behind trackers only flush when touched; this catches idle ones
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(self.executor, self.service.flush)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER)
+        autosave = asyncio.create_task(self.autosave())
+        try:
+            # Stop cleanly (flushing every tracker) on SIGTERM as well as Ctrl+C
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        except (NotImplementedError, RuntimeError):
+            pass
+        print(f"Serving on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            autosave.cancel()
+            self.executor.shutdown(wait=True)
+            self.service.close()
+
+
+def serve(host='127.0.0.1', port=8080, db_path=None, workers=WORKERS):
+    server = Server(TrackerService(db_path), workers)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the expense tracker over HTTP/JSON on this machine.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', help="SQLite database (default: the sharded data/ directory)")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.db, args.workers)
@@ -0,0 +1,340 @@
+"""Headless access to expense trackers, for programs rather than people.
+
+TrackerService wraps ExpenseTracker behind plain methods that take and
+return JSON-ready values and never print or prompt; bad input raises
+ServiceError with an HTTP-style status. server.py puts it on the network.
+
+Trackers for active users stay loaded between calls in a TrackerRegistry
+(see registry.py), each behind its own lock, so calls for one user run one
+at a time while calls for different users run in parallel. Trackers share
+a small pool of storage handles (one SQLite connection each, or the
+per-user shard files) instead of opening a backend per user.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import cycle
+
+from budget_engine import PERIODS, ROLLING_DAYS
+from registry import MAX_BYTES, MAX_TRACKERS, TrackerRegistry
+from rollups import GRAINS
+from tracker import ExpenseTracker, period_bounds
+from storage import default_storage
+from sqlite_storage import SqliteStorage
+
+KINDS = ('expense', 'income')
+POOL_SIZE = 4
+# Largest page a single call returns
+MAX_LIMIT = 1000
+
+
+class ServiceError(Exception):
+    """A request the service can't carry out; `status` is the matching HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def transaction(kind, record):
+    row = record.to_dict()
+    row['type'] = kind
+    return row
+
+
+def _kind(kind):
+    if kind not in KINDS:
+        raise ServiceError(404, f"unknown transaction type {kind!r}")
+    return kind
+
+
+def _amount(value, required=True):
+    if value is None and not required:
+        return None
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ServiceError(400, "amount must be a number")
+    if amount <= 0:
+        raise ServiceError(400, "amount must be greater than zero")
+    return amount
+
+
+def _date(value, required=False):
+    # ISO date or datetime string -> datetime
+    if value in (None, ''):
+        if required:
+            raise ServiceError(400, "date is required")
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ServiceError(400, f"invalid date {value!r}; use YYYY-MM-DD")
+
+
+def _text(value, name, required=False):
+    if value is None:
+        if required:
+            raise ServiceError(400, f"{name} is required")
+        return None
+    if not isinstance(value, str):
+        raise ServiceError(400, f"{name} must be a string")
+    return value.strip()
+
+
+def _int(value, name, default):
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ServiceError(400, f"{name} must be an integer")
+
+
+class StoragePool:
+    """A fixed set of storage handles handed out round-robin.
+
+    For SQLite every handle is its own connection (with its own lock), so
+    users on different handles don't queue behind each other.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE):
+        self.handles = [factory() for _ in range(max(1, size))]
+        self._next = cycle(self.handles)
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            return next(self._next)
+
+    def close(self):
+        for handle in self.handles:
+            close = getattr(handle, 'close', None)
+            if close is not None:
+                close()
+
+
+class TrackerService:
+    def __init__(self, db_path=None, pool_size=POOL_SIZE, storage_factory=None, max_trackers=MAX_TRACKERS,
+                 max_bytes=MAX_BYTES, **tracker_options):
+        """Serve the users in `db_path` (SQLite) or the default sharded storage.
+
+        At most `max_trackers` trackers, and roughly `max_bytes` of them,
+        stay loaded. `tracker_options` go to every ExpenseTracker; by
+        default trackers journal and write behind, and close() flushes them.
+        """
+        if storage_factory is None:
+            storage_factory = (lambda: SqliteStorage(db_path, wal=True)) if db_path else default_storage
+        self.pool = StoragePool(storage_factory, pool_size)
+        self.tracker_options = {'journal': True, 'write_behind': True, **tracker_options}
+        self.trackers = TrackerRegistry(self._open, max_trackers, max_bytes)
+        self._alerts = {}
+
+    # --- trackers ---
+    def _open(self, username):
+        tracker = ExpenseTracker(username, storage=self.pool.get(), **self.tracker_options)
+        alerts = self._alerts[username] = []
+        tracker.on_budget_alert(alerts.append)
+        return tracker
+
+    @contextmanager
+    def using(self, username):
+        """The user's tracker, held exclusively for the duration of the block."""
+        if not isinstance(username, str) or not username.strip():
+            raise ServiceError(400, "username is required")
+        with self.trackers.using(username) as tracker:
+            yield tracker
+            tracker.flush_if_due()
+
+    def _drain_alerts(self, username):
+        alerts = self._alerts.get(username, [])
+        out = [{'level': a.level, 'category': a.category, 'period': a.period, 'spent': a.spent,
+                'limit': a.limit, 'message': str(a)} for a in alerts]
+        alerts.clear()
+        return out
+
+    def flush(self):
+        """Write out every tracker's pending changes."""
+        self.trackers.flush()
+
+    def stats(self):
+        """Tracker cache counters: hits, misses, evictions, invalidations, trackers loaded and their approximate bytes."""
+        return self.trackers.stats()
+
+    def close(self):
+        self.trackers.close()
+        self.pool.close()
+
+    # --- transactions ---
+    def add(self, username, kind, amount, category, date=None, description=''):
+        """Add a transaction; returns it, plus any budget alerts it set off."""
+        kind = _kind(kind)
+        amount = _amount(amount)
+        category = _text(category, 'category', required=True) or 'Other'
+        date = _date(date)
+        description = _text(description, 'description') or ''
+        with self.using(username) as tracker:
+            add = tracker.add_expense if kind == 'expense' else tracker.add_income
+            record = add(amount, category, date.isoformat() if date else None, description)
+            return {'transaction': transaction(kind, record), 'alerts': self._drain_alerts(username)}
+
+    def get(self, username, kind, record_id):
+        kind = _kind(kind)
+        with self.using(username) as tracker:
+            record = tracker.get_expense(record_id) if kind == 'expense' else tracker.get_income(record_id)
+        if record is None:
+            raise ServiceError(404, f"no {kind} with id {record_id}")
+        return transaction(kind, record)
+
+    def edit(self, username, kind, record_id, changes):
+        """Change amount, category, date and/or description; returns the updated transaction."""
+        kind = _kind(kind)
+        if not isinstance(changes, dict):
+            raise ServiceError(400, "changes must be an object")
+        unknown = set(changes) - {'amount', 'category', 'date', 'description'}
+        if unknown:
+            raise ServiceError(400, f"cannot change {', '.join(sorted(unknown))}")
+        cleaned = {
+            'amount': _amount(changes.get('amount'), required=False),
+            'category': _text(changes.get('category'), 'category'),
+            'description': _text(changes.get('description'), 'description'),
+        }
+        date = _date(changes.get('date'))
+        cleaned['date'] = date.isoformat() if date else None
+        with self.using(username) as tracker:
+            edit = tracker.edit_expense if kind == 'expense' else tracker.edit_income
+            if not edit(record_id, **cleaned):
+                raise ServiceError(404, f"no {kind} with id {record_id}")
+            record = tracker.get_expense(record_id) if kind == 'expense' else tracker.get_income(record_id)
+            return {'transaction': transaction(kind, record), 'alerts': self._drain_alerts(username)}
+
+    def delete(self, username, kind, record_id):
+        kind = _kind(kind)
+        with self.using(username) as tracker:
+            delete = tracker.delete_expense if kind == 'expense' else tracker.delete_income
+            if not delete(record_id):
+                raise ServiceError(404, f"no {kind} with id {record_id}")
+        return {'deleted': record_id}
+
+    def list(self, username, kind, offset=0, limit=50, sort=None, reverse=False):
+        """One page of transactions, in the order added or sorted by date/amount/category/description."""
+        kind = _kind(kind)
+        offset = max(_int(offset, 'offset', 0), 0)
+        limit = min(max(_int(limit, 'limit', 50), 0), MAX_LIMIT)
+        if sort not in (None, 'date', 'amount', 'category', 'description'):
+            raise ServiceError(400, f"cannot sort by {sort!r}")
+        with self.using(username) as tracker:
+            rows = tracker.page(kind, offset, limit, sort, bool(reverse))
+            return {'total': tracker.count(kind), 'offset': offset,
+                    'transactions': [transaction(kind, r) for r in rows]}
+
+    def search(self, username, kind, term=None, category=None, start=None, end=None,
+               min_amount=None, max_amount=None, offset=0, limit=50):
+        """Transactions matching every given filter (dates inclusive), one page at a time."""
+        kind = _kind(kind)
+        start, end = _date(start), _date(end)
+        try:
+            min_amount = float(min_amount) if min_amount not in (None, '') else None
+            max_amount = float(max_amount) if max_amount not in (None, '') else None
+        except ValueError:
+            raise ServiceError(400, "min/max amount must be numbers")
+        offset = max(_int(offset, 'offset', 0), 0)
+        limit = min(max(_int(limit, 'limit', 50), 0), MAX_LIMIT)
+        with self.using(username) as tracker:
+            search = tracker.search if kind == 'expense' else tracker.search_income
+            rows = search(term or None, category or None, start, end, min_amount, max_amount)
+        return {'total': len(rows), 'offset': offset,
+                'transactions': [transaction(kind, r) for r in rows[offset:offset + limit]]}
+
+    # --- reports ---
+    def summary(self, username, period=None):
+        """Income, expenses, balance and spending per category, all time or for a 'YYYY' / 'YYYY-MM' period."""
+        if period and period_bounds(period) is None:
+            raise ServiceError(400, "period must be YYYY or YYYY-MM")
+        period = period or None
+        with self.using(username) as tracker:
+            income = tracker.total_income(period)
+            expenses = tracker.total_expenses(period)
+            return {'period': period, 'income': income, 'expenses': expenses, 'balance': income - expenses,
+                    'categories': tracker.category_totals(period)}
+
+    def rollup(self, username, kind='expense', grain='month', start=None, end=None, category=None):
+        """{period: {category: total}} from the daily/monthly/yearly rollups."""
+        kind = _kind(kind)
+        if grain not in GRAINS:
+            raise ServiceError(400, f"grain must be one of {', '.join(GRAINS)}")
+        with self.using(username) as tracker:
+            return tracker.rollup(kind, grain, start or None, end or None, category or None)
+
+    def monthly_summary(self, username):
+        with self.using(username) as tracker:
+            return tracker.monthly_summary()
+
+    # --- budgets ---
+    def budgets(self, username):
+        """The budget limits and rules, with each budget's spend in its current period."""
+        with self.using(username) as tracker:
+            budgets = tracker.user_data['budgets']
+            status = [{'rule': rule, 'spent': spent, 'period': period, 'level': level}
+                      for rule, spent, period, level in tracker.budget_status()]
+            return {'monthly': budgets.get('monthly', 0), 'categories': dict(budgets.get('categories', {})),
+                    'rules': list(budgets.get('rules', [])), 'status': status}
+
+    def set_budget(self, username, limit, category=None):
+        """Set the overall monthly limit, or a category's monthly limit (0 removes it)."""
+        try:
+            limit = float(limit)
+        except (TypeError, ValueError):
+            raise ServiceError(400, "limit must be a number")
+        if limit < 0:
+            raise ServiceError(400, "limit cannot be negative")
+        category = _text(category, 'category')
+        with self.using(username) as tracker:
+            budgets = tracker.user_data['budgets']
+            if not category:
+                budgets['monthly'] = limit
+            elif limit:
+                budgets['categories'][category] = limit
+            else:
+                budgets['categories'].pop(category, None)
+            tracker.budgets_changed()
+        return self.budgets(username)
+
+    def add_budget_rule(self, username, rule):
+        """Add a period budget (see budget_engine.py for the rule fields)."""
+        if not isinstance(rule, dict):
+            raise ServiceError(400, "rule must be an object")
+        period = rule.get('period')
+        if period not in PERIODS:
+            raise ServiceError(400, f"period must be one of {', '.join(PERIODS)}")
+        cleaned = {'category': _text(rule.get('category'), 'category') or None, 'period': period,
+                   'limit': _amount(rule.get('limit'))}
+        if period == 'rolling':
+            cleaned['days'] = _int(rule.get('days'), 'days', ROLLING_DAYS)
+            if cleaned['days'] < 1:
+                raise ServiceError(400, "days must be at least 1")
+        elif period == 'custom':
+            start, end = _date(rule.get('start'), required=True), _date(rule.get('end'), required=True)
+            if end < start:
+                raise ServiceError(400, "end is before start")
+            cleaned['start'], cleaned['end'] = start.date().isoformat(), end.date().isoformat()
+        with self.using(username) as tracker:
+            tracker.user_data['budgets'].setdefault('rules', []).append(cleaned)
+            tracker.budgets_changed()
+        return self.budgets(username)
+
+    def delete_budget_rule(self, username, index):
+        index = _int(index, 'index', None)
+        with self.using(username) as tracker:
+            rules = tracker.user_data['budgets'].get('rules', [])
+            if index is None or not 0 <= index < len(rules):
+                raise ServiceError(404, f"no budget rule {index}")
+            rules.pop(index)
+            tracker.budgets_changed()
+        return self.budgets(username)
+
+    # --- categories ---
+    def categories(self, username):
+        with self.using(username) as tracker:
+            return {'expense': list(tracker.get_categories()), 'income': list(tracker.get_income_categories())}
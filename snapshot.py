@@ -0,0 +1,368 @@
+"""Binary snapshot of a profile, read in place through mmap.
+
+A snapshot holds one user's transactions as fixed-width rows, so totals
+and per-category sums scan the amount, date and category columns straight
+out of the mapped file without building a record object per row. Strings
+(ids, descriptions, dates that aren't plain timestamps) live in a heap of
+their own, each distinct string stored once.
+
+Layout (all integers little-endian):
+
+    header   MAGIC, uint32 version, uint32 expense rows, uint32 income rows,
+             uint32 strings, uint64 meta offset, uint64 meta length,
+             uint64 rows offset, uint64 string table offset
+    meta     utf-8 JSON {"profile": everything but the transactions,
+                         "categories": [category names]}
+    rows     the expense rows then the income rows, 32 bytes each, 8-aligned:
+             amount       float64
+             date         int64    microseconds since 1970-01-01, NO_DATE if kept as text
+             category     uint32   position in meta "categories"
+             id           uint32   string number; RAW_ID set for a 16-byte UUID kept raw
+             description  uint32   string number
+             date text    uint32   string number, NO_TEXT unless date is NO_DATE
+    strings  uint64[strings + 1] offsets into the heap, then the heap (utf-8,
+             or raw bytes for RAW_ID ids)
+
+The tracker writes one next to each shard when it saves (snapshot=True)
+and rebuilds its records from it instead of parsing the JSON. To convert
+to and from the users.json layout:
+
+    python snapshot.py pack users.json snapshots/     # one .snap per user
+    python snapshot.py unpack snapshots/ users.json
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import jsonstream
+from expense import Expense
+from income import Income
+from indexes import date_key
+from persistence import atomic_open
+from record import compact_date, expand_id
+from storage import ShardedStorage, dump_profile, without_secrets
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+MAGIC = b'ETSNAP1\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIQQQQ')
+ROW = struct.Struct('<dqIIII')
+NO_DATE = -(1 << 63)
+NO_TEXT = 0xFFFFFFFF
+RAW_ID = 0x80000000
+KINDS = ('expense', 'income')
+SUFFIX = '.snap'
+
+# Where each column sits in a row: (struct format, position in units of that format)
+_FIELDS = {'amount': ('d', 0), 'date': ('q', 1), 'category': ('I', 4)}
+_ROW_DTYPE = np.dtype([('amount', '<f8'), ('date', '<i8'), ('category', '<u4'), ('id', '<u4'),
+                       ('description', '<u4'), ('date_text', '<u4')]) if np is not None else None
+_LITTLE = sys.byteorder == 'little'
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _micros(value):
+    # Timestamp bound for an ISO date string; matches how the date index orders records
+    if value is None:
+        return None
+    exact = compact_date(value)
+    if type(exact) is int:
+        return exact
+    key = date_key(value)
+    return NO_DATE if key == float('-inf') else round(key * 1e6)
+
+
+def write_snapshot(f, profile, expenses, income):
+    """Write `profile` (without its transaction lists) and the two record lists to binary file `f`."""
+    profile = without_secrets(profile)
+    strings = {}
+    categories = {}
+    count = len(expenses) + len(income)
+    rows = bytearray(ROW.size * count)
+    position = 0
+    for records in (expenses, income):
+        for r in records:
+            date = r.stored_date
+            if type(date) is int:
+                micros, text = date, NO_TEXT
+            else:
+                micros, text = NO_DATE, strings.setdefault(str(date), len(strings))
+            key = r.key
+            ref = strings.setdefault(key, len(strings))
+            ROW.pack_into(rows, position, float(r.amount), micros,
+                          categories.setdefault(r.category, len(categories)),
+                          ref | RAW_ID if type(key) is bytes else ref,
+                          strings.setdefault(r.description, len(strings)), text)
+            position += ROW.size
+    heap = [s if type(s) is bytes else s.encode('utf-8') for s in strings]
+    offsets = struct.pack(f'<{len(heap) + 1}Q', 0, *accumulate(map(len, heap)))
+    meta = json.dumps({'profile': profile, 'categories': list(categories)}).encode('utf-8')
+    rows_offset = -(-(HEADER.size + len(meta)) // 8) * 8
+    f.write(HEADER.pack(MAGIC, VERSION, len(expenses), len(income), len(heap), HEADER.size, len(meta),
+                        rows_offset, rows_offset + len(rows)))
+    f.write(meta)
+    f.write(b'\0' * (rows_offset - HEADER.size - len(meta)))
+    f.write(rows)
+    f.write(offsets)
+    f.write(b''.join(heap))
+
+
+class Snapshot:
+    """A snapshot file mapped read-only. Use as a context manager, or close() it."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._parse()
+        except (struct.error, ValueError, KeyError, TypeError):
+            self.close()
+            raise ValueError(f"{path}: not a readable snapshot")
+
+    def _parse(self):
+        (magic, version, expenses, income, strings,
+         meta_offset, meta_length, rows_offset, table_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("bad magic or version")
+        self.counts = {'expense': expenses, 'income': income}
+        self._rows_offset = rows_offset
+        self._heap = table_offset + 8 * (strings + 1)
+        if rows_offset + ROW.size * (expenses + income) > table_offset or self._heap > len(self._map):
+            raise ValueError("truncated")
+        meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        self.profile = meta['profile']
+        self.categories = meta['categories']
+        self._buf = memoryview(self._map)
+        if _LITTLE:
+            self._offsets = self._view(self._buf[table_offset:self._heap].cast('Q'))
+        else:
+            self._offsets = struct.unpack_from(f'<{strings + 1}Q', self._map, table_offset)
+        if self._heap + self._offsets[-1] > len(self._map):
+            raise ValueError("truncated")
+        self._text_rows = {}
+
+    def _view(self, view):
+        # Views into the mapping must be released before it can be closed
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        buf = getattr(self, '_buf', None)
+        if buf is not None:
+            buf.release()
+            self._buf = None
+        try:
+            self._map.close()
+        except BufferError:
+            # NumPy columns still point into it; the mapping goes with them
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def revision(self):
+        return self.profile.get('revision', 0)
+
+    def _span(self, kind):
+        first = 0 if kind == 'expense' else self.counts['expense']
+        start = self._rows_offset + first * ROW.size
+        return start, start + self.counts[kind] * ROW.size
+
+    # --- fields ---
+    def string(self, number):
+        lo, hi = self._offsets[number], self._offsets[number + 1]
+        return str(self._buf[self._heap + lo:self._heap + hi], 'utf-8')
+
+    def key(self, number):
+        """A record key: raw UUID bytes for RAW_ID numbers, else the id string."""
+        if number & RAW_ID:
+            number &= ~RAW_ID
+            return self._map[self._heap + self._offsets[number]:self._heap + self._offsets[number + 1]]
+        return self.string(number)
+
+    def column(self, kind, field):
+        """One field ('amount', 'date' or 'category') of every row of a kind, read in place.
+
+        A NumPy array with NumPy, otherwise a strided memoryview; both index
+        and iterate like a list without copying the rows. (Big-endian
+        machines get a decoded list.)
+        """
+        start, end = self._span(kind)
+        if np is not None:
+            return np.frombuffer(self._map, _ROW_DTYPE, self.counts[kind], start)[field]
+        typecode, position = _FIELDS[field]
+        if _LITTLE:
+            step = ROW.size // struct.calcsize(typecode)
+            return self._view(self._buf[start:end].cast(typecode)[position::step])
+        index = ('amount', 'date', 'category').index(field)
+        return [row[index] for row in ROW.iter_unpack(self._buf[start:end])]
+
+    def _date(self, micros, text):
+        if micros == NO_DATE:
+            return self.string(text)
+        return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+    def iter_rows(self, kind):
+        """The rows of a kind as users.json-style dicts, decoded one at a time."""
+        start, end = self._span(kind)
+        categories, string = self.categories, self.string
+        for amount, micros, category, id_, description, text in ROW.iter_unpack(self._buf[start:end]):
+            yield {'id': expand_id(self.key(id_)), 'amount': amount, 'category': categories[category],
+                   'date': self._date(micros, text), 'description': string(description)}
+
+    def records(self, kind):
+        """Expense or Income objects for the rows of a kind."""
+        cls = Expense if kind == 'expense' else Income
+        start, end = self._span(kind)
+        categories, string, key = self.categories, self.string, self.key
+        for amount, micros, category, id_, description, text in ROW.iter_unpack(self._buf[start:end]):
+            yield cls.from_compact(key(id_), amount, categories[category],
+                                   string(text) if micros == NO_DATE else micros, string(description))
+
+    def to_profile(self):
+        """The whole profile in the users.json layout."""
+        profile = dict(self.profile)
+        profile['expenses'] = list(self.iter_rows('expense'))
+        profile['income'] = list(self.iter_rows('income'))
+        return profile
+
+    # --- scans ---
+    def _dated_as_text(self, kind):
+        # (row, date key) for rows whose date is kept as text; usually none
+        rows = self._text_rows.get(kind)
+        if rows is None:
+            dates = self.column(kind, 'date')
+            if np is not None:
+                positions = np.flatnonzero(dates == NO_DATE).tolist()
+            else:
+                positions = [i for i, micros in enumerate(dates) if micros == NO_DATE]
+            start, _ = self._span(kind)
+            rows = self._text_rows[kind] = [
+                (i, date_key(self.string(ROW.unpack_from(self._map, start + i * ROW.size)[5])))
+                for i in positions]
+        return rows
+
+    def _selected(self, kind, lo, hi):
+        # Positions with lo <= date < hi (ISO strings, None for open), or None for every row
+        if lo is None and hi is None:
+            return None
+        lo_micros, hi_micros = _micros(lo), _micros(hi)
+        lo_key = date_key(lo) if lo is not None else float('-inf')
+        hi_key = date_key(hi) if hi is not None else float('inf')
+        text = [i for i, key in self._dated_as_text(kind) if lo_key <= key < hi_key]
+        dates = self.column(kind, 'date')
+        if np is not None:
+            mask = dates != NO_DATE
+            if lo_micros is not None:
+                mask &= dates >= lo_micros
+            if hi_micros is not None:
+                mask &= dates < hi_micros
+            mask[text] = True
+            return mask
+        lo_micros = NO_DATE + 1 if lo_micros is None else lo_micros
+        hi_micros = (1 << 63) - 1 if hi_micros is None else hi_micros
+        chosen = set(text)
+        return [i in chosen or lo_micros <= micros < hi_micros for i, micros in enumerate(dates)]
+
+    def total(self, kind, lo=None, hi=None):
+        """Sum of the amounts dated lo <= date < hi (ISO strings; None leaves that end open)."""
+        amounts = self.column(kind, 'amount')
+        selected = self._selected(kind, lo, hi)
+        if np is not None:
+            return float(amounts.sum() if selected is None else amounts[selected].sum())
+        if selected is None:
+            return sum(amounts)
+        return sum(amount for amount, keep in zip(amounts, selected) if keep)
+
+    def category_totals(self, kind, lo=None, hi=None):
+        """{category: total} over the rows dated lo <= date < hi; blank categories count as 'Other'."""
+        amounts = self.column(kind, 'amount')
+        codes = self.column(kind, 'category')
+        selected = self._selected(kind, lo, hi)
+        totals = {}
+        if np is not None:
+            if selected is not None:
+                amounts, codes = amounts[selected], codes[selected]
+            sums = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+            counts = np.bincount(codes, minlength=len(self.categories))
+            pairs = ((self.categories[code], float(sums[code])) for code in np.flatnonzero(counts).tolist())
+        else:
+            rows = zip(codes, amounts) if selected is None else (
+                (code, amount) for code, amount, keep in zip(codes, amounts, selected) if keep)
+            pairs = ((self.categories[code], amount) for code, amount in rows)
+        for category, amount in pairs:
+            category = category or "Other"
+            totals[category] = totals.get(category, 0) + amount
+        return totals
+
+
+def forget_secrets(path):
+    """Rewrite the snapshot at `path` without plaintext credentials in its profile. Returns True if it did."""
+    with Snapshot(path) as snap:
+        if snap.profile is without_secrets(snap.profile):
+            return False
+        expenses, income = list(snap.records('expense')), list(snap.records('income'))
+        profile = snap.profile
+    with atomic_open(path, 'wb') as f:
+        write_snapshot(f, profile, expenses, income)
+    return True
+
+
+def snapshot_name(username):
+    return ShardedStorage.shard_name(username)[:-len('.json')] + SUFFIX
+
+
+def pack(source, directory):
+    """Write a snapshot per profile in a users.json array into `directory`. Returns the user count."""
+    count = 0
+    for profile in jsonstream.iter_records(source):
+        username = profile.get('userName')
+        if not username:
+            continue
+        expenses = [Expense.from_dict(d) for d in profile.pop('expenses', [])]
+        income = [Income.from_dict(d) for d in profile.pop('income', [])]
+        with atomic_open(os.path.join(directory, snapshot_name(username)), 'wb') as f:
+            write_snapshot(f, profile, expenses, income)
+        count += 1
+    return count
+
+
+def unpack(directory, dest):
+    """Write every snapshot in `directory` back out as one users.json array. Returns the user count."""
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SUFFIX))
+    with atomic_open(dest) as f:
+        f.write('[')
+        for i, path in enumerate(paths):
+            with Snapshot(path) as snap:
+                f.write((',' if i else '') + '\n')
+                dump_profile(snap.to_profile(), f)
+        f.write('\n]' if paths else ']')
+    return len(paths)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ('pack', 'unpack'):
+        print("usage: python snapshot.py pack users.json snapshots/ | unpack snapshots/ users.json")
+        sys.exit(1)
+    command, src, dest = sys.argv[1:]
+    count = pack(src, dest) if command == 'pack' else unpack(src, dest)
+    print(f"{'Packed' if command == 'pack' else 'Unpacked'} {count} user(s) from {src} into {dest}")
@@ -0,0 +1,507 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import jsonstream
+from indexes import parse_query
+from storage import SECRET_KEYS, without_secrets
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    user TEXT NOT NULL,
+    id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user, id)
+);
+CREATE TABLE IF NOT EXISTS income (
+    user TEXT NOT NULL,
+    id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user, id)
+);
+CREATE TABLE IF NOT EXISTS categories (
+    user TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (user, kind, name)
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    user TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (user, category)
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user, category);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_amount ON expenses (user, amount);
+CREATE INDEX IF NOT EXISTS idx_income_user_date ON income (user, date);
+CREATE INDEX IF NOT EXISTS idx_income_user_category ON income (user, category);
+CREATE INDEX IF NOT EXISTS idx_income_user_amount ON income (user, amount);
+CREATE TABLE IF NOT EXISTS rollups (
+    user TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    grain TEXT NOT NULL,
+    period TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user, kind, grain, period, category)
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    user TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+# Rollup grains and the length of the ISO date prefix naming their periods (see rollups.py)
+GRAINS_SQL = "SELECT 'day' AS grain, 10 AS size UNION ALL SELECT 'month', 7 UNION ALL SELECT 'year', 4"
+# Bump to rebuild the rollups of an existing database from its rows on open
+ROLLUP_VERSION = 1
+
+
+def _rollup_columns(row):
+    # (period, category) of `row` (NEW, OLD or a table alias) at grain g
+    return (f"CASE WHEN length({row}.date) >= g.size THEN substr({row}.date, 1, g.size) ELSE '' END, "
+            f"CASE WHEN {row}.category = '' THEN 'Other' ELSE {row}.category END")
+
+
+def _rollup_change(kind, row, sign):
+    # Statements adding (sign '') or removing (sign '-') one row's amount in every grain
+    sql = (f"INSERT INTO rollups (user, kind, grain, period, category, total, count) "
+           f"SELECT {row}.user, '{kind}', g.grain, {_rollup_columns(row)}, {sign}{row}.amount, {sign}1 "
+           f"FROM ({GRAINS_SQL}) AS g WHERE true "
+           f"ON CONFLICT (user, kind, grain, period, category) "
+           f"DO UPDATE SET total = total + excluded.total, count = count + excluded.count;")
+    if sign:
+        sql += f" DELETE FROM rollups WHERE user = {row}.user AND kind = '{kind}' AND count <= 0;"
+    return sql
+
+
+def _rollup_triggers():
+    # Keep the rollups table in step with every insert, update and delete
+    statements = []
+    for kind, table in TABLES.items():
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table} "
+            f"BEGIN {_rollup_change(kind, 'NEW', '')} END;")
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table} "
+            f"BEGIN {_rollup_change(kind, 'OLD', '-')} END;")
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_update AFTER UPDATE OF amount, category, date ON {table} "
+            f"BEGIN {_rollup_change(kind, 'OLD', '-')} {_rollup_change(kind, 'NEW', '')} END;")
+    return "\n".join(statements)
+
+# Journal kind -> table name. Never interpolate anything else into SQL.
+TABLES = {'expense': 'expenses', 'income': 'income'}
+COLUMNS = ('id', 'amount', 'category', 'date', 'description')
+ORDER_KEYS = {'date', 'amount', 'category', 'description', 'id'}
+
+# Budget row holding the overall monthly limit (categories can't be empty)
+MONTHLY_KEY = ''
+
+
+def _day_bound(value):
+    # Stored dates are a bare day ('2024-03-05', meaning midnight) or a full
+    # timestamp, and compare as strings. A midnight bound written as the bare
+    # day sorts the same against both forms for the >= and < comparisons.
+    if isinstance(value, str) and value.endswith('T00:00:00'):
+        return value[:10]
+    return value
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SqliteStorage:
+    """Storage backend on the standard-library sqlite3 module.
+
+    Unlike the JSON backends, load() returns only profile metadata
+    (categories, budgets). Transactions stay in indexed tables: the tracker
+    writes them row by row through apply() and answers searches, totals and
+    sorted listings with the query methods below, so startup and query cost
+    follow the result size rather than the whole history.
+    """
+
+    queryable = True
+
+    def __init__(self, path="tracker.db", wal=False):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        # username -> (revision before, revision after) of this connection's last write
+        self._writes = {}
+        self._depth = 0
+        with self.lock:
+            if wal:
+                # Write-ahead log: readers don't block the writer, and a commit
+                # is an append rather than a rewrite (for several connections)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.executescript(_rollup_triggers())
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < ROLLUP_VERSION:
+                self._rebuild_rollups()
+
+    def _rebuild_rollups(self):
+        # Databases from before the rollups existed: aggregate the rows once
+        with self.conn:
+            self.conn.execute("DELETE FROM rollups")
+            for kind, table in TABLES.items():
+                self.conn.execute(
+                    f"INSERT INTO rollups (user, kind, grain, period, category, total, count) "
+                    f"SELECT t.user, '{kind}', g.grain, {_rollup_columns('t')}, SUM(t.amount), COUNT(*) "
+                    f"FROM {table} AS t, ({GRAINS_SQL}) AS g GROUP BY 1, 3, 4, 5")
+            self.conn.execute(f"PRAGMA user_version = {ROLLUP_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    # --- revisions ---
+    def revision(self, username):
+        """Number of committed writes that changed this user's data, from any connection."""
+        with self.lock:
+            row = self.conn.execute("SELECT revision FROM revisions WHERE user = ?", (username,)).fetchone()
+            return row['revision'] if row else 0
+
+    def last_write(self, username):
+        """(revision before, revision after) of this connection's last write for the user.
+
+        A tracker whose own revision differs from `before` missed another
+        session's write.
+        """
+        return self._writes.get(username)
+
+    def transaction(self, username):
+        """Context manager holding one write transaction for the user.
+
+        Writes inside it commit together, and no other connection can commit
+        in between, so what is read there is still current when written.
+        """
+        return self._writing(username)
+
+    @contextmanager
+    def _writing(self, username):
+        # One write transaction for a user, bumping the revision if it changed any row.
+        # BEGIN IMMEDIATE takes the write lock first, so no other connection can
+        # commit between reading the revision and writing the new one.
+        if self._depth:
+            # Nested in an open transaction(): it commits (and counts) the lot
+            with self.lock:
+                yield
+            return
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.revision(username)
+            changes = self.conn.total_changes
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            after = before
+            if self.conn.total_changes != changes:
+                after = before + 1
+                self.conn.execute(
+                    "INSERT INTO revisions (user, revision) VALUES (?, ?) "
+                    "ON CONFLICT(user) DO UPDATE SET revision = excluded.revision", (username, after))
+            self._writes[username] = (before, after)
+
+    def sidecar_path(self, username, suffix):
+        return f"{self.path}.{username}{suffix}"
+
+    def users(self):
+        with self.lock:
+            return [r['name'] for r in self.conn.execute("SELECT name FROM users")]
+
+    # --- profile metadata ---
+    def load(self, username):
+        with self.lock:
+            row = self.conn.execute("SELECT extra FROM users WHERE name = ?", (username,)).fetchone()
+            if row is None:
+                return {}
+            data = json.loads(row['extra'])
+            data['userName'] = username
+            for kind, key in (('expense', 'categories'), ('income', 'income_categories')):
+                names = [r['name'] for r in self.conn.execute(
+                    "SELECT name FROM categories WHERE user = ? AND kind = ? ORDER BY position",
+                    (username, kind))]
+                if names:
+                    data[key] = names
+            budgets = {'monthly': 0, 'categories': {}}
+            for r in self.conn.execute("SELECT category, amount FROM budgets WHERE user = ?", (username,)):
+                if r['category'] == MONTHLY_KEY:
+                    budgets['monthly'] = r['amount']
+                else:
+                    budgets['categories'][r['category']] = r['amount']
+            # Period budgets (see budget_engine.py) have no table of their own
+            budgets['rules'] = data.pop('budget_rules', [])
+            data['budgets'] = budgets
+            return data
+
+    def save(self, username, user_data):
+        """Write profile metadata. Transaction lists, if present, replace the stored rows."""
+        extra = {k: v for k, v in without_secrets(user_data).items()
+                 if k not in ('userName', 'expenses', 'income', 'categories', 'income_categories', 'budgets')}
+        if 'budgets' in user_data:
+            extra['budget_rules'] = user_data['budgets'].get('rules', [])
+        with self._writing(username):
+            self.conn.execute(
+                "INSERT INTO users (name, extra) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET extra = excluded.extra",
+                (username, json.dumps(extra)))
+            for kind, key in (('expense', 'categories'), ('income', 'income_categories')):
+                if key not in user_data:
+                    continue
+                self.conn.execute("DELETE FROM categories WHERE user = ? AND kind = ?", (username, kind))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO categories (user, kind, position, name) VALUES (?, ?, ?, ?)",
+                    [(username, kind, pos, name) for pos, name in enumerate(user_data[key])])
+            if 'budgets' in user_data:
+                budgets = user_data['budgets']
+                self.conn.execute("DELETE FROM budgets WHERE user = ?", (username,))
+                rows = [(username, MONTHLY_KEY, budgets.get('monthly', 0))]
+                rows += [(username, cat, amt) for cat, amt in budgets.get('categories', {}).items()]
+                self.conn.executemany("INSERT INTO budgets (user, category, amount) VALUES (?, ?, ?)", rows)
+            for kind, key in (('expense', 'expenses'), ('income', 'income')):
+                if key in user_data:
+                    table = TABLES[kind]
+                    self.conn.execute(f"DELETE FROM {table} WHERE user = ?", (username,))
+                    self._insert_rows(table, username, user_data[key])
+
+    def forget_secrets(self, username):
+        """Drop plaintext credentials kept in the profile metadata. Returns True if there were any."""
+        with self._writing(username):
+            row = self.conn.execute("SELECT extra FROM users WHERE name = ?", (username,)).fetchone()
+            if row is None:
+                return False
+            extra = json.loads(row['extra'])
+            if not any(key in extra for key in SECRET_KEYS):
+                return False
+            self.conn.execute("UPDATE users SET extra = ? WHERE name = ?",
+                              (json.dumps(without_secrets(extra)), username))
+        return True
+
+    def _insert_rows(self, table, username, records):
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (user, id, amount, category, date, description) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((username, r['id'], float(r.get('amount', 0)), str(r.get('category', 'Other')),
+              str(r.get('date', '')), str(r.get('description', ''))) for r in records))
+
+    # --- row-level writes ---
+    def apply(self, username, entry):
+        """Apply one tracker mutation (same shape as a journal entry). Returns rows affected."""
+        table = TABLES[entry['kind']]
+        with self._writing(username):
+            if entry['op'] == 'add':
+                self._insert_rows(table, username, [entry['data']])
+                return 1
+            if entry['op'] == 'delete':
+                cur = self.conn.execute(f"DELETE FROM {table} WHERE user = ? AND id = ?", (username, entry['id']))
+                return cur.rowcount
+            if entry['op'] == 'edit':
+                changes = {k: v for k, v in entry.get('changes', {}).items() if k in COLUMNS and k != 'id'}
+                if not changes:
+                    cur = self.conn.execute(f"SELECT 1 FROM {table} WHERE user = ? AND id = ?", (username, entry['id']))
+                    return len(cur.fetchall())
+                assignments = ", ".join(f"{k} = ?" for k in changes)
+                cur = self.conn.execute(
+                    f"UPDATE {table} SET {assignments} WHERE user = ? AND id = ?",
+                    (*changes.values(), username, entry['id']))
+                return cur.rowcount
+        return 0
+
+    def insert_many(self, username, rows):
+        """Bulk insert {'expense': [row, ...], 'income': [...]} in one transaction."""
+        with self._writing(username):
+            for kind, records in rows.items():
+                self._insert_rows(TABLES[kind], username, records)
+
+    # --- queries ---
+    def _select(self, sql, params):
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def fetch(self, username, kind, order_by=None, reverse=False, limit=None, offset=None):
+        """Rows sorted by `order_by`, or in insertion order; `limit`/`offset` select one page."""
+        sql = f"SELECT {', '.join(COLUMNS)} FROM {TABLES[kind]} WHERE user = ?"
+        params = [username]
+        column = order_by if order_by in ORDER_KEYS else 'rowid'
+        sql += f" ORDER BY {column} {'DESC' if reverse else 'ASC'}"
+        if limit is not None or offset is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        return self._select(sql, params)
+
+    def get(self, username, kind, record_id):
+        rows = self._select(
+            f"SELECT {', '.join(COLUMNS)} FROM {TABLES[kind]} WHERE user = ? AND id = ?", (username, record_id))
+        return rows[0] if rows else None
+
+    def search(self, username, kind, term=None, category=None, start=None, end=None,
+               min_amount=None, max_amount=None):
+        """Filtered rows ordered by date. `start` is inclusive and `end` exclusive (ISO strings)."""
+        clauses = ["user = ?"]
+        params = [username]
+        if term:
+            # Same syntax as indexes.TextIndex: every word must start a word
+            # of the description, or appear anywhere in it when given as '*word'
+            prefixes, infix = parse_query(term)
+            for word in prefixes:
+                clauses.append("(description LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')")
+                params += [f"{_escape_like(word)}%", f"% {_escape_like(word)}%"]
+            for pattern in infix:
+                clauses.append("description LIKE ? ESCAPE '\\'")
+                params.append(f"%{_escape_like(pattern)}%")
+        if category:
+            clauses.append("lower(category) = lower(?)")
+            params.append(category)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_day_bound(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(_day_bound(end))
+        if min_amount is not None:
+            clauses.append("amount >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            clauses.append("amount <= ?")
+            params.append(max_amount)
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM {TABLES[kind]} "
+               f"WHERE {' AND '.join(clauses)} ORDER BY date")
+        return self._select(sql, params)
+
+    def iter_rows(self, username, kind, category=None, start=None, end=None, reverse=False, batch=1000,
+                  through=None):
+        """Rows ordered by (date, id), fetched `batch` at a time. `through` is an inclusive upper bound.
+
+        Each batch is a separate keyset query continuing after the last row
+        seen, so memory stays bounded and the lock is never held between batches.
+        """
+        clauses = ["user = ?"]
+        params = [username]
+        if category:
+            clauses.append("lower(category) = lower(?)")
+            params.append(category)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_day_bound(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(_day_bound(end))
+        if through is not None:
+            clauses.append("date <= ?")
+            params.append(through)
+        op, order = ('<', 'DESC') if reverse else ('>', 'ASC')
+        last = None
+        while True:
+            where = list(clauses)
+            args = list(params)
+            if last is not None:
+                where.append(f"(date {op} ? OR (date = ? AND id {op} ?))")
+                args += [last['date'], last['date'], last['id']]
+            sql = (f"SELECT {', '.join(COLUMNS)} FROM {TABLES[kind]} WHERE {' AND '.join(where)} "
+                   f"ORDER BY date {order}, id {order} LIMIT ?")
+            rows = self._select(sql, args + [batch])
+            yield from rows
+            if len(rows) < batch:
+                return
+            last = rows[-1]
+
+    def count(self, username, kind):
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM {TABLES[kind]} WHERE user = ?", (username,)).fetchone()[0]
+
+    def total(self, username, kind, start=None, end=None):
+        sql = f"SELECT COALESCE(SUM(amount), 0) FROM {TABLES[kind]} WHERE user = ?"
+        params = [username]
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(_day_bound(start))
+        if end is not None:
+            sql += " AND date < ?"
+            params.append(_day_bound(end))
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def category_totals(self, username, kind, start=None, end=None, category=None):
+        sql = (f"SELECT CASE WHEN category = '' THEN 'Other' ELSE category END AS cat, SUM(amount) AS total "
+               f"FROM {TABLES[kind]} WHERE user = ?")
+        params = [username]
+        if category is not None:
+            sql += " AND category = ?"
+            params.append(category)
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(_day_bound(start))
+        if end is not None:
+            sql += " AND date < ?"
+            params.append(_day_bound(end))
+        sql += " GROUP BY cat"
+        with self.lock:
+            return {r['cat']: r['total'] for r in self.conn.execute(sql, params)}
+
+    def rollup(self, username, kind, grain, start=None, end=None, category=None):
+        """{period: {category: total}} from the rollups table; start/end are inclusive periods."""
+        sql = "SELECT period, category, total FROM rollups WHERE user = ? AND kind = ? AND grain = ?"
+        params = [username, kind, grain]
+        if start is not None:
+            sql += " AND period >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND period <= ?"
+            params.append(end)
+        if category is not None:
+            sql += " AND category = ?"
+            params.append(category)
+        sql += " ORDER BY period, category"
+        out = {}
+        with self.lock:
+            for r in self.conn.execute(sql, params):
+                out.setdefault(r['period'], {})[r['category']] = r['total']
+        return out
+
+    def migrate_from(self, filename="users.json"):
+        """Copy every profile from a legacy users.json array into the database."""
+        if not os.path.exists(filename):
+            return 0
+        migrated = 0
+        try:
+            for u in jsonstream.iter_records(filename):
+                if u.get('userName'):
+                    u.setdefault('expenses', [])
+                    u.setdefault('income', [])
+                    self.save(u['userName'], u)
+                    migrated += 1
+        except ValueError:
+            pass
+        return migrated
+
+
+if __name__ == "__main__":
+    import sys
+    src = sys.argv[1] if len(sys.argv) > 1 else "users.json"
+    dest = sys.argv[2] if len(sys.argv) > 2 else "tracker.db"
+    count = SqliteStorage(dest).migrate_from(src)
+    print(f"Migrated {count} user(s) from {src} into {dest}")
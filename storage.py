@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import re
+from contextlib import nullcontext
+
+import jsonstream
+from persistence import atomic_open, atomic_write, file_lock
+
+
+# Profile keys holding transaction lists, written one record per line
+TRANSACTION_KEYS = ('expenses', 'income')
+
+# Profile keys never written out: logins live in credentials.json (see credentials.py)
+SECRET_KEYS = ('password',)
+
+
+def without_secrets(profile):
+    """`profile` minus any plaintext credentials; the same dict when it has none."""
+    if not any(key in profile for key in SECRET_KEYS):
+        return profile
+    return {k: v for k, v in profile.items() if k not in SECRET_KEYS}
+
+
+def dump_profile(data, f):
+    """Write a profile laid out like json.dump(indent=4), except one transaction per line.
+
+    json only uses its C encoder when there is no indent, so encoding each
+    transaction compactly is many times faster on long histories.
+    """
+    f.write('{')
+    for i, (key, value) in enumerate(data.items()):
+        f.write((',' if i else '') + '\n    ' + json.dumps(key) + ': ')
+        if key in TRANSACTION_KEYS and isinstance(value, list) and value:
+            f.write('[')
+            for start in range(0, len(value), 1000):
+                f.write(''.join((',' if start or j else '') + '\n        ' + json.dumps(v)
+                                for j, v in enumerate(value[start:start + 1000])))
+            f.write('\n    ]')
+        else:
+            f.write(json.dumps(value, indent=4).replace('\n', '\n    '))
+    f.write('\n}' if data else '}')
+
+
+class JsonFileStorage:
+    """Legacy layout: every user's record lives in one users.json array."""
+
+    def __init__(self, filename="users.json"):
+        self.filename = filename
+
+    def load(self, username):
+        # Only the matching user's object is decoded; the rest is just scanned
+        try:
+            return jsonstream.find_record(self.filename, username) or {}
+        except ValueError:
+            return {}
+
+    def save(self, username, user_data):
+        # Other users are copied through as raw bytes, never decoded
+        user_data['userName'] = username
+        with file_lock(self.filename):
+            # This file is also where not-yet-migrated logins are checked, so a
+            # stored password is kept until CredentialStore hashes and removes it
+            record = without_secrets(user_data)
+            stored = self.load(username)
+            for key in SECRET_KEYS:
+                if key in stored:
+                    record = {**record, key: stored[key]}
+            try:
+                jsonstream.write_record(self.filename, username, record)
+            except ValueError:
+                # Unreadable file: start a fresh array, as before
+                os.remove(self.filename)
+                jsonstream.write_record(self.filename, username, record)
+
+    def sidecar_path(self, username, suffix):
+        return f"{self.filename}.{ShardedStorage.shard_name(username)[:-len('.json')]}{suffix}"
+
+    def lock(self, username):
+        # One array holds everybody, so writers have to take turns on the whole file
+        return file_lock(self.filename)
+
+    def revision(self, username):
+        return self.load(username).get('revision', 0)
+
+    def users(self):
+        try:
+            return jsonstream.usernames(self.filename)
+        except ValueError:
+            return []
+
+
+class MemoryStorage:
+    """Keeps profiles in a dict. Handy for benchmarks and throwaway sessions."""
+
+    def __init__(self, users=None):
+        self.data = {u['userName']: u for u in (users or [])}
+
+    def load(self, username):
+        return dict(self.data.get(username, {}))
+
+    def save(self, username, user_data):
+        user_data['userName'] = username
+        self.data[username] = without_secrets(user_data)
+
+    def forget_secrets(self, username):
+        if username not in self.data or self.data[username] is without_secrets(self.data[username]):
+            return False
+        self.data[username] = without_secrets(self.data[username])
+        return True
+
+    def users(self):
+        return list(self.data)
+
+    def lock(self, username):
+        return nullcontext()
+
+    def revision(self, username):
+        return self.data.get(username, {}).get('revision', 0)
+
+
+class ShardedStorage:
+    """One JSON file per user plus a small index mapping userName -> shard.
+
+    Loading or saving a profile only touches that user's shard, so the cost
+    no longer grows with the number of users or their histories. The index
+    is rewritten only when a new user is added.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory="data"):
+        self.directory = directory
+        self.index_path = os.path.join(directory, self.INDEX_NAME)
+        self._index = None
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, 'r') as f:
+                        self._index = json.load(f).get('users', {})
+                except (json.JSONDecodeError, AttributeError):
+                    self._index = {}
+        return self._index
+
+    def _write_index(self):
+        atomic_write(self.index_path, json.dumps({'version': 1, 'users': self._index}, indent=4))
+
+    def _register(self, usernames):
+        # Re-read under the lock so users added by other processes are kept
+        with file_lock(self.index_path):
+            self._index = None
+            index = self._load_index()
+            added = [u for u in usernames if u not in index]
+            for username in added:
+                index[username] = self.shard_name(username)
+            if added or not os.path.exists(self.index_path):
+                self._write_index()
+        return index
+
+    @staticmethod
+    def shard_name(username):
+        # Readable prefix for humans, hash suffix so distinct names never collide
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', username)[:40] or 'user'
+        digest = hashlib.sha1(username.encode('utf-8')).hexdigest()[:10]
+        return f"{slug}-{digest}.json"
+
+    def shard_path(self, username):
+        shard = self._load_index().get(username)
+        if shard is None and os.path.exists(self.index_path):
+            # Possibly registered by another process since we read the index
+            self._index = None
+            shard = self._load_index().get(username)
+        if shard is None:
+            return None
+        return os.path.join(self.directory, shard)
+
+    def sidecar_path(self, username, suffix):
+        """Path for an auxiliary per-user file (journal, index) next to the shard."""
+        shard = self._load_index().get(username) or self.shard_name(username)
+        return os.path.join(self.directory, shard[:-len('.json')] + suffix)
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def users(self):
+        return list(self._load_index())
+
+    def lock(self, username):
+        return file_lock(os.path.join(self.directory, self.shard_name(username)))
+
+    def revision(self, username):
+        try:
+            with open(self.sidecar_path(username, '.rev'), 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return self.load(username).get('revision', 0)
+
+    def load(self, username):
+        path = self.shard_path(username)
+        if path is None or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def save(self, username, user_data):
+        index = self._load_index()
+        user_data['userName'] = username
+        if username not in index:
+            index = self._register([username])
+        with self.lock(username):
+            # Revision first: a crash between the two writes then reads as a
+            # conflict (and a merge) rather than hiding this save
+            atomic_write(self.sidecar_path(username, '.rev'), str(user_data.get('revision', 0)))
+            with atomic_open(os.path.join(self.directory, index[username])) as f:
+                dump_profile(without_secrets(user_data), f)
+
+    def forget_secrets(self, username):
+        """Rewrite the shard without plaintext credentials, if it has any. Returns True if it did.
+
+        Nothing else changes, so the revision (and any sidecar tied to it) stays valid.
+        """
+        path = self.shard_path(username)
+        if path is None:
+            return False
+        with self.lock(username):
+            data = self.load(username)
+            if data is without_secrets(data):
+                return False
+            with atomic_open(path) as f:
+                dump_profile(without_secrets(data), f)
+        return True
+
+    def migrate_from(self, filename="users.json"):
+        """Split a legacy users.json array into per-user shards.
+
+        Returns the number of user records migrated. Passwords are not copied;
+        the source file is left untouched so the login module can keep reading
+        not-yet-migrated credentials from it.
+        """
+        if not os.path.exists(filename):
+            return 0
+
+        migrated = []
+        try:
+            # One user decoded at a time, however large the file
+            for u in jsonstream.iter_records(filename):
+                username = u.get('userName')
+                if not username:
+                    continue
+                with atomic_open(os.path.join(self.directory, self.shard_name(username))) as f:
+                    dump_profile(without_secrets(u), f)
+                migrated.append(username)
+        except ValueError:
+            # Same as before: a corrupt source migrates nothing (and is retried next start)
+            return 0
+        self._register(migrated)
+        return len(migrated)
+
+
+def default_storage(directory="data", legacy_file="users.json"):
+    """Sharded storage under `directory`, migrated once from users.json."""
+    storage = ShardedStorage(directory)
+    if not storage.exists():
+        storage.migrate_from(legacy_file)
+    return storage
+
+
+if __name__ == "__main__":
+    import sys
+    src = sys.argv[1] if len(sys.argv) > 1 else "users.json"
+    dest = sys.argv[2] if len(sys.argv) > 2 else "data"
+    count = ShardedStorage(dest).migrate_from(src)
+    print(f"Migrated {count} user(s) from {src} into {dest}/")
@@ -0,0 +1,317 @@
+import json
+import random
+from datetime import datetime
+
+import jsonstream
+from credentials import CredentialStore
+from export import export
+from importer import import_files
+from indexes import TextIndex
+from registry import TrackerRegistry
+from server import dispatch
+from service import TrackerService
+from sqlite_storage import SqliteStorage
+from storage import JsonFileStorage, MemoryStorage, ShardedStorage
+from timeline import Timeline
+from tracker import ExpenseTracker, forget_password
+
+
+def two_sessions(tmp_path, limit=100):
+    # Two trackers on the same profile, each saving on every change
+    first = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)))
+    first.user_data['budgets']['categories'] = {'Food': limit}
+    first.budgets_changed()
+    second = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)))
+    return first, second
+
+
+def food_spent(tracker):
+    return [(spent, level) for rule, spent, _, level in tracker.budget_status() if rule['category'] == 'Food']
+
+
+def test_budget_after_merged_add(tmp_path):
+    first, second = two_sessions(tmp_path)
+    alerts = []
+    second.on_budget_alert(alerts.append)
+    first.add_expense(50, 'Food', None, 'groceries')
+    second.add_expense(30, 'Food', None, 'lunch')
+    assert food_spent(second) == [(80, None)]
+    assert alerts == []
+
+
+def test_budget_after_merged_edit(tmp_path):
+    first, second = two_sessions(tmp_path)
+    lunch = second.add_expense(30, 'Food', None, 'lunch')
+    first.add_expense(50, 'Food', None, 'groceries')
+    second.edit_expense(lunch.id, amount=45)
+    assert food_spent(second) == [(95, 'near')]
+
+
+def test_budget_after_merged_delete(tmp_path):
+    first, second = two_sessions(tmp_path)
+    lunch = second.add_expense(30, 'Food', None, 'lunch')
+    first.add_expense(50, 'Food', None, 'groceries')
+    second.delete_expense(lunch.id)
+    assert food_spent(second) == [(50, None)]
+
+
+def test_login_migration_removes_plaintext_copies(tmp_path):
+    legacy = tmp_path / 'users.json'
+    legacy.write_text(json.dumps([{'userName': 'alice', 'password': 'hunter2', 'expenses': [], 'income': []}]))
+    storage = ShardedStorage(str(tmp_path / 'data'))
+    storage.migrate_from(str(legacy))
+    tracker = ExpenseTracker('alice', storage=storage, snapshot=True)
+    tracker.user_data['password'] = 'hunter2'     # as loaded from a shard written before passwords were dropped
+    tracker.add_expense(5, 'Food', None, 'snack')
+    store = CredentialStore(str(tmp_path / 'credentials.json'), str(legacy), scheme='pbkdf2_sha256', cost=1000,
+                            on_migrate=lambda username: forget_password(storage, username))
+    assert store.verify('alice', 'hunter2')
+    for path in [legacy, *(tmp_path / 'data').iterdir()]:
+        assert b'hunter2' not in path.read_bytes(), path
+
+
+def test_sqlite_tracker_goes_stale_on_other_connections_writes(tmp_path):
+    db = str(tmp_path / 'tracker.db')
+    ours = ExpenseTracker('alice', storage=SqliteStorage(db))
+    ours.add_expense(5, 'Food', None, 'snack')
+    assert not ours.stale()
+    ExpenseTracker('alice', storage=SqliteStorage(db)).add_expense(7, 'Food', None, 'lunch')
+    assert ours.stale()
+
+
+def test_search_syntax_matches_on_every_backend(tmp_path):
+    descriptions = ['Coffee Shop downtown', 'coffee', 'Cafe coffee beans', 'Decoffeinated tea', 'grocery run',
+                    '100% juice', 'snake_case fee']
+    trackers = [ExpenseTracker('alice', storage=MemoryStorage()),
+                ExpenseTracker('alice', storage=SqliteStorage(str(tmp_path / 'tracker.db')))]
+    for tracker in trackers:
+        for n, description in enumerate(descriptions):
+            tracker.add_expense(n + 1, 'Food', f'2024-01-{n + 1:02d}', description)
+    for query in ['coffee', 'COF', 'coffee cafe', '*offee', 'cof *beans', 'shop tea', '100%', '*_case', 'fee']:
+        found = [sorted(x.description for x in tracker.search(query)) for tracker in trackers]
+        assert found[0] == found[1], query
+    assert [x.description for x in trackers[1].search('*offee')] == descriptions[:3]
+
+
+def test_sqlite_sessions_merge_categories_and_budgets(tmp_path):
+    db = str(tmp_path / 'tracker.db')
+    first = ExpenseTracker('alice', storage=SqliteStorage(db))
+    second = ExpenseTracker('alice', storage=SqliteStorage(db))
+    first.categories.append('A')
+    first.user_data['budgets']['categories'] = {'Food': 100}
+    first.budgets_changed()
+    second.categories.append('B')
+    second.user_data['budgets']['monthly'] = 500
+    second.budgets_changed()
+    stored = SqliteStorage(db).load('alice')
+    assert stored['categories'][-2:] == ['A', 'B']
+    assert stored['budgets']['categories'] == {'Food': 100}
+    assert stored['budgets']['monthly'] == 500
+    assert second.user_data['budgets']['categories'] == {'Food': 100}
+
+
+def test_import_errors_name_their_file(tmp_path):
+    first, second = tmp_path / 'first.csv', tmp_path / 'second.csv'
+    first.write_text('date,amount,description\n2024-01-02,-4.50,coffee\nnot a date,-1,bad\n')
+    second.write_text('date,amount,description\n2024-01-03,,empty\n2024-01-04,1200,salary\n')
+    tracker = ExpenseTracker('alice', storage=MemoryStorage())
+    result = import_files(tracker, [str(first), str(second)])
+    assert result['added'] == 2
+    assert [(path, line) for path, line, _ in result['errors']] == [(str(first), 3), (str(second), 2)]
+
+
+def test_period_totals_follow_edits_on_every_backend(tmp_path):
+    for storage in (MemoryStorage(), SqliteStorage(str(tmp_path / 'tracker.db'))):
+        tracker = ExpenseTracker('alice', storage=storage)
+        rent = tracker.add_expense(700, 'Housing', '2024-03-01', 'rent')
+        tracker.add_expense(20, 'Food', '2024-03-05', 'lunch')
+        snack = tracker.add_expense(5, 'Food', '2024-04-02', 'snack')
+        tracker.edit_expense(rent.id, amount=750)
+        tracker.delete_expense(snack.id)
+        assert tracker.total_expenses('2024-03') == 770
+        assert tracker.total_expenses('2024-04') == 0
+        assert tracker.category_totals('2024') == {'Housing': 750, 'Food': 20}
+        assert tracker.total_expenses() == 770
+
+
+def test_journal_replays_on_start_and_compacts_into_the_shard(tmp_path):
+    tracker = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), journal=True)
+    lunch = tracker.add_expense(12, 'Food', '2024-01-02', 'lunch')
+    tracker.add_expense(3, 'Food', '2024-01-03', 'coffee')
+    tracker.edit_expense(lunch.id, amount=15)
+    assert tracker.journal.size() > 0
+    assert ShardedStorage(str(tmp_path)).load('alice').get('expenses', []) == []
+    replayed = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), journal=True)
+    assert sorted(e.amount for e in replayed.expenses) == [3, 15]
+    replayed.compact()
+    assert replayed.journal.size() == 0
+    assert sorted(e['amount'] for e in ShardedStorage(str(tmp_path)).load('alice')['expenses']) == [3, 15]
+
+
+def test_write_behind_holds_changes_until_flush(tmp_path):
+    tracker = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), journal=True, write_behind=True)
+    for n in range(3):
+        tracker.add_expense(n + 1, 'Food', None, 'snack')
+    assert tracker.dirty
+    assert ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), journal=True).expenses == []
+    assert tracker.flush() and not tracker.dirty
+    assert len(ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), journal=True).expenses) == 3
+
+
+def test_sqlite_backend_keeps_rows_across_sessions(tmp_path):
+    db = str(tmp_path / 'tracker.db')
+    tracker = ExpenseTracker('alice', storage=SqliteStorage(db))
+    rent = tracker.add_expense(700, 'Housing', '2024-03-01', 'rent')
+    lunch = tracker.add_expense(20, 'Food', '2024-03-05', 'lunch')
+    tracker.add_income(2000, 'Salary', '2024-03-01', 'march pay')
+    tracker.edit_expense(lunch.id, amount=25)
+    tracker.delete_expense(rent.id)
+    reopened = ExpenseTracker('alice', storage=SqliteStorage(db))
+    assert [(e.amount, e.description) for e in reopened.expenses] == [(25, 'lunch')]
+    assert reopened.total_income() == 2000 and reopened.count('expense') == 1
+    assert [e.description for e in reopened.search(start=datetime(2024, 3, 5), min_amount=10)] == ['lunch']
+    assert SqliteStorage(db).load('bob') == {}
+
+
+def test_date_and_amount_searches_match_a_scan(tmp_path):
+    rng = random.Random(7)
+    tracker = ExpenseTracker('alice', storage=MemoryStorage())
+    for n in range(400):
+        tracker.add_expense(rng.randint(1, 100), 'Food', f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                            f'item {n}')
+    for record in rng.sample(tracker.expenses, 50):
+        tracker.delete_expense(record.id)
+    start, end = datetime(2024, 3, 10), datetime(2024, 7, 20)
+    found = tracker.search(start=start, end=end, min_amount=20, max_amount=60)
+    expected = [e for e in tracker.expenses
+                if '2024-03-10' <= e.date[:10] <= '2024-07-20' and 20 <= e.amount <= 60]
+    assert sorted(e.id for e in found) == sorted(e.id for e in expected)
+    assert [e.date for e in found] == sorted(e.date for e in found)
+
+
+def test_text_index_is_saved_and_reused(tmp_path, monkeypatch):
+    tracker = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)))
+    tracker.add_expense(4, 'Food', None, 'Coffee Shop downtown')
+    tracker.add_expense(9, 'Food', None, 'grocery run')
+    rebuild = TextIndex.rebuild
+    rebuilt = []
+
+    def spy(index, records):
+        records = list(records)
+        rebuilt.extend(records)
+        rebuild(index, records)
+    monkeypatch.setattr(TextIndex, 'rebuild', spy)
+    reopened = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)))
+    assert rebuilt == []
+    assert [e.description for e in reopened.search('cof shop')] == ['Coffee Shop downtown']
+
+
+def test_users_json_saves_one_profile_and_copies_the_rest(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps([{'userName': 'bob', 'expenses': [], 'note': 'untouched'},
+                                {'userName': 'alice', 'password': 'hunter2', 'expenses': []}]))
+    storage = JsonFileStorage(str(path))
+    tracker = ExpenseTracker('alice', storage=storage)
+    tracker.add_expense(5, 'Food', None, 'snack')
+    assert jsonstream.usernames(str(path)) == ['bob', 'alice']
+    assert storage.load('bob') == {'userName': 'bob', 'expenses': [], 'note': 'untouched'}
+    assert [e['description'] for e in storage.load('alice')['expenses']] == ['snack']
+    assert storage.load('alice')['password'] == 'hunter2'
+
+
+def test_users_json_migrates_into_shards(tmp_path):
+    legacy = tmp_path / 'users.json'
+    legacy.write_text(json.dumps([{'userName': name, 'expenses': [{'amount': 5, 'category': 'Food'}]}
+                                  for name in ('alice', 'bob')]))
+    storage = ShardedStorage(str(tmp_path / 'data'))
+    storage.migrate_from(str(legacy))
+    assert sorted(storage.users()) == ['alice', 'bob']
+    assert ExpenseTracker('bob', storage=storage).total_expenses() == 5
+
+
+def test_export_reimports_as_duplicates(tmp_path):
+    tracker = ExpenseTracker('alice', storage=MemoryStorage())
+    tracker.add_expense(4.5, 'Food', '2024-01-02T08:30:00', 'coffee')
+    tracker.add_expense(4.5, 'Food', '2024-01-02T09:00:00', 'coffee')
+    tracker.add_income(1200, 'Salary', '2024-01-01', 'pay')
+    path = str(tmp_path / 'out.csv')
+    assert export(tracker, path) == 3
+    copy = ExpenseTracker('bob', storage=MemoryStorage())
+    assert import_files(copy, [path])['added'] == 3
+    assert sorted((e.amount, e.description) for e in copy.expenses) == [(4.5, 'coffee'), (4.5, 'coffee')]
+    again = import_files(copy, [path])
+    assert (again['added'], again['duplicates']) == (0, 3)
+    assert import_files(tracker, [path])['duplicates'] == 3
+
+
+def test_pages_and_timeline_walk_the_history(tmp_path):
+    tracker = ExpenseTracker('alice', storage=MemoryStorage())
+    records = [tracker.add_expense(n + 1, 'Food', f'2024-01-{n % 28 + 1:02d}', f'item {n}') for n in range(30)]
+    tracker.add_income(500, 'Salary', '2024-01-15', 'pay')
+    for record in records[5:10]:
+        tracker.delete_expense(record.id)
+    kept = records[:5] + records[10:]
+    assert tracker.page('expense', 3, 4) == kept[3:7]
+    assert tracker.page('expense', 0, 3, reverse=True) == kept[::-1][:3]
+    assert [e.amount for e in tracker.page('expense', 0, 3, key='amount', reverse=True)] == [30, 29, 28]
+    timeline = Timeline(tracker, page_size=10)
+    pages = [timeline.top()]
+    while not timeline.at_end:
+        pages.append(timeline.next())
+    rows = [row for page in pages for row in page]
+    assert len(rows) == 26 and ('income', tracker.income[0]) in rows
+    assert [tracker.stream_key()(row) for row in rows] == sorted(map(tracker.stream_key(), rows), reverse=True)
+
+
+def test_lazy_start_reads_the_snapshot_before_loading_records(tmp_path):
+    tracker = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), snapshot=True)
+    tracker.add_expense(700, 'Housing', '2024-03-01', 'rent')
+    tracker.add_expense(20, 'Food', '2024-04-05', 'lunch')
+    lazy = ExpenseTracker('alice', storage=ShardedStorage(str(tmp_path)), snapshot=True, lazy=True)
+    assert not lazy.hydrated
+    assert lazy.total_expenses() == 720 and lazy.total_expenses('2024-03') == 700
+    assert lazy.category_totals() == {'Housing': 700, 'Food': 20}
+    assert not lazy.hydrated
+    assert sorted(e.description for e in lazy.expenses) == ['lunch', 'rent'] and lazy.hydrated
+
+
+def test_registry_evicts_and_reloads_stale_trackers(tmp_path):
+    registry = TrackerRegistry(lambda name: ExpenseTracker(name, storage=ShardedStorage(str(tmp_path))),
+                               max_trackers=1)
+    registry.get('alice')
+    bob = registry.get('bob')
+    assert 'alice' not in registry and registry.stats()['evictions'] == 1
+    ExpenseTracker('bob', storage=ShardedStorage(str(tmp_path))).add_expense(5, 'Food', None, 'snack')
+    reloaded = registry.get('bob')
+    assert reloaded is not bob and len(reloaded.expenses) == 1
+    assert registry.stats()['invalidations'] == 1
+
+
+def test_http_routes_call_the_service(tmp_path):
+    service = TrackerService(str(tmp_path / 'tracker.db'))
+    try:
+        status, added = dispatch(service, 'POST', '/users/alice/expenses',
+                                 {'amount': 4.5, 'category': 'Food', 'date': '2024-01-02', 'description': 'Coffee'})
+        assert status == 201
+        record_id = added['transaction']['id']
+        assert dispatch(service, 'PATCH', f'/users/alice/expenses/{record_id}', {'amount': 5})[0] == 200
+        status, listed = dispatch(service, 'GET', '/users/alice/expenses?limit=10', None)
+        assert status == 200 and [t['amount'] for t in listed['transactions']] == [5]
+        status, summary = dispatch(service, 'GET', '/users/alice/reports/summary?period=2024-01', None)
+        assert summary['expenses'] == 5 and summary['categories'] == {'Food': 5}
+        assert dispatch(service, 'GET', '/users/alice/expenses/search?term=cof', None)[1]['total'] == 1
+        assert dispatch(service, 'DELETE', f'/users/alice/expenses/{record_id}', None)[0] == 200
+        assert dispatch(service, 'GET', f'/users/alice/expenses/{record_id}', None)[0] == 404
+        assert dispatch(service, 'POST', '/users/alice/expenses', {'amount': 'lots'})[0] == 400
+        assert dispatch(service, 'PUT', '/users/alice/expenses', None)[0] == 405
+    finally:
+        service.close()
+
+
+def test_whole_day_dates_fall_inside_day_bounds_on_every_backend(tmp_path):
+    for storage in (MemoryStorage(), SqliteStorage(str(tmp_path / 'tracker.db'))):
+        tracker = ExpenseTracker('alice', storage=storage)
+        tracker.add_expense(20, 'Food', '2024-03-05', 'lunch')
+        tracker.add_expense(8, 'Food', '2024-03-04T23:00:00', 'late snack')
+        assert [e.description for e in tracker.search(start=datetime(2024, 3, 5))] == ['lunch']
+        assert [e.description for e in tracker.search(end=datetime(2024, 3, 4))] == ['late snack']
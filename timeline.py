@@ -0,0 +1,91 @@
+"""Newest-first, paginated view over expenses and income together.
+
+Pages are produced by heapq-merging the per-kind date streams from the
+page boundary onwards, so rendering a page costs O(log n + page size)
+instead of copying and sorting the whole history. Transactions with the
+same date are ordered by type and id, which makes the order total, and
+the cursor is the (date, type, id) of the boundary row rather than a list
+position, so it stays valid while transactions are added or deleted.
+"""
+import heapq
+from datetime import datetime, timedelta
+from itertools import groupby, repeat
+
+PAGE_SIZE = 20
+
+
+class Timeline:
+    def __init__(self, tracker, page_size=PAGE_SIZE, kinds=('expense', 'income'), category=None):
+        self.tracker = tracker
+        self.page_size = page_size
+        self.kinds = kinds
+        self.category = category
+        self.page = []
+        self._date_key = tracker.stream_key()
+
+    def _order(self, pair):
+        kind, record = pair
+        return self._date_key(pair), kind, record.id
+
+    def _stream(self, date, reverse):
+        # Every row from `date` on (back from it with reverse) in total order
+        streams = [zip(repeat(kind), self.tracker.iter_from(kind, date, reverse, self.category))
+                   for kind in self.kinds]
+        merged = heapq.merge(*streams, key=self._date_key, reverse=reverse)
+        for _, same_date in groupby(merged, key=self._date_key):
+            yield from sorted(same_date, key=self._order, reverse=reverse)
+
+    def _after(self, pair, reverse):
+        # Rows strictly past `pair` in the given direction
+        cursor = self._order(pair)
+        for row in self._stream(pair[1].date, reverse):
+            order = self._order(row)
+            if order < cursor if reverse else order > cursor:
+                yield row
+
+    def _take(self, rows):
+        page = []
+        for row in rows:
+            page.append(row)
+            if len(page) >= self.page_size:
+                break
+        return page
+
+    def top(self):
+        """The most recent page."""
+        self.page = self._take(self._stream(None, True))
+        return self.page
+
+    def jump(self, date):
+        """The page starting at the newest transaction on or before `date` (a datetime; the whole day counts)."""
+        end = datetime.combine(date.date() + timedelta(days=1), datetime.min.time()) - timedelta(microseconds=1)
+        self.page = self._take(self._stream(end.isoformat(), True))
+        return self.page
+
+    def next(self):
+        """The next older page; stays on the last page at the end of the history."""
+        if not self.page:
+            return self.top()
+        page = self._take(self._after(self.page[-1], True))
+        if page:
+            self.page = page
+        return self.page
+
+    def prev(self):
+        """The next newer page; the most recent page once there is nothing newer."""
+        if not self.page:
+            return self.top()
+        newer = self._take(self._after(self.page[0], False))
+        if len(newer) < self.page_size:
+            return self.top()
+        self.page = newer[::-1]
+        return self.page
+
+    @property
+    def at_end(self):
+        """True when no older transaction exists below the current page."""
+        if not self.page:
+            return True
+        for _ in self._after(self.page[-1], True):
+            return False
+        return True
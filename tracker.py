@@ -1,113 +1,1007 @@
+import atexit
+import copy
+import heapq
 import json
 import os
+import signal
+import threading
+import time
 import uuid
+from bisect import bisect_right, insort
+from contextlib import contextmanager, nullcontext
+from itertools import repeat
 from expense import Expense
 from income import Income
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from storage import default_storage, without_secrets
+from persistence import atomic_open
+from snapshot import Snapshot, write_snapshot, forget_secrets as forget_snapshot_secrets
+from journal import Journal
+from aggregates import Aggregates, amount_of, _category
+from rollups import Rollups
+from budget_engine import BudgetEngine, day_number
+from record import compact_id
+from importer import CHUNK_SIZE as IMPORT_CHUNK_SIZE, MAX_ERRORS, fingerprint, make_key, prepared_chunks
+from indexes import date_index, amount_index, date_key, record_date_key, SortedIndex, TextIndex
+
+# Journal size (bytes) past which it is folded into a fresh snapshot
+COMPACT_THRESHOLD = 256 * 1024
+
+# Write-behind mode: flush once this many changes are pending or this many
+# seconds have passed since the last write, whichever comes first
+AUTOSAVE_EVERY = 50
+AUTOSAVE_INTERVAL = 30.0
+
+# Categories of a new profile
+DEFAULT_CATEGORIES = ("Food", "Transport", "Entertainment", "Utilities", "Other")
+DEFAULT_INCOME_CATEGORIES = ("Salary", "Freelance", "Gift")
+
+# What a lazy start leaves unset until the records are first needed
+_RECORD_STATE = ('_by_id', '_views', '_slot_of', '_holes', 'aggregates', 'date_index', 'amount_index',
+                 'text_index', '_sorted_views')
+
+def date_bounds(start=None, end=None):
+    """Turn optional start/end datetimes into ISO bounds [lo, hi).
+
+    The end date is inclusive, so hi is midnight of the following day.
+    """
+    lo = start.isoformat() if start is not None else None
+    hi = None
+    if end is not None:
+        hi = datetime.combine(end.date() + timedelta(days=1), datetime.min.time()).isoformat()
+    return lo, hi
+
+def _live_slot(holes, position):
+    # Slot of the position-th live entry of a view whose tombstones sit at the sorted `holes` slots
+    lo, hi = position, position + len(holes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid + 1 - bisect_right(holes, mid) > position:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def period_bounds(period):
+    """ISO bounds [lo, hi) for a 'YYYY' or 'YYYY-MM' period, or None if malformed."""
+    try:
+        if len(period) == 4:
+            year = int(period)
+            return datetime(year, 1, 1).isoformat(), datetime(year + 1, 1, 1).isoformat()
+        if len(period) == 7 and period[4] == '-':
+            year, month = int(period[:4]), int(period[5:])
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+            return start.isoformat(), end.isoformat()
+    except ValueError:
+        pass
+    return None
+
+def forget_password(storage, username):
+    """Remove plaintext passwords from a stored profile and the tracker's sidecars for it.
+
+    Called once a login has moved to credentials.json. Only the password
+    goes; the revision stays, so trackers and sidecars remain valid.
+    """
+    forget = getattr(storage, 'forget_secrets', None)
+    if forget is not None:
+        forget(username)
+    sidecar = getattr(storage, 'sidecar_path', None)
+    if sidecar is None or getattr(storage, 'queryable', False):
+        return
+    with storage.lock(username):
+        path = sidecar(username, '.meta.json')
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+            profile = saved['profile']
+            if profile is not without_secrets(profile):
+                saved['profile'] = without_secrets(profile)
+                with atomic_open(path) as f:
+                    json.dump(saved, f, separators=(',', ':'))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        path = sidecar(username, '.snap')
+        if os.path.exists(path):
+            try:
+                forget_snapshot_secrets(path)
+            except (OSError, ValueError):
+                pass
+
+def _merge_meta(base, ours, theirs):
+    # Three-way merge of metadata: take our side wherever we changed it, theirs elsewhere
+    if isinstance(ours, tuple):
+        return tuple(_merge_meta(b, o, t) for b, o, t in zip(base, ours, theirs))
+    if isinstance(ours, list) and isinstance(theirs, list) and isinstance(base, list):
+        removed = [x for x in base if x not in ours]
+        added = [x for x in ours if x not in base]
+        return [x for x in theirs if x not in removed] + [x for x in added if x not in theirs]
+    if isinstance(ours, dict) and isinstance(theirs, dict) and isinstance(base, dict):
+        merged = {}
+        for key in list(theirs) + [k for k in ours if k not in theirs]:
+            if key not in ours:
+                if key not in base:
+                    merged[key] = theirs[key]       # they added it (else we removed it)
+            elif key not in theirs:
+                if key not in base or ours[key] != base[key]:
+                    merged[key] = ours[key]         # we added or changed it (else they removed it)
+            else:
+                merged[key] = _merge_meta(base.get(key), ours[key], theirs[key])
+        return merged
+    return theirs if ours == base else ours
 
 class ExpenseTracker:
-    def __init__(self, username):
+    def __init__(self, username, storage=None, journal=False, compact_threshold=COMPACT_THRESHOLD,
+                 write_behind=False, autosave_every=AUTOSAVE_EVERY, autosave_interval=AUTOSAVE_INTERVAL,
+                 lazy=False, snapshot=False):
         self.username = username
-        self.filename = "users.json"
-        self.user_data = self._load_user_data()
-        
-        raw_expenses = self.user_data.get('expenses', [])
-        self.expenses = [Expense.from_dict(e) for e in raw_expenses]
-        
-        raw_income = self.user_data.get('income', [])
-        self.income = [Income.from_dict(i) for i in raw_income]
-        
-        self.categories = self.user_data.get('categories', ["Food", "Transport", "Entertainment", "Utilities", "Other"])
-        self.income_categories = self.user_data.get('income_categories', ["Salary", "Freelance", "Gift"])
-        
+        self.storage = storage if storage is not None else default_storage()
+        # Queryable backends (SQLite) keep transactions out of memory and answer queries themselves
+        self.queryable = getattr(self.storage, 'queryable', False)
+        self.compact_threshold = compact_threshold
+        self.journal = None
+        if journal and not self.queryable:
+            self.journal = Journal(self.storage.sidecar_path(username, '.journal'))
+        # Also keep a binary .snap copy of the records (see snapshot.py), loaded in place of the JSON
+        self.snapshot = snapshot and not self.queryable
+
+        # Write-behind state: journal entries not yet written, whether a full
+        # snapshot is owed (metadata changes, or no journal), and batch nesting
+        self.write_behind = write_behind
+        self.autosave_every = autosave_every
+        self.autosave_interval = autosave_interval
+        self._pending = []
+        self._unsaved = False
+        self._changes = 0
+        self._last_flush = time.monotonic()
+        self._batch_depth = 0
+        # Held while pending changes are handed to the journal or a snapshot, which the
+        # background autosave thread (see autosave_in_background()) may also do.
+        # Always taken before the storage lock (_lock()), never while holding it.
+        self._flush_lock = threading.RLock()
+        self._autosave_stop = None
+
+        # Conflict detection: the revision this session started from, and what
+        # it changed since, so a save can be replayed over someone else's
+        self._session_ops = []
+
+        # Spend per budget period, fed by every expense change (see budget_engine.py)
+        self.budget_engine = BudgetEngine(self._spend_by_day)
+
+        # Lazy start: only metadata, counts, totals and rollups are read now;
+        # the records and their indexes are built on first use (see hydrate())
+        self._lazy = False
+        self._hydrate_lock = threading.Lock()
+        # A lazy tracker's snapshot, mapped for reports until the records load
+        self._mapped = None
+        if lazy and self._load_meta():
+            return
+        replayed = self._load_state()
+        self._build_indexes(reuse_saved=not replayed)
+
+    def __getattr__(self, name):
+        # Only reached for unset attributes: on a lazy tracker, the record state
+        if name in _RECORD_STATE and self.__dict__.get('_lazy'):
+            self.hydrate()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _load_state(self):
+        # Snapshot plus journal; returns the number of journal entries replayed
+        snap = self._open_snapshot()
+        # Queryable backends count their own revisions (see _note_write()); read before the data,
+        # so a write landing in between makes this session stale rather than hiding
+        stored = self.storage.revision(self.username) if self.queryable else None
+        self.user_data = dict(snap.profile) if snap is not None else self._load_user_data()
+        self._base_revision = stored if self.queryable else self.user_data.get('revision', 0)
+        self._missed_write = False
+
+        # id -> record, in insertion order. None until hydrated on queryable backends.
+        self._by_id = {'expense': None, 'income': None}
+        # Cached list views of the tables above. A delete leaves a tombstone
+        # (None) at its slot, listed in _holes, and the view is compacted once
+        # a full list is wanted or the tombstones pile up.
+        self._views = {'expense': None, 'income': None}
+        self._slot_of = {'expense': None, 'income': None}
+        self._holes = {'expense': [], 'income': []}
+        if snap is not None:
+            with snap:
+                for kind in ('expense', 'income'):
+                    self._by_id[kind] = {r.key: r for r in snap.records(kind)}
+        elif not self.queryable:
+            raw_expenses = self.user_data.pop('expenses', [])
+            self._by_id['expense'] = {e.key: e for e in map(Expense.from_dict, raw_expenses)}
+
+            raw_income = self.user_data.pop('income', [])
+            self._by_id['income'] = {i.key: i for i in map(Income.from_dict, raw_income)}
+
+        self._init_meta()
+
+        replayed = 0
+        if self.journal is not None:
+            for entry in self.journal.replay():
+                self._apply(entry)
+                replayed += 1
+        return replayed
+
+    def _init_meta(self):
+        self.categories = self.user_data.get('categories', list(DEFAULT_CATEGORIES))
+        self.income_categories = self.user_data.get('income_categories', list(DEFAULT_INCOME_CATEGORIES))
+
         if 'budgets' not in self.user_data:
             self.user_data['budgets'] = {'monthly': 0, 'categories': {}}
+        # Metadata as loaded, the common ancestor for a three-way merge
+        self._base_meta = copy.deepcopy(self._meta())
+
+    def _load_meta(self):
+        # Lazy start from the .meta.json and rollup sidecars; False (and a full
+        # load) if either is missing or stale, or the journal needs replaying
+        revision = getattr(self.storage, 'revision', None)
+        if self.queryable or revision is None or (self.journal is not None and self.journal.size()):
+            return False
+        saved = self._read_sidecar('.meta.json', revision(self.username))
+        if saved is None:
+            return False
+        try:
+            self.user_data = dict(saved['profile'])
+            self._counts = {kind: int(saved['counts'][kind]) for kind in ('expense', 'income')}
+            self._totals = {kind: float(saved['totals'][kind]) for kind in ('expense', 'income')}
+        except (KeyError, ValueError, TypeError):
+            return False
+        self._base_revision = self.user_data.get('revision', 0)
+        self.rollups = Rollups()
+        if not self._load_rollups():
+            return False
+        self._init_meta()
+        self._mapped = self._open_snapshot(self._base_revision)
+        self._lazy = True
+        self.budget_engine.load(self.user_data['budgets'])
+        return True
+
+    @property
+    def hydrated(self):
+        """False while a lazy tracker hasn't loaded its records yet."""
+        return not self._lazy
+
+    def hydrate(self):
+        """Load the records and build their indexes, if a lazy start skipped them.
+
+        The work is done on a copy of the tracker and swapped in at the end,
+        so it can run in a background thread while this one keeps serving
+        metadata; anything that needs the records waits for it.
+        """
+        if not self._lazy:
+            return
+        with self._hydrate_lock:
+            if not self._lazy:
+                return
+            shadow = object.__new__(type(self))
+            shadow.__dict__.update(self.__dict__)
+            shadow._lazy = False
+            shadow.budget_engine = BudgetEngine(shadow._spend_by_day)
+            replayed = shadow._load_state()
+            shadow._build_indexes(reuse_saved=not replayed)
+            # Keep metadata edited meanwhile, merged with anything saved since the lazy start
+            base, ours = self._base_meta, self._meta()
+            for name in _RECORD_STATE + ('rollups', 'user_data', '_base_revision', '_base_meta'):
+                setattr(self, name, getattr(shadow, name))
+            self.categories, self.income_categories, self.user_data['budgets'] = _merge_meta(base, ours, shadow._meta())
+            self._lazy = False
+            self.budget_engine.load(self.user_data['budgets'])
+            # Unmapped once no report still scanning it holds a reference
+            self._mapped = None
+
+    def hydrate_in_background(self):
+        """Start loading a lazy tracker's records on a daemon thread."""
+        if not self._lazy:
+            return None
+
+        def run():
+            try:
+                self.hydrate()
+            except Exception:
+                # Tried again, and reported, by whatever needs the records first
+                pass
+        thread = threading.Thread(target=run, name=f"hydrate-{self.username}", daemon=True)
+        thread.start()
+        return thread
+
+    def _build_indexes(self, reuse_saved=False):
+        # Running totals and indexes; queryable backends use SQL instead
+        self.aggregates = None
+        self.rollups = None
+        self.date_index = {}
+        self.amount_index = {}
+        self.text_index = {}
+        # (kind, key) -> SortedIndex over a field no other index covers, for paging
+        self._sorted_views = {}
+        if not self.queryable:
+            self.aggregates = Aggregates()
+            self.aggregates.rebuild(self.expenses, self.income)
+            self.rollups = Rollups()
+            if not reuse_saved or not self._load_rollups():
+                self.rollups.rebuild(self.expenses, self.income)
+            for kind, records in (('expense', self.expenses), ('income', self.income)):
+                self.date_index[kind] = date_index()
+                self.date_index[kind].rebuild(records)
+                self.amount_index[kind] = amount_index()
+                self.amount_index[kind].rebuild(records)
+            # The saved postings refer to snapshot positions, so they are only
+            # reusable when no journal entries changed the lists since
+            if not reuse_saved or not self._load_text_index():
+                for kind in ('expense', 'income'):
+                    self.text_index[kind] = TextIndex()
+                    self.text_index[kind].rebuild(self._records(kind))
+        self.budget_engine.load(self.user_data['budgets'])
 
     def _load_user_data(self):
-        if not os.path.exists(self.filename):
-            return {}
+        u = self.storage.load(self.username)
+        if u:
+            # Ensure budgets key exists
+            if 'budgets' not in u:
+                u['budgets'] = {'monthly': 0, 'categories': {}}
+        return u
+
+    @staticmethod
+    def _record_class(kind):
+        return Expense if kind == 'expense' else Income
+
+    def _table(self, kind):
+        table = self._by_id[kind]
+        if table is None:
+            # Queryable backend: pull the rows in on first access
+            cls = self._record_class(kind)
+            table = {r.key: r for r in map(cls.from_dict, self.storage.fetch(self.username, kind))}
+            self._by_id[kind] = table
+        return table
+
+    def _view(self, kind):
+        # The list view, tombstones included
+        view = self._views[kind]
+        if view is None:
+            view = self._views[kind] = list(self._table(kind).values())
+            self._slot_of[kind] = {r.key: n for n, r in enumerate(view)}
+            self._holes[kind] = []
+        return view
+
+    def _records(self, kind):
+        view = self._view(kind)
+        if self._holes[kind]:
+            self._compact_view(kind)
+        return view
+
+    def _compact_view(self, kind):
+        # In place, so lists already handed out stay current
+        view = self._views[kind]
+        view[:] = [r for r in view if r is not None]
+        self._slot_of[kind] = {r.key: n for n, r in enumerate(view)}
+        self._holes[kind] = []
+
+    def _view_append(self, kind, record):
+        view = self._views[kind]
+        if view is not None:
+            self._slot_of[kind][record.key] = len(view)
+            view.append(record)
+
+    def _view_remove(self, kind, record):
+        view = self._views[kind]
+        if view is None:
+            return
+        slot = self._slot_of[kind].pop(record.key)
+        view[slot] = None
+        holes = self._holes[kind]
+        insort(holes, slot)
+        if len(holes) > 1024 and len(holes) * 2 > len(view):
+            self._compact_view(kind)
+
+    @property
+    def expenses(self):
+        return self._records('expense')
+
+    @property
+    def income(self):
+        return self._records('income')
+
+    def get_expense(self, expense_id):
+        """The expense with this id, or None."""
+        return self._get('expense', expense_id)
+
+    def get_income(self, income_id):
+        """The income record with this id, or None."""
+        return self._get('income', income_id)
+
+    def _get(self, kind, record_id):
+        table = self._by_id[kind]
+        if table is None:
+            row = self.storage.get(self.username, kind, record_id)
+            return self._record_class(kind).from_dict(row) if row else None
+        return table.get(compact_id(record_id))
+
+    def _sidecar(self, suffix):
+        sidecar = getattr(self.storage, 'sidecar_path', None)
+        return sidecar(self.username, suffix) if sidecar else None
+
+    def _read_sidecar(self, suffix, revision=None):
+        # A saved index, or None if missing, unreadable or from another revision
+        if revision is None:
+            revision = self.user_data.get('revision')
+        path = self._sidecar(suffix)
+        if path is None or not os.path.exists(path):
+            return None
         try:
-            with open(self.filename, 'r') as f:
-                users = json.load(f)
-                for u in users:
-                    if u['userName'] == self.username:
-                        # Ensure budgets key exists
-                        if 'budgets' not in u:
-                            u['budgets'] = {'monthly': 0, 'categories': {}}
-                        return u
-        except (json.JSONDecodeError, KeyError):
-            pass
-        return {}
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(saved, dict) or saved.get('revision') != revision:
+            return None
+        return saved
+
+    def _write_sidecar(self, suffix, saved):
+        path = self._sidecar(suffix)
+        if path is None:
+            return
+        saved['revision'] = self.user_data.get('revision')
+        with atomic_open(path) as f:
+            json.dump(saved, f, separators=(',', ':'))
+
+    def _load_text_index(self):
+        saved = self._read_sidecar('.text.json')
+        if saved is None:
+            return False
+        try:
+            for kind in ('expense', 'income'):
+                index = TextIndex()
+                index.load(saved[kind], self._records(kind))
+                self.text_index[kind] = index
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return False
+        return True
+
+    def _save_text_index(self):
+        self._write_sidecar('.text.json', {kind: self.text_index[kind].dump(self._records(kind))
+                                           for kind in ('expense', 'income')})
+
+    def _load_rollups(self):
+        saved = self._read_sidecar('.rollups.json')
+        if saved is None:
+            return False
+        try:
+            self.rollups.load(saved)
+        except (KeyError, ValueError, TypeError):
+            self.rollups = Rollups()
+            return False
+        return True
+
+    def _save_rollups(self):
+        self._write_sidecar('.rollups.json', self.rollups.dump())
+
+    def _open_snapshot(self, revision=None):
+        # The .snap sidecar mapped, if enabled and written at the stored revision
+        if not self.snapshot:
+            return None
+        path = self._sidecar('.snap')
+        stored = getattr(self.storage, 'revision', None)
+        if path is None or stored is None or not os.path.exists(path):
+            return None
+        try:
+            snap = Snapshot(path)
+        except (OSError, ValueError):
+            return None
+        if snap.revision != (stored(self.username) if revision is None else revision):
+            snap.close()
+            return None
+        return snap
+
+    def _save_snapshot(self, data):
+        profile = {k: v for k, v in data.items() if k not in ('expenses', 'income')}
+        with atomic_open(self._sidecar('.snap'), 'wb') as f:
+            write_snapshot(f, profile, self.expenses, self.income)
+
+    def _save_meta(self, data):
+        # Everything a lazy start needs besides the rollups
+        profile = {k: v for k, v in without_secrets(data).items() if k not in ('expenses', 'income')}
+        self._write_sidecar('.meta.json', {
+            'profile': profile,
+            'counts': {kind: len(self._table(kind)) for kind in ('expense', 'income')},
+            'totals': {'expense': self.aggregates.expense_total, 'income': self.aggregates.income_total}})
+
+    def _lock(self):
+        # Per-user advisory lock from the storage backend; SQLite does its own locking
+        lock = getattr(self.storage, 'lock', None)
+        if lock is None or self.queryable:
+            return nullcontext()
+        return lock(self.username)
+
+    def _transaction(self):
+        # Queryable backends: keep the merge and the write it feeds in one transaction
+        if self.queryable:
+            return self.storage.transaction(self.username)
+        return nullcontext()
+
+    def _conflicted(self):
+        # Has another session saved or journaled since this one loaded?
+        if self.queryable:
+            return self._missed_write or self.storage.revision(self.username) != self._base_revision
+        revision = getattr(self.storage, 'revision', None)
+        if revision is not None and revision(self.username) != self._base_revision:
+            return True
+        return self.journal is not None and self.journal.changed_elsewhere()
+
+    def stale(self):
+        """True if another session saved or journaled this profile since it was loaded or last saved.
+
+        On queryable backends, since it was loaded: saving doesn't merge there.
+        """
+        return self._conflicted()
+
+    def _note_write(self):
+        # After a row-level write of our own: the stored revision moved on by it,
+        # and if it had moved before, another session wrote since we loaded
+        before, after = self.storage.last_write(self.username)
+        if before != self._base_revision:
+            self._missed_write = True
+        self._base_revision = after
+
+    def _merge(self):
+        """Reload what other sessions wrote and re-apply this session's changes on top.
+
+        Transactions merge per record: adds from both sides survive, and where
+        both touched the same record this session's edit or delete wins.
+        Categories and budgets merge three-way against the metadata this
+        session loaded, so additions and removals on both sides are kept.
+        """
+        ops = self._session_ops
+        base, ours = self._base_meta, self._meta()
+        self._load_state()
+        for entry in ops:
+            self._apply(entry)
+        merged = _merge_meta(base, ours, self._meta())
+        self.categories, self.income_categories, self.user_data['budgets'] = merged
+        self._build_indexes()
+
+    def _merge_stored_meta(self):
+        # Queryable backends share every row already; only the metadata this
+        # session is about to overwrite needs merging with what is stored
+        stored = self.storage.load(self.username)
+        theirs = (stored.get('categories', list(DEFAULT_CATEGORIES)),
+                  stored.get('income_categories', list(DEFAULT_INCOME_CATEGORIES)),
+                  stored.get('budgets', {'monthly': 0, 'categories': {}}))
+        merged = _merge_meta(self._base_meta, self._meta(), theirs)
+        self.categories, self.income_categories, self.user_data['budgets'] = merged
+        self.budget_engine.load(self.user_data['budgets'])
+
+    def _meta(self):
+        return self.categories, self.income_categories, self.user_data['budgets']
 
     def save(self):
-        self.user_data['expenses'] = [e.to_dict() for e in self.expenses]
-        self.user_data['income'] = [i.to_dict() for i in self.income]
-        self.user_data['categories'] = self.categories
-        self.user_data['income_categories'] = self.income_categories
-        
-        all_users = []
-        if os.path.exists(self.filename):
+        # JSON backends rewrite the whole profile, records included
+        self.hydrate()
+        with self._flush_lock, self._lock():
+            with self._transaction():
+                if self._conflicted():
+                    if self.queryable:
+                        self._merge_stored_meta()
+                    else:
+                        self._merge()
+                # The revision ties sidecar files (like the text index) to this
+                # snapshot and lets other sessions notice that it changed
+                self.user_data['revision'] = self.user_data.get('revision', 0) + 1
+                data = dict(self.user_data)
+                data['categories'] = self.categories
+                data['income_categories'] = self.income_categories
+                if not self.queryable:
+                    # Queryable backends already hold every row written through _commit
+                    data['expenses'] = [e.to_dict() for e in self.expenses]
+                    data['income'] = [i.to_dict() for i in self.income]
+                self.storage.save(self.username, data)
+            if not self.queryable:
+                self._save_text_index()
+                self._save_rollups()
+                self._save_meta(data)
+                if self.snapshot:
+                    self._save_snapshot(data)
+            if self.journal is not None:
+                # The snapshot now contains every journaled mutation
+                self.journal.clear()
+            if self.queryable:
+                self._note_write()
+            else:
+                self._base_revision = self.user_data['revision']
+            self._session_ops = []
+            self._base_meta = copy.deepcopy(self._meta())
+            self._pending = []
+            self._unsaved = False
+            self._changes = 0
+            self._last_flush = time.monotonic()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot."""
+        self.save()
+
+    def _commit(self, entry):
+        # Persist a single mutation: a row-level write on queryable backends,
+        # a journal append when journaling, otherwise a full snapshot rewrite.
+        # In write-behind mode the latter two are deferred until flush().
+        if self.queryable:
+            changed = self.storage.apply(self.username, entry)
+            self._note_write()
+            return changed
+        self._session_ops.append(entry)
+        if self.write_behind:
+            if self.journal is not None:
+                with self._flush_lock:
+                    self._pending.append(entry)
+            else:
+                self._unsaved = True
+            self._changes += 1
+            self.flush_if_due()
+            return 1
+        if self.journal is None:
+            self.save()
+            return 1
+        with self._lock():
+            self.journal.append(entry)
+        if self.journal.size() >= self.compact_threshold:
+            self.compact()
+        return 1
+
+    # --- WRITE-BEHIND ---
+    @property
+    def dirty(self):
+        """True while changes are held in memory only."""
+        return bool(self._pending or self._unsaved)
+
+    def mark_dirty(self):
+        """Record a change to profile metadata (categories, budgets).
+
+        Saved at once normally; in write-behind mode it waits for the next flush.
+        """
+        if not self.write_behind:
+            self.save()
+            return
+        self._unsaved = True
+        self._changes += 1
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flush if enough changes are pending or the autosave interval has passed.
+
+        Only checked when the tracker is used, so a session sitting idle keeps
+        its changes in memory; autosave_in_background() covers that case.
+        """
+        if self._batch_depth or not self.dirty:
+            return False
+        if (self._changes >= self.autosave_every
+                or time.monotonic() - self._last_flush >= self.autosave_interval):
+            return self.flush()
+        return False
+
+    def flush(self):
+        """Write out pending changes: one journal append, or one snapshot. Returns True if anything was written."""
+        with self._flush_lock:
+            if self._unsaved:
+                self.save()
+                return True
+            if not self._append_pending():
+                return False
+            if self.journal.size() >= self.compact_threshold:
+                self.compact()
+            return True
+
+    def _append_pending(self):
+        # Journal the pending entries; the caller holds _flush_lock
+        if not self._pending:
+            return False
+        with self._lock():
+            self.journal.extend(self._pending)
+        self._pending = []
+        self._changes = 0
+        self._last_flush = time.monotonic()
+        return True
+
+    def autosave_in_background(self):
+        """Start a daemon thread that journals pending changes once the autosave interval has passed.
+
+        For interactive sessions, which can wait at a prompt for as long as
+        the user is away. The thread only appends to the journal: changes
+        that owe a full snapshot (metadata edits, or a tracker without a
+        journal) still wait for the next flush on the tracker's own thread,
+        since writing a snapshot reads the records that thread may be changing.
+        """
+        if not self.write_behind or self.journal is None or self._autosave_stop is not None:
+            return None
+        stop = self._autosave_stop = threading.Event()
+
+        def run():
+            wait = self.autosave_interval
+            while not stop.wait(wait):
+                with self._flush_lock:
+                    due = self._last_flush + self.autosave_interval - time.monotonic()
+                    if self._pending and not self._batch_depth and due <= 0:
+                        self._append_pending()
+                        due = self.autosave_interval
+                    wait = max(due, 1.0) if self._pending else self.autosave_interval
+        thread = threading.Thread(target=run, name=f"autosave-{self.username}", daemon=True)
+        thread.start()
+        return thread
+
+    @contextmanager
+    def batch(self):
+        """Hold back automatic flushes until the block ends, e.g. for bulk edits."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush_if_due()
+
+    def close(self):
+        """Flush everything and fold the journal into the snapshot."""
+        if self._autosave_stop is not None:
+            self._autosave_stop.set()
+            self._autosave_stop = None
+        if self.dirty or (self.journal is not None and self.journal.size()):
+            self.save()
+
+    def install_exit_handlers(self):
+        """Flush pending changes at interpreter exit and on SIGTERM/SIGHUP."""
+        atexit.register(self.flush)
+        for name in ('SIGTERM', 'SIGHUP'):
+            signum = getattr(signal, name, None)
+            if signum is None:
+                continue
+            previous = signal.getsignal(signum)
+
+            def handler(signum, frame, previous=previous):
+                self.flush()
+                if callable(previous):
+                    previous(signum, frame)
+                else:
+                    raise SystemExit(128 + signum)
             try:
-                with open(self.filename, 'r') as f:
-                    all_users = json.load(f)
-            except json.JSONDecodeError:
-                all_users = []
-        
-        user_found = False
-        for i, u in enumerate(all_users):
-            if u['userName'] == self.username:
-                all_users[i] = self.user_data
-                user_found = True
+                signal.signal(signum, handler)
+            except ValueError:
+                # Not the main thread; atexit still covers a normal exit
                 break
-        
-        if not user_found:
-            self.user_data['userName'] = self.username
-            all_users.append(self.user_data)
-            
-        with open(self.filename, 'w') as f:
-            json.dump(all_users, f, indent=4)
+
+    def _index_add(self, kind, record):
+        for (view_kind, _), view in self._sorted_views.items():
+            if view_kind == kind:
+                view.add(record)
+        if self.aggregates is not None:
+            self.aggregates.add(kind, record)
+            self.rollups.add(kind, record)
+            self.date_index[kind].add(record)
+            self.amount_index[kind].add(record)
+            self.text_index[kind].add(record)
+
+    def _index_remove(self, kind, record):
+        for (view_kind, _), view in self._sorted_views.items():
+            if view_kind == kind:
+                view.remove(record)
+        if self.aggregates is not None:
+            self.aggregates.remove(kind, record)
+            self.rollups.remove(kind, record)
+            self.date_index[kind].remove(record)
+            self.amount_index[kind].remove(record)
+            self.text_index[kind].remove(record)
+
+    def check_aggregates(self, repair=True):
+        """Rebuild the running totals from scratch and compare.
+
+        Returns True when the maintained totals were consistent. With repair,
+        the freshly rebuilt totals (and sorted indexes) replace the maintained
+        ones either way.
+        """
+        if self.aggregates is None:
+            return True
+        fresh = Aggregates()
+        fresh.rebuild(self.expenses, self.income)
+        rollups = Rollups()
+        rollups.rebuild(self.expenses, self.income)
+        ok = fresh.matches(self.aggregates) and rollups.matches(self.rollups)
+        if repair:
+            self.aggregates = fresh
+            self.rollups = rollups
+            for kind in ('expense', 'income'):
+                self.date_index[kind].rebuild(self._records(kind))
+                self.amount_index[kind].rebuild(self._records(kind))
+                self.text_index[kind].rebuild(self._records(kind))
+        return ok
+
+    def _apply(self, entry):
+        # Replay one journal entry. Every op is idempotent so entries that were
+        # already folded into the snapshot (crash before truncation) are harmless.
+        kind = entry.get('kind')
+        if kind not in ('expense', 'income'):
+            return
+        table = self._table(kind)
+        self._views[kind] = None
+        op = entry.get('op')
+        if op == 'add':
+            record = self._record_class(kind).from_dict(entry.get('data', {}))
+            table.setdefault(record.key, record)
+        elif op == 'edit':
+            record = table.get(compact_id(entry.get('id')))
+            if record is not None:
+                for k, v in entry.get('changes', {}).items():
+                    setattr(record, k, v)
+        elif op == 'delete':
+            table.pop(compact_id(entry.get('id')), None)
+
+    # Every live mutation goes through these three. With the records held in
+    # an id-keyed dict, lookups, edits and deletes are O(1); a delete only
+    # leaves a tombstone in the cached list view (see _view_remove()).
+    def _add(self, kind, record):
+        if kind == 'expense':
+            self.budget_engine.advance()
+        table = self._by_id[kind]
+        if table is not None:
+            table[record.key] = record
+            self._view_append(kind, record)
+            self._index_add(kind, record)
+        if kind == 'expense':
+            # Ahead of the commit: a save that merges another session's changes
+            # reseeds the engine from rollups that already hold this record
+            self.budget_engine.add(_category(record), record.date, amount_of(record))
+        self._commit({'op': 'add', 'kind': kind, 'data': record.to_dict()})
+        return record
+
+    def _edit(self, kind, record_id, changes):
+        entry = {'op': 'edit', 'kind': kind, 'id': record_id, 'changes': changes}
+        if kind == 'expense':
+            self.budget_engine.advance()
+        table = self._by_id[kind]
+        if table is None:
+            record = self._get(kind, record_id) if kind == 'expense' else None
+            if not self._commit(entry):
+                return False
+            if record is not None:
+                self._budget_edit(record, changes)
+            return True
+        record = table.get(compact_id(record_id))
+        if record is None:
+            return False
+        self._index_remove(kind, record)
+        if kind == 'expense':
+            self._budget_edit(record, changes)
+        for k, v in changes.items():
+            setattr(record, k, v)
+        self._index_add(kind, record)
+        self._commit(entry)
+        return True
+
+    def _budget_edit(self, record, changes):
+        # Move an edited expense's amount between budget periods/categories
+        old = (_category(record), record.date, amount_of(record))
+        edited = self._record_class('expense').from_dict({**record.to_dict(), **changes})
+        new = (_category(edited), edited.date, amount_of(edited))
+        if new != old:
+            self.budget_engine.remove(*old)
+            self.budget_engine.add(*new)
+
+    def _delete(self, kind, record_id):
+        entry = {'op': 'delete', 'kind': kind, 'id': record_id}
+        if kind == 'expense':
+            self.budget_engine.advance()
+        table = self._by_id[kind]
+        if table is None:
+            record = self._get(kind, record_id) if kind == 'expense' else None
+            if not self._commit(entry):
+                return False
+            if record is not None:
+                self.budget_engine.remove(_category(record), record.date, amount_of(record))
+            return True
+        record = table.pop(compact_id(record_id), None)
+        if record is None:
+            return False
+        self._view_remove(kind, record)
+        self._index_remove(kind, record)
+        if kind == 'expense':
+            # Ahead of the commit, as in _add()
+            self.budget_engine.remove(_category(record), record.date, amount_of(record))
+        self._commit(entry)
+        return True
 
     def add_expense(self, amount, category, date, description):
         if date is None:
             date = datetime.now().isoformat()
         new_expense = Expense(id=str(uuid.uuid4()), amount=amount, category=category, date=date, description=description)
-        self.expenses.append(new_expense)
-        self.save()
-
-        try:
-            cat_limit = self.user_data['budgets']['categories'].get(category, 0)
-            if cat_limit > 0:
-                spent_cat = sum(float(e.amount) if isinstance(e.amount, (int, float, str)) else 0 for e in self.expenses if e.category == category)
-                if spent_cat > cat_limit:
-                    print(f"\n[!!!] ALERT: You have EXCEEDED your budget for '{category}'!")
-                    print(f"      Limit: ${cat_limit:.2f} | Spent: ${spent_cat:.2f}")
-                    input("Press Enter to acknowledge alert...")
-        except Exception:
-            pass
+        # Budget thresholds crossed by this expense reach on_budget_alert() listeners
+        self._add('expense', new_expense)
         return new_expense # Return object for menu compatibility
 
     def add_income(self, amount, category, date, description):
         if date is None:
             date = datetime.now().isoformat()
         new_income = Income(id=str(uuid.uuid4()), amount=amount, category=category, date=date, description=description)
-        self.income.append(new_income)
-        self.save()
-        return new_income
+        return self._add('income', new_income)
 
     def delete_expense(self, expense_id):
-        initial = len(self.expenses)
-        self.expenses = [e for e in self.expenses if e.id != expense_id]
-        if len(self.expenses) < initial:
-            self.save()
+        return self._delete('expense', expense_id)
 
     def edit_expense(self, expense_id, **kwargs):
-        for e in self.expenses:
-            if e.id == expense_id:
-                for k, v in kwargs.items():
-                    if v is not None: setattr(e, k, v)
-                self.save()
-                return True
-        return False
+        changes = {k: v for k, v in kwargs.items() if v is not None}
+        return self._edit('expense', expense_id, changes)
+
+    # --- BULK IMPORT ---
+    def import_transactions(self, rows, chunk_size=IMPORT_CHUNK_SIZE):
+        """Add statement rows (see importer.py) in bulk, with a single save.
+
+        Rows are validated a chunk at a time. A row is a duplicate when its id
+        is already stored, or when its fingerprint (kind, day, amount,
+        description) is already stored at least as often as it has occurred
+        so far in this import. There are no per-row journal entries, index
+        updates or budget prompts: indexes are rebuilt once at the end.
+        Returns {'added', 'duplicates', 'invalid', 'errors': [(path, line, message), ...],
+        'rows', 'seconds', 'rows_per_sec'}.
+        """
+        started = time.perf_counter()
+        result = {'added': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+        # Same lock order as save(), which _store_imported() ends with
+        with self._flush_lock, self._lock():
+            if not self.queryable and self._conflicted():
+                self._merge()
+            tables = {kind: self._table(kind) for kind in ('expense', 'income')}
+            known = {}
+            for kind in tables:
+                for r in self._records(kind):
+                    fp = fingerprint(kind, str(r.date), amount_of(r), str(r.description or ''))
+                    known[fp] = known.get(fp, 0) + 1
+            existing = sum(len(t) for t in tables.values())
+            seen = {}
+            new_rows = {'expense': [], 'income': []}
+            new_categories = {'expense': {}, 'income': {}}
+            for good, errors in prepared_chunks(rows, chunk_size):
+                result['invalid'] += len(errors)
+                result['errors'].extend(errors[:MAX_ERRORS - len(result['errors'])])
+                for kind, amount, category, date, description, row_id, fp in good:
+                    n = seen.get(fp, 0) + 1
+                    seen[fp] = n
+                    key = make_key(row_id, fp, n)
+                    table = tables[kind]
+                    if n <= known.get(fp, 0) or key in table:
+                        result['duplicates'] += 1
+                        continue
+                    record = self._record_class(kind)(id=key, amount=amount, category=category,
+                                                      date=date, description=description)
+                    table[record.key] = record
+                    new_rows[kind].append(record)
+                    new_categories[kind][category] = None
+                    result['added'] += 1
+
+            if result['added']:
+                self._store_imported(new_rows, new_categories, existing)
+        result['rows'] = result['added'] + result['duplicates'] + result['invalid']
+        result['seconds'] = time.perf_counter() - started
+        result['rows_per_sec'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+        return result
+
+    def _store_imported(self, new_rows, new_categories, existing):
+        # Called with the lock held: make the imported records visible and save once
+        for kind, names in (('expense', self.categories), ('income', self.income_categories)):
+            lowered = {c.lower() for c in names}
+            names.extend(c for c in new_categories[kind] if c.lower() not in lowered)
+        self._views = {'expense': None, 'income': None}
+        if self.queryable:
+            self.storage.insert_many(self.username, {kind: [r.to_dict() for r in records]
+                                                     for kind, records in new_rows.items()})
+            self._note_write()
+            # Rows live in SQL; re-hydrate lazily if anything wants the lists
+            self._by_id = {'expense': None, 'income': None}
+        elif sum(map(len, new_rows.values())) * 4 < existing:
+            # A small import into a long history: cheaper to insert than to rebuild
+            for kind, records in new_rows.items():
+                for record in records:
+                    self._index_add(kind, record)
+        else:
+            self._build_indexes()
+        if 'expense' in new_rows:
+            # Bulk loads reseed the budget windows instead of alerting row by row
+            self.budget_engine.load(self.user_data['budgets'])
+        self.save()
 
     def get_categories(self):
         return self.categories
@@ -115,36 +1009,262 @@ class ExpenseTracker:
     def add_category(self, category):
         if category not in self.categories:
             self.categories.append(category)
-            self.save()
+            self.mark_dirty()
 
     def delete_income(self, income_id):
-        initial = len(self.income)
-        self.income = [i for i in self.income if i.id != income_id]
-        if len(self.income) < initial:
-            self.save()
+        return self._delete('income', income_id)
 
     def edit_income(self, income_id, **kwargs):
-        for i in self.income:
-            if i.id == income_id:
-                for k, v in kwargs.items():
-                    if v is not None: setattr(i, k, v)
-                self.save()
-                return True
-        return False
+        changes = {k: v for k, v in kwargs.items() if v is not None}
+        return self._edit('income', income_id, changes)
 
     def get_income_categories(self):
         return self.income_categories
-        
-    def search(self, term=None, category=None, start=None, end=None, min_amount=None, max_amount=None):
-        results = self.expenses
-        if term: results = [x for x in results if term.lower() in x.description.lower()]
-        if category: results = [x for x in results if x.category.lower() == category.lower()]
+
+    def _search(self, kind, term, category, start, end, min_amount, max_amount):
+        lo, hi = date_bounds(start, end)
+        if self.queryable:
+            cls = self._record_class(kind)
+            rows = self.storage.search(self.username, kind, term, category, lo, hi, min_amount, max_amount)
+            return [cls.from_dict(r) for r in rows]
+
+        # Start from whichever sorted index narrows the candidates most, then
+        # filter the rest of the criteria over that (usually small) slice.
+        lo_key = date_key(lo) if lo is not None else None
+        hi_key = date_key(hi) if hi is not None else None
+        by_date = self.date_index[kind]
+        by_amount = self.amount_index[kind]
+        has_dates = lo is not None or hi is not None
+        has_amounts = min_amount is not None or max_amount is not None
+        if has_dates and (not has_amounts or
+                          by_date.count(lo_key, hi_key) <= by_amount.count(min_amount, max_amount, True)):
+            results = by_date.range(lo_key, hi_key)
+            if has_amounts:
+                results = [x for x in results
+                           if (min_amount is None or x.amount >= min_amount)
+                           and (max_amount is None or x.amount <= max_amount)]
+        elif has_amounts:
+            results = by_amount.range(min_amount, max_amount, True)
+            if has_dates:
+                results = [x for x in results
+                           if (lo_key is None or date_key(x.date) >= lo_key)
+                           and (hi_key is None or date_key(x.date) < hi_key)]
+        else:
+            results = None
+
+        if term:
+            matched = self.text_index[kind].search(term, category)
+            if results is None:
+                return sorted(matched, key=lambda x: date_key(x.date))
+            keys = {x.key for x in matched}
+            return [x for x in results if x.key in keys]
+        if results is None:
+            results = self._records(kind)
+        if category:
+            wanted = category.lower()
+            results = [x for x in results if x.category.lower() == wanted]
         return results
 
+    def search(self, term=None, category=None, start=None, end=None, min_amount=None, max_amount=None):
+        """Expenses matching every given criterion. `end` is inclusive of that whole day."""
+        return self._search('expense', term, category, start, end, min_amount, max_amount)
+
     def search_income(self, term=None, category=None, start=None, end=None, min_amount=None, max_amount=None):
-        results = self.income
-        if term: results = [x for x in results if term.lower() in x.description.lower()]
-        return results
+        """Income matching every given criterion. `end` is inclusive of that whole day."""
+        return self._search('income', term, category, start, end, min_amount, max_amount)
+
+    # --- TOTALS AND ORDERED VIEWS FOR REPORTS AND BUDGETS ---
+    def total_expenses(self, period=None):
+        """Total spent, over all time or within a 'YYYY' / 'YYYY-MM' period."""
+        if period is not None:
+            return self._period_totals('expense', period, by_category=False)
+        if self.queryable:
+            return self.storage.total(self.username, 'expense')
+        if self._lazy:
+            return self._totals['expense']
+        return self.aggregates.expense_total
+
+    def total_income(self, period=None):
+        if period is not None:
+            return self._period_totals('income', period, by_category=False)
+        if self.queryable:
+            return self.storage.total(self.username, 'income')
+        if self._lazy:
+            return self._totals['income']
+        return self.aggregates.income_total
+
+    def category_totals(self, period=None):
+        """Total spent per expense category, optionally within a period."""
+        if period is not None:
+            return self._period_totals('expense', period, by_category=True)
+        if self.queryable:
+            return self.storage.category_totals(self.username, 'expense')
+        mapped = self._mapped
+        if mapped is not None:
+            # Lazy tracker: summed straight from the mapped snapshot
+            return mapped.category_totals('expense')
+        return self.aggregates.category_totals()
+
+    def category_total(self, category):
+        if self.queryable:
+            return self.storage.category_totals(self.username, 'expense', category=category).get(category, 0)
+        mapped = self._mapped
+        if mapped is not None:
+            return mapped.category_totals('expense').get(category, 0)
+        return self.aggregates.category_total(category)
+
+    def _period_totals(self, kind, period, by_category):
+        # One row of the yearly or monthly rollup
+        if period_bounds(period) is None:
+            return {} if by_category else 0
+        grain = 'year' if len(period) == 4 else 'month'
+        totals = self.rollup(kind, grain, period, period).get(period, {})
+        return dict(totals) if by_category else sum(totals.values())
+
+    def rollup(self, kind, grain, start=None, end=None, category=None):
+        """{period: {category: total}} from the 'day', 'month' or 'year' rollup.
+
+        Periods are 'YYYY-MM-DD', 'YYYY-MM' or 'YYYY' strings; start and end
+        (same format) are inclusive. Reads only the rollup tables.
+        """
+        if self.queryable:
+            return self.storage.rollup(self.username, kind, grain, start, end, category)
+        return self.rollups.rollup(kind, grain, start, end, category)
+
+    def rollup_total(self, kind, grain, period, category=None):
+        """Total for one period ('YYYY-MM-DD', 'YYYY-MM' or 'YYYY'), from the rollups."""
+        return sum(self.rollup(kind, grain, period, period, category).get(period, {}).values())
+
+    # --- BUDGETS ---
+    def on_budget_alert(self, callback):
+        """Call `callback(alert)` (a budget_engine.BudgetAlert) whenever a change pushes a budget past a threshold."""
+        self.budget_engine.subscribe(callback)
+
+    def budgets_changed(self):
+        """Pick up edited budget limits or rules and save them."""
+        self.budget_engine.load(self.user_data['budgets'])
+        self.mark_dirty()
+
+    def budget_status(self):
+        """[(rule, spent, period name, alert level or None)] for every budget, from the maintained windows."""
+        return self.budget_engine.status()
+
+    def _spend_by_day(self, category, first, last):
+        # Seeds the budget windows: {day ordinal: spent} from the daily rollups
+        days = self.rollup('expense', 'day', date.fromordinal(first).isoformat(),
+                           date.fromordinal(last).isoformat(), category)
+        return {day_number(period): sum(totals.values()) for period, totals in days.items()}
+
+    def expenses_in_period(self, period):
+        """Expenses dated within a 'YYYY' or 'YYYY-MM' period."""
+        bounds = period_bounds(period)
+        if bounds is None:
+            return []
+        lo, hi = bounds
+        if self.queryable:
+            return [Expense.from_dict(r) for r in self.storage.search(self.username, 'expense', start=lo, end=hi)]
+        return self.date_index['expense'].range(date_key(lo), date_key(hi))
+
+    def count(self, kind):
+        """Number of records of one kind."""
+        if self.queryable and self._by_id[kind] is None:
+            return self.storage.count(self.username, kind)
+        if self._lazy:
+            return self._counts[kind]
+        return len(self._table(kind))
+
+    def page(self, kind, offset, limit, key=None, reverse=False):
+        """One page of records of one kind, sorted by `key` (None keeps the order they were added)."""
+        if self.queryable:
+            cls = self._record_class(kind)
+            return [cls.from_dict(r) for r in self.storage.fetch(self.username, kind, key, reverse, limit, offset)]
+        index = {'date': self.date_index, 'amount': self.amount_index}.get(key)
+        if index is not None:
+            return index[kind].slice(offset, offset + limit, reverse)
+        if key is not None:
+            # Other orders get their own sorted index on first use, then kept up to date
+            index = self._sorted_views.get((kind, key))
+            if index is None:
+                index = self._sorted_views[(kind, key)] = SortedIndex(lambda x: str(getattr(x, key) or ''))
+                index.rebuild(self._records(kind))
+            return index.slice(offset, offset + limit, reverse)
+        view, holes = self._view(kind), self._holes[kind]
+        n = len(view) - len(holes)
+        start, stop = (n - offset - limit, n - offset) if reverse else (offset, offset + limit)
+        start, stop = max(start, 0), min(stop, n)
+        if start >= stop:
+            return []
+        if not holes:
+            records = view[start:stop]
+        else:
+            # Skip the tombstones without compacting
+            records = []
+            slot = _live_slot(holes, start)
+            while len(records) < stop - start:
+                if view[slot] is not None:
+                    records.append(view[slot])
+                slot += 1
+        return records[::-1] if reverse else records
+
+    # --- STREAMING VIEWS (exports, timeline) ---
+    def iter_transactions(self, kind, start=None, end=None, category=None, reverse=False):
+        """Records of one kind in date order (newest first with reverse), produced lazily.
+
+        `end` is inclusive of that whole day, as in search(). Nothing is
+        collected into a list, so memory does not grow with the history.
+        """
+        lo, hi = date_bounds(start, end)
+        if self.queryable:
+            cls = self._record_class(kind)
+            for row in self.storage.iter_rows(self.username, kind, category, lo, hi, reverse):
+                yield cls.from_dict(row)
+            return
+        records = self.date_index[kind].iter_range(date_key(lo) if lo is not None else None,
+                                                   date_key(hi) if hi is not None else None, reverse=reverse)
+        if category:
+            wanted = category.lower()
+            records = (x for x in records if x.category.lower() == wanted)
+        yield from records
+
+    def iter_from(self, kind, date, reverse=False, category=None):
+        """Records of one kind dated at or after `date` (an ISO string), or at or before it with reverse.
+
+        A `date` of None starts at the oldest record (the newest with reverse).
+        Positioning is a single index lookup, so reading k records costs
+        O(log n + k) however deep into the history `date` is.
+        """
+        if self.queryable:
+            cls = self._record_class(kind)
+            bounds = {} if date is None else {'through': date} if reverse else {'start': date}
+            for row in self.storage.iter_rows(self.username, kind, category, reverse=reverse, **bounds):
+                yield cls.from_dict(row)
+            return
+        key = None if date is None else date_key(date)
+        index = self.date_index[kind]
+        records = index.iter_range(hi=key, hi_inclusive=True, reverse=True) if reverse else index.iter_range(lo=key)
+        if category:
+            wanted = category.lower()
+            records = (x for x in records if x.category.lower() == wanted)
+        yield from records
+
+    def stream_key(self):
+        """Sort key for the (kind, record) pairs of iter_from() and iter_transactions().
+
+        It is the order those streams already come in: SQL sorts the ISO
+        strings and the date index sorts timestamps, so merging several
+        streams must use the same key.
+        """
+        return (lambda pair: pair[1].date) if self.queryable else (lambda pair: record_date_key(pair[1]))
+
+    def iter_timeline(self, start=None, end=None, category=None, kinds=('expense', 'income'), reverse=False):
+        """(kind, record) pairs of several kinds in one date order.
+
+        The per-kind streams are already sorted, so they are k-way merged
+        (heapq.merge) instead of concatenated and re-sorted.
+        """
+        streams = [zip(repeat(kind), self.iter_transactions(kind, start, end, category, reverse))
+                   for kind in kinds]
+        return heapq.merge(*streams, key=self.stream_key(), reverse=reverse)
 
     # --- COMPATIBILITY FUNCTIONS FOR MENUS ---
     def list_expenses(self):
@@ -154,9 +1274,10 @@ class ExpenseTracker:
         return self.income
 
     def monthly_summary(self):
-        total_spent = sum(float(e.amount) if isinstance(e.amount, (int, float, str)) else 0 for e in self.expenses)
+        now = datetime.now()
+        total_spent = self.rollup_total('expense', 'month', f"{now:%Y-%m}")
         monthly_limit = self.user_data['budgets'].get('monthly', 0)
-        
+
         over = 0
         if monthly_limit > 0 and total_spent > monthly_limit:
             over = total_spent - monthly_limit
@@ -165,6 +1286,6 @@ class ExpenseTracker:
             'budget': monthly_limit,
             'total': total_spent,
             'over_budget': over,
-            'year': datetime.now().year,
-            'month': datetime.now().month
-        }
\ No newline at end of file
+            'year': now.year,
+            'month': now.month
+        }